@@ -0,0 +1,185 @@
+import io
+import json
+import uuid
+from datetime import datetime
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context
+from werkzeug.exceptions import BadRequest, HTTPException, NotFound
+from models import db, Venue, Artist, Show
+import bulk
+from pagination import key, keyset_page
+
+#----------------------------------------------------------------------------#
+# JSON API, /api/v1.
+#
+#   GET /api/v1/<resource>?fields=id,name&limit=100&cursor=...
+#   GET /api/v1/<resource>/<id>?fields=...
+#   GET /api/v1/<resource>/export?fields=...      (NDJSON, one row per line)
+#   POST /api/v1/<resource>/import?checkpoint=...  (CSV or NDJSON body)
+#
+# Rows are selected as plain columns, never as model instances. Listings are
+# keyset paged on id; the export streams every row from a server-side cursor
+# (yield_per), so its memory use does not grow with the table.
+#----------------------------------------------------------------------------#
+
+def _venue_fields():
+    return {column.key: column for column in (
+        Venue.id, Venue.name, Venue.genres, Venue.address, Venue.city, Venue.state,
+        Venue.phone, Venue.image_link, Venue.facebook_link, Venue.website,
+        Venue.seeking_talent, Venue.seeking_description,
+        Venue.upcoming_shows_count, Venue.past_shows_count)}
+
+
+def _artist_fields():
+    return {column.key: column for column in (
+        Artist.id, Artist.name, Artist.genres, Artist.city, Artist.state, Artist.phone,
+        Artist.website, Artist.image_link, Artist.facebook_link,
+        Artist.seeking_venue, Artist.seeking_description,
+        Artist.upcoming_shows_count, Artist.past_shows_count)}
+
+
+def _show_fields():
+    return {
+        'id': Show.id,
+        'venue_id': Show.venue_id,
+        'venue_name': Venue.name.label('venue_name'),
+        'artist_id': Show.artist_id,
+        'artist_name': Artist.name.label('artist_name'),
+        'artist_image_link': Artist.image_link.label('artist_image_link'),
+        'start_time': Show.start_time,
+    }
+
+
+def _show_joins(query, names):
+    """Join venue / artist only when a selected field comes from them."""
+    if 'venue_name' in names:
+        query = query.join(Venue, Venue.id == Show.venue_id)
+    if {'artist_name', 'artist_image_link'} & set(names):
+        query = query.join(Artist, Artist.id == Show.artist_id)
+    return query
+
+
+RESOURCES = {
+    'venues': (Venue, _venue_fields, None),
+    'artists': (Artist, _artist_fields, None),
+    'shows': (Show, _show_fields, _show_joins),
+}
+
+
+def _query(resource):
+    """ Column query for resource and the selected field names.
+
+    id is always selected: listings page on it.
+    """
+    model, fields, joins = RESOURCES[resource]
+    available = fields()
+    requested = request.args.get('fields')
+    names = [name.strip() for name in requested.split(',') if name.strip()] if requested else list(available)
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        raise BadRequest(f'Unknown fields: {", ".join(unknown)}. '
+                         f'Available: {", ".join(available)}.')
+    if 'id' not in names:
+        names.insert(0, 'id')
+
+    query = db.session.query(*[available[name] for name in names])
+    if joins:
+        query = joins(query, names)
+    return model, query, names
+
+
+def _json_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _row(row, names):
+    return {name: _json_value(value) for name, value in zip(names, row)}
+
+
+def _limit():
+    try:
+        limit = int(request.args.get('limit', current_app.config['API_PAGE_SIZE']))
+    except ValueError:
+        raise BadRequest('limit must be an integer.')
+    return max(1, min(limit, current_app.config['API_MAX_PAGE_SIZE']))
+
+
+#----------------------------------------------------------------------------#
+# Views.
+#----------------------------------------------------------------------------#
+
+bp = Blueprint('api', __name__, url_prefix='/api/v1')
+
+RESOURCE = '<any(venues, artists, shows):resource>'
+
+
+@bp.route(f'/{RESOURCE}')
+def collection(resource):
+    model, query, names = _query(resource)
+    page = keyset_page(query, [key(model.id)], cursor=request.args.get('cursor'), per_page=_limit())
+    return jsonify(data=[_row(row, names) for row in page.items],
+                   next_cursor=page.next_cursor, prev_cursor=page.prev_cursor)
+
+
+@bp.route(f'/{RESOURCE}/<int:id>')
+def item(resource, id):
+    model, query, names = _query(resource)
+    row = query.filter(model.id == id).first()
+    if row is None:
+        raise NotFound(f'No {resource[:-1]} with id {id}.')
+    return jsonify(data=_row(row, names))
+
+
+@bp.route(f'/{RESOURCE}/export')
+def export(resource):
+    model, query, names = _query(resource)
+    rows = query.order_by(model.id).yield_per(current_app.config['API_EXPORT_BATCH'])
+
+    def generate():
+        for row in rows:
+            yield json.dumps(_row(row, names), separators=(',', ':')) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
+@bp.route(f'/{RESOURCE}/import', methods=['POST'])
+def import_rows(resource):
+    """ Bulk load a CSV (text/csv) or NDJSON body; see bulk.py.
+
+    Pass ?checkpoint=<name> (one is generated otherwise and returned); if the
+    upload breaks off, POST the same body with the same name to resume.
+    """
+    format = request.args.get('format') or ('csv' if request.mimetype == 'text/csv' else 'ndjson')
+    if format not in ('csv', 'ndjson'):
+        raise BadRequest('format must be csv or ndjson.')
+    try:
+        checkpoint = bulk.checkpoint_for(request.args.get('checkpoint') or uuid.uuid4().hex, resource,
+                                         restart=request.args.get('restart') == '1')
+    except ValueError as e:
+        raise BadRequest(str(e))
+
+    limit = current_app.config['IMPORT_MAX_REPORTED_ERRORS']
+    errors = []
+
+    def report(number, row_errors):
+        if len(errors) < limit:
+            errors.append({'row': number, 'errors': row_errors})
+
+    stream = io.TextIOWrapper(request.stream, encoding='utf-8', newline='')
+    checkpoint = bulk.load(resource, bulk.read_rows(stream, format), checkpoint,
+                           current_app.config['IMPORT_BATCH_SIZE'], on_error=report)
+    return jsonify(checkpoint=checkpoint.name, rows=checkpoint.rows_done, inserted=checkpoint.inserted,
+                   rejected=checkpoint.rejected, finished=checkpoint.finished, errors=errors)
+
+
+@bp.errorhandler(HTTPException)
+def http_error(error):
+    return jsonify(error=error.description), error.code
+
+
+def init_app(app):
+    app.config.setdefault('API_PAGE_SIZE', 100)
+    app.config.setdefault('API_MAX_PAGE_SIZE', 1000)
+    app.config.setdefault('API_EXPORT_BATCH', 1000)
+    app.register_blueprint(bp)
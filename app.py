@@ -2,55 +2,136 @@
 # Imports
 #----------------------------------------------------------------------------#
 
-import json
-import dateutil.parser
-import babel
-import sys
+from datetime import datetime
+from functools import lru_cache
 from flask import (
     Flask, 
+    current_app, 
     render_template, 
     request, 
-    Response, 
     flash, 
     redirect, 
     url_for
 )
 from flask_moment import Moment
-from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import func
 from flask_migrate import Migrate
-import logging
-from logging import Formatter, FileHandler
-from flask_wtf import Form
-from forms import *
-from models import *
-from enum import Enum
+from forms import VenueForm, ArtistForm, ShowForm, owner_ids
+from models import db, Venue, Artist, Show
+from queries import venue_areas, artist_page, show_page, show_counts, venue_shows, artist_shows
+from routing import Routes
+import logs
+import metrics
+import instrumentation
+import counters
+import feed
+import search
+import facets
+import loading
+import explain
+import cache
+import api
+import bulk
+import assets
+import responses
+import rendering
+import startup
+from pagination import Page
 
 #----------------------------------------------------------------------------#
 # App Config.
 #----------------------------------------------------------------------------#
 
-app = Flask(__name__)
-moment = Moment(app)
-app.config.from_object('config')
-db.init_app(app)
-migrate = Migrate(app,db)
-
+moment = Moment()
+migrate = Migrate()
+routes = Routes()
+
+
+def create_app(config=None):
+  """ Build the app: config.py, then its PROFILE's overrides, then config.
+
+  config is a mapping of settings, e.g. {'PROFILE': 'production'}; the
+  profile defaults to $FYYUR_PROFILE.
+  """
+  app = Flask(__name__)
+  app.config.from_object('config')
+  app.config.update(config or {})
+  startup.apply_profile(app.config)
+  # settings passed in win over the profile's
+  app.config.update(config or {})
+  app.config['SECRET_KEY'] = startup.secret_key(app)
+
+  moment.init_app(app)
+  logs.init_app(app)
+  metrics.init_app(app)
+  responses.init_app(app)
+  db.init_app(app)
+  migrate.init_app(app, db)
+  instrumentation.init_app(app)
+  counters.init_app(app)
+  search.init_app(app)
+  facets.init_app(app)
+  explain.init_app(app)
+  cache.init_app(app)
+  api.init_app(app)
+  bulk.init_app(app)
+  owner_ids.init_app(app)
+  assets.init_app(app)
+  rendering.init_app(app)
+  routes.init_app(app)
+  app.jinja_env.filters['datetime'] = format_datetime
+  return app
 
 
 #----------------------------------------------------------------------------#
 # Filters.
 #----------------------------------------------------------------------------#
 
-def format_datetime(value, format='medium'):
-  date = dateutil.parser.parse(value)
-  if format == 'full':
-      format="EEEE MMMM, d, y 'at' h:mma"
-  elif format == 'medium':
-      format="EE MM, dd, y h:mma"
-  return babel.dates.format_datetime(date, format, locale='en')
+DATETIME_FORMATS = {
+  'full': "EEEE MMMM, d, y 'at' h:mma",
+  'medium': "EE MM, dd, y h:mma",
+}
+
+# babel and dateutil are imported on first use (or by startup.warm), not
+# with the app
+
+@lru_cache(maxsize=64)
+def datetime_pattern(format, locale):
+  """Compiled babel pattern and Locale, built once per format/locale."""
+  import babel.dates
+  return babel.dates.parse_pattern(DATETIME_FORMATS.get(format, format)), babel.Locale.parse(locale)
+
+def format_datetime(value, format='medium', locale='en'):
+  # views pass datetimes; strings are still accepted but cost a dateutil parse
+  if isinstance(value, str):
+    import dateutil.parser
+    value = dateutil.parser.parse(value)
+  if format in ('long', 'short'):
+    import babel.dates
+    return babel.dates.format_datetime(value, format, locale=locale)
+  pattern, locale = datetime_pattern(format, locale)
+  return pattern.apply(value, locale)
+
+
+def show_tiles(page):
+  return [row._asdict() for row in page.items]
 
-app.jinja_env.filters['datetime'] = format_datetime
+
+#----------------------------------------------------------------------------#
+# Cache tags.
+#----------------------------------------------------------------------------#
+
+# A venue's or artist's name and image appear on its own page, on the list
+# pages and on the show tiles of everyone it has shows with.
+
+def venue_cache_tags(venue_id):
+  artist_ids = db.session.query(Show.artist_id).filter(Show.venue_id == venue_id).distinct()
+  return ['venues', 'shows', f'venue:{venue_id}', f'venue-info:{venue_id}'] + \
+         [f'artist:{artist_id}' for artist_id, in artist_ids]
+
+def artist_cache_tags(artist_id):
+  venue_ids = db.session.query(Show.venue_id).filter(Show.artist_id == artist_id).distinct()
+  return ['artists', 'shows', f'artist:{artist_id}', f'artist-info:{artist_id}'] + \
+         [f'venue:{venue_id}' for venue_id, in venue_ids]
 
 #----------------------------------------------------------------------------#
 # Controllers.
@@ -59,7 +140,7 @@ app.jinja_env.filters['datetime'] = format_datetime
 
 #  Show Home page
 #  ----------------------------------------------------------------
-@app.route('/')
+@routes.route('/')
 def index():
   return render_template('pages/home.html')
 
@@ -67,93 +148,111 @@ def index():
 #  Show All Venues
 #  ----------------------------------------------------------------
 
-@app.route('/venues')
+@routes.route('/venues')
+@cache.cached('venues')
 def venues():
 
-  area_list = Venue.query.with_entities(func.count(Venue.id),Venue.city, Venue.state).group_by(Venue.city, Venue.state).all()
-  data = []
-
-  for area in area_list:
-    venue_list = Venue.query.filter_by(state=area.state).filter_by(city=area.city).all()
-    venue_data = []
+  streaming = current_app.config['STREAM_LISTINGS']
+  data, page = venue_areas(cursor=request.args.get('cursor'), per_page=current_app.config['PAGE_SIZE'],
+                           stream=streaming)
+  if streaming:
+    return rendering.stream_template('pages/venues.html', areas=data, page=page)
+  responses.last_modified(*(venue.updated_at for venue in page.items))
 
-    for venue in venue_list:
-      venue_data.append({
-        "id": venue.id,
-        "name": venue.name,
-        "num_upcoming_shows": len(db.session.query(Show).filter(Show.venue_id==1).filter(Show.start_time>datetime.now()).all())
-      })
-    data.append({"city": area.city, "state": area.state, "venues": venue_data })
-
-  return render_template('pages/venues.html', areas=data)
+  return render_template('pages/venues.html', areas=data, page=page)
 
 #  Search Venue
 #  ----------------------------------------------------------------
-@app.route('/venues/search', methods=['POST'])
+@routes.route('/venues/search', methods=['GET', 'POST'])
 def search_venues():
 
-  search_term = request.form.get('search_term', '')
-  search_result = db.session.query(Venue).filter(Venue.name.ilike(f'%{search_term}%')).all()
+  search_term = request.values.get('search_term', '')
+  count_limit = current_app.config['SEARCH_COUNT_LIMIT']
+  total, page = search.search(Venue, search_term, cursor=request.args.get('cursor'),
+                              per_page=current_app.config['SEARCH_PAGE_SIZE'], options=loading.search_row(Venue),
+                              count_limit=count_limit)
+  responses.last_modified(*(venue.updated_at for venue in page.items))
   item_list = []
 
-  for venue in search_result:
+  for venue in page.items:
      item_list.append({
        "id": venue.id,
        "name": venue.name,
-       "num_upcoming_shows": len(db.session.query(Show).filter(Show.venue_id == venue.id).filter(Show.start_time > datetime.now()).all()),
+       "num_upcoming_shows": venue.upcoming_shows_count,
      })
 
   search_results={
-     "count": len(search_result),
+     "count": search.count_label(total, count_limit),
      "data": item_list
   }
 
-  return render_template('pages/search_venues.html', results=search_results, search_term=request.form.get('search_term', ''))
+  return render_template('pages/search_venues.html', results=search_results, search_term=search_term, page=page)
+
+
+#  Browse Venues
+#  ----------------------------------------------------------------
+@routes.route('/venues/browse')
+@cache.cached('venues')
+def browse_venues():
+
+  genres, states = facets.parse_filters(request.args)
+  counts = facets.facet_counts(Venue, genres, states)
+  page = facets.browse_venues(genres, states, cursor=request.args.get('cursor'),
+                              per_page=current_app.config['PAGE_SIZE'])
+  responses.last_modified(*(venue.updated_at for venue in page.items))
+
+  return render_template('pages/browse.html', kind='venues', facets=counts, page=page,
+                         genres=genres, states=states)
 
 
 #  Show Venue
 #  ----------------------------------------------------------------
-@app.route('/venues/<int:venue_id>')
+@routes.route('/venues/<int:venue_id>')
+@cache.cached('venue:{venue_id}')
 def show_venue(venue_id):
 
-  venue = Venue.query.get(venue_id)
-
-  past_shows = []
-  upcoming_shows = []
-
-  for show in venue.shows:
-      temp_show = {
-          'artist_id': show.artist_id,
-          'artist_name': show.artist.name,
-          'artist_image_link': show.artist.image_link,
-          'start_time': show.start_time.strftime("%m/%d/%Y, %H:%M")
-      }
-      if show.start_time <= datetime.now():
-          past_shows.append(temp_show)
-      else:
-          upcoming_shows.append(temp_show)
+  venue = Venue.query.options(*loading.venue_detail()).get_or_404(venue_id)
+  now = datetime.now()
+  per_page = current_app.config['DETAIL_SHOWS_PAGE_SIZE']
+  upcoming = venue_shows(venue_id, True, now, per_page=per_page)
+  past = venue_shows(venue_id, False, now, per_page=per_page)
+  upcoming_count, past_count = show_counts(Show.venue_id, venue_id, now)
+  responses.last_modified(venue.updated_at, *(show.updated_at for show in upcoming.items + past.items))
 
   # object class to dict
-  data = vars(venue)
+  data = dict(vars(venue))
 
-  data['past_shows'] = past_shows
-  data['upcoming_shows'] = upcoming_shows
-  data['past_shows_count'] = len(past_shows)
-  data['upcoming_shows_count'] = len(upcoming_shows)
+  data['past_shows'] = show_tiles(past)
+  data['upcoming_shows'] = show_tiles(upcoming)
+  data['past_shows_count'] = past_count
+  data['upcoming_shows_count'] = upcoming_count
+  data['past_shows_cursor'] = past.next_cursor
+  data['upcoming_shows_cursor'] = upcoming.next_cursor
 
   return render_template('pages/show_venue.html', venue=data)
 
 
+@routes.route('/venues/<int:venue_id>/shows/<any(upcoming, past):when>')
+@cache.cached('venue:{venue_id}')
+def venue_show_tiles(venue_id, when):
+
+  page = venue_shows(venue_id, when == 'upcoming', datetime.now(), cursor=request.args.get('cursor'),
+                     per_page=current_app.config['DETAIL_SHOWS_PAGE_SIZE'])
+  responses.last_modified(*(show.updated_at for show in page.items))
+  return render_template('pages/venue_show_tiles.html', shows=show_tiles(page),
+                         next_cursor=page.next_cursor, venue_id=venue_id, when=when)
+
+
 #  Create Venue
 #  ----------------------------------------------------------------
 
-@app.route('/venues/create', methods=['GET'])
+@routes.route('/venues/create', methods=['GET'])
 def create_venue_form():
   form = VenueForm()
   return render_template('forms/new_venue.html', form=form)
   new_venue_id = 0
 
-@app.route('/venues/create', methods=['POST'])
+@routes.route('/venues/create', methods=['POST'])
 def create_venue_submission():
 
   new_venue_id = None
@@ -167,13 +266,11 @@ def create_venue_submission():
        db.session.add(new_venue)
        db.session.commit()
        new_venue_id = new_venue.id
+       cache.invalidate('venues')
     except:
        error = True
-       print('*** Error saving new Venue...rolling back ***')
-       print(sys.exc_info())
+       current_app.logger.exception('Error saving new Venue...rolling back')
        db.session.rollback()
-    finally:
-       db.session.close()
   else:
     message = []
     for field, err in form.errors.items():
@@ -186,21 +283,23 @@ def create_venue_submission():
 
 #  Delete Venue
 #  ----------------------------------------------------------------
-@app.route('/venues/<venue_id>/delete', methods=['GET','POST'])
+@routes.route('/venues/<venue_id>/delete', methods=['GET','POST'])
 def delete_venue(venue_id):
 
    try:
      error = False
-     item = Venue.query.get(venue_id)
-     db.session.delete(item)
+     tags = venue_cache_tags(venue_id)
+     feed.forget_shows(Show.venue_id == venue_id)
+     counters.forget_shows(Show.venue_id == venue_id)
+     if not Venue.query.filter_by(id=venue_id).delete(synchronize_session=False):
+       raise LookupError(f'Venue {venue_id} not found')
      db.session.commit()
+     owner_ids.forget(Venue, venue_id)
+     cache.invalidate(*tags)
    except:
      error = True
-     print('*** Error deleting venue...rolling back ***')
-     print(sys.exc_info())
+     current_app.logger.exception('Error deleting venue...rolling back')
      db.session.rollback()
-   finally:
-     db.session.close()
 
    if error:
      flash(f'An error occurred. Venue {venue_id} could not be deleted.')
@@ -213,95 +312,127 @@ def delete_venue(venue_id):
 
 #  Show Artist list
 #  ----------------------------------------------------------------
-@app.route('/artists')
+@routes.route('/artists')
+@cache.cached('artists')
 def artists():
 
+  if current_app.config['STREAM_LISTINGS']:
+    # rows are read while the page is sent; errors are logged by stream_template
+    page = artist_page(cursor=request.args.get('cursor'), per_page=current_app.config['PAGE_SIZE'], stream=True)
+    return rendering.stream_template('pages/artists.html', artists=page.items, page=page)
+
+  page = Page([], None, None)
   try:
      error = False
-     item_list = db.session.query(Artist).all()
+     page = artist_page(cursor=request.args.get('cursor'), per_page=current_app.config['PAGE_SIZE'])
+     responses.last_modified(*(artist.updated_at for artist in page.items))
   except:
      error = True
-     print('*** Error querying Artist list...rolling back ***')
-     print(sys.exc_info())
+     current_app.logger.exception('Error querying Artist list...rolling back')
      db.session.rollback()
-  finally:
-     db.session.close()
 
   if error:
      flash('An error occurred listing Artists')
 
-  return render_template('pages/artists.html', artists=item_list)
+  return render_template('pages/artists.html', artists=page.items, page=page)
 
-@app.route('/artists/search', methods=['POST'])
+@routes.route('/artists/search', methods=['GET', 'POST'])
 def search_artists():
 
-  search_term = request.form.get('search_term', '')
-  search_result = db.session.query(Artist).filter(Artist.name.ilike(f'%{search_term}%')).all()
+  search_term = request.values.get('search_term', '')
+  count_limit = current_app.config['SEARCH_COUNT_LIMIT']
+  total, page = search.search(Artist, search_term, cursor=request.args.get('cursor'),
+                              per_page=current_app.config['SEARCH_PAGE_SIZE'], options=loading.search_row(Artist),
+                              count_limit=count_limit)
+  responses.last_modified(*(artist.updated_at for artist in page.items))
   item_list = []
 
-  for result in search_result:
+  for result in page.items:
      item_list.append({
        "id": result.id,
        "name": result.name,
-       "num_upcoming_shows": len(db.session.query(Show).filter(Show.artist_id == result.id).filter(Show.start_time > datetime.now()).all()),
+       "num_upcoming_shows": result.upcoming_shows_count,
      })
 
   search_results={
-     "count": len(search_result),
+     "count": search.count_label(total, count_limit),
      "data": item_list
   }
 
 
-  return render_template('pages/search_artists.html', results=search_results, search_term=request.form.get('search_term', ''))
+  return render_template('pages/search_artists.html', results=search_results, search_term=search_term, page=page)
+
+#  Browse Artists
+#  ----------------------------------------------------------------
+@routes.route('/artists/browse')
+@cache.cached('artists')
+def browse_artists():
+
+  genres, states = facets.parse_filters(request.args)
+  counts = facets.facet_counts(Artist, genres, states)
+  page = facets.browse_artists(genres, states, cursor=request.args.get('cursor'),
+                               per_page=current_app.config['PAGE_SIZE'])
+  responses.last_modified(*(artist.updated_at for artist in page.items))
+
+  return render_template('pages/browse.html', kind='artists', facets=counts, page=page,
+                         genres=genres, states=states)
 
 #  Show Artist
 #  ----------------------------------------------------------------
-@app.route('/artists/<int:artist_id>')
+@routes.route('/artists/<int:artist_id>')
+@cache.cached('artist:{artist_id}')
 def show_artist(artist_id):
 
-   artist = db.session.query(Artist).get(artist_id)
-   past_shows = []
-   upcoming_shows = []
-
-   for show in artist.shows:
-    temp_show = {
-        'venue_id': show.venue_id,
-        'venue_name': show.venue.name,
-        'venue_image_link': show.venue.image_link,
-        'start_time': show.start_time.strftime("%m/%d/%Y, %H:%M")
-    }
-    if show.start_time <= datetime.now():
-        past_shows.append(temp_show)
-    else:
-        upcoming_shows.append(temp_show)
+   artist = Artist.query.options(*loading.artist_detail()).get_or_404(artist_id)
+   now = datetime.now()
+   per_page = current_app.config['DETAIL_SHOWS_PAGE_SIZE']
+   upcoming = artist_shows(artist_id, True, now, per_page=per_page)
+   past = artist_shows(artist_id, False, now, per_page=per_page)
+   upcoming_count, past_count = show_counts(Show.artist_id, artist_id, now)
+   responses.last_modified(artist.updated_at, *(show.updated_at for show in upcoming.items + past.items))
 
    # object class to dict
-   data = vars(artist)
+   data = dict(vars(artist))
 
-   data['past_shows'] = past_shows
-   data['upcoming_shows'] = upcoming_shows
-   data['past_shows_count'] = len(past_shows)
-   data['upcoming_shows_count'] = len(upcoming_shows)
+   data['past_shows'] = show_tiles(past)
+   data['upcoming_shows'] = show_tiles(upcoming)
+   data['past_shows_count'] = past_count
+   data['upcoming_shows_count'] = upcoming_count
+   data['past_shows_cursor'] = past.next_cursor
+   data['upcoming_shows_cursor'] = upcoming.next_cursor
 
    return render_template('pages/show_artist.html', artist=data)
 
+
+@routes.route('/artists/<int:artist_id>/shows/<any(upcoming, past):when>')
+@cache.cached('artist:{artist_id}')
+def artist_show_tiles(artist_id, when):
+
+  page = artist_shows(artist_id, when == 'upcoming', datetime.now(), cursor=request.args.get('cursor'),
+                      per_page=current_app.config['DETAIL_SHOWS_PAGE_SIZE'])
+  responses.last_modified(*(show.updated_at for show in page.items))
+  return render_template('pages/artist_show_tiles.html', shows=show_tiles(page),
+                         next_cursor=page.next_cursor, artist_id=artist_id, when=when)
+
 #  Delete Artist
 #  ----------------------------------------------------------------
-@app.route('/artists/<artist_id>/delete', methods=['GET', 'POST'])
+@routes.route('/artists/<artist_id>/delete', methods=['GET', 'POST'])
 def delete_artist(artist_id):
 
    try:
      error = False
-     item = Artist.query.get(artist_id)
-     db.session.delete(item)
+     tags = artist_cache_tags(artist_id)
+     feed.forget_shows(Show.artist_id == artist_id)
+     counters.forget_shows(Show.artist_id == artist_id)
+     if not Artist.query.filter_by(id=artist_id).delete(synchronize_session=False):
+       raise LookupError(f'Artist {artist_id} not found')
      db.session.commit()
+     owner_ids.forget(Artist, artist_id)
+     cache.invalidate(*tags)
    except:
      error = True
-     print('*** Error deleting Artist...rolling back ***')
-     print(sys.exc_info())
+     current_app.logger.exception('Error deleting Artist...rolling back')
      db.session.rollback()
-   finally:
-     db.session.close()
 
    if error:
      flash(f'An error occurred. Artist {artist_id} could not be deleted.')
@@ -314,14 +445,14 @@ def delete_artist(artist_id):
 
 #  Edit Artist
 #  ----------------------------------------------------------------
-@app.route('/artists/<int:artist_id>/edit', methods=['GET'])
+@routes.route('/artists/<int:artist_id>/edit', methods=['GET'])
 def edit_artist(artist_id):
   artist = Artist.query.first_or_404(artist_id)
   form = ArtistForm(obj=artist)
   return render_template('forms/edit_artist.html', form=form, artist=artist)
 
 
-@app.route('/artists/<int:artist_id>/edit', methods=['POST'])
+@routes.route('/artists/<int:artist_id>/edit', methods=['POST'])
 def edit_artist_submission(artist_id):
 
   error = False
@@ -332,14 +463,13 @@ def edit_artist_submission(artist_id):
     try:
        form.populate_obj(artist)
        db.session.add(artist)
+       feed.refresh_artist(artist_id)
        db.session.commit()
+       cache.invalidate(*artist_cache_tags(artist_id))
     except:
        error = True
-       print('*** Error saving artist updates...rolling back ***')
-       print(sys.exc_info())
+       current_app.logger.exception('Error saving artist updates...rolling back')
        db.session.rollback()
-    finally:
-       db.session.close()
   else:
     message = []
     for field, err in form.errors.items():
@@ -353,13 +483,13 @@ def edit_artist_submission(artist_id):
 #  Edit Venue
 #  ----------------------------------------------------------------
 
-@app.route('/venues/<int:venue_id>/edit', methods=['GET'])
+@routes.route('/venues/<int:venue_id>/edit', methods=['GET'])
 def edit_venue(venue_id):
   venue = Venue.query.first_or_404(venue_id)
   form = VenueForm(obj=venue)
   return render_template('forms/edit_venue.html', form=form, venue=venue)
 
-@app.route('/venues/<int:venue_id>/edit', methods=['POST'])
+@routes.route('/venues/<int:venue_id>/edit', methods=['POST'])
 def edit_venue_submission(venue_id):
 
   # query venue from database
@@ -371,14 +501,13 @@ def edit_venue_submission(venue_id):
     try:
        form.populate_obj(venue)
        db.session.add(venue)
+       feed.refresh_venue(venue_id)
        db.session.commit()
+       cache.invalidate(*venue_cache_tags(venue_id))
     except:
        error = True
-       print('*** Error saving venue updates...rolling back ***')
-       print(sys.exc_info())
+       current_app.logger.exception('Error saving venue updates...rolling back')
        db.session.rollback()
-    finally:
-       db.session.close()
   else:
     message = []
     for field, err in form.errors.items():
@@ -393,13 +522,13 @@ def edit_venue_submission(venue_id):
 #  Create Artist
 #  ----------------------------------------------------------------
 
-@app.route('/artists/create', methods=['GET'])
+@routes.route('/artists/create', methods=['GET'])
 def create_artist_form():
   new_artist_id = None
   form = ArtistForm()
   return render_template('forms/new_artist.html', form=form)
 
-@app.route('/artists/create', methods=['POST'])
+@routes.route('/artists/create', methods=['POST'])
 def create_artist_submission():
   error = False
   new_artist_id = None
@@ -412,13 +541,11 @@ def create_artist_submission():
       db.session.add(new_artist)
       db.session.commit()
       new_artist_id = new_artist.id
+      cache.invalidate('artists')
     except:
       error = True
-      print('*** Error saving new Artist...rolling back ***')
-      print(sys.exc_info())
+      current_app.logger.exception('Error saving new Artist...rolling back')
       db.session.rollback()
-    finally:
-      db.session.close()
   else:
     message = []
     for field, err in form.errors.items():
@@ -431,48 +558,63 @@ def create_artist_submission():
 
 #  Shows
 #  ----------------------------------------------------------------
-@app.route('/shows')
+@routes.route('/shows')
+@cache.cached('shows')
 def shows():
 
-  item_list = db.session.query(Show).join(Artist).join(Venue).all()
-  data = []
-  for show in item_list:
-     timestamp_str = show.start_time.strftime('%Y-%m-%d %H:%M:%S')
+  if current_app.config['STREAM_LISTINGS']:
+    # the feed rows carry the fields the tiles render
+    page = show_page(datetime.now(), cursor=request.args.get('cursor'), per_page=current_app.config['PAGE_SIZE'],
+                     stream=True)
+    return rendering.stream_template('pages/shows.html', shows=page.items, page=page)
 
+  page = show_page(datetime.now(), cursor=request.args.get('cursor'), per_page=current_app.config['PAGE_SIZE'])
+  responses.last_modified(*(show.updated_at for show in page.items))
+  data = []
+  for show in page.items:
      data.append({
        "venue_id":          show.venue_id,
-       "venue_name":        show.venue.name,
+       "venue_name":        show.venue_name,
        "artist_id":         show.artist_id,
-       "artist_name":       show.artist.name,
-       "artist_image_link": show.artist.image_link,
-       "start_time":        timestamp_str
+       "artist_name":       show.artist_name,
+       "artist_image_link": show.artist_image_link,
+       "start_time":        show.start_time
   })
 
-  return render_template('pages/shows.html', shows=data)
+  return render_template('pages/shows.html', shows=data, page=page)
 
 
-@app.route('/shows/create')
+@routes.route('/shows/create')
 def create_shows():
   form = ShowForm()
   return render_template('forms/new_show.html', form=form)
 
-@app.route('/shows/create', methods=['POST'])
+@routes.route('/shows/create', methods=['POST'])
 def create_show_submission():
   error = False
-  form = ShowForm(request.form)
+  form = ShowForm(request.form, meta={'csrf': False})
   new_show = Show()
 
+  # unknown venue / artist ids are rejected here, before any write
+  if not form.validate():
+    message = []
+    for field, err in form.errors.items():
+        message.append(field + ' ' + '|'.join(err))
+    flash('Errors ' + str(message))
+    return render_template('forms/new_show.html', form=form)
+
   try:
      form.populate_obj(new_show)
      db.session.add(new_show)
+     counters.record_show(new_show)
+     feed.add_shows(Show.id == new_show.id)
+     tags = ['shows', 'venues', f'venue:{new_show.venue_id}', f'artist:{new_show.artist_id}']
      db.session.commit()
+     cache.invalidate(*tags)
   except:
      error = True
-     print('*** Error saving new Show...rolling back ***')
-     print(sys.exc_info())
+     current_app.logger.exception('Error saving new Show...rolling back')
      db.session.rollback()
-  finally:
-     db.session.close()
 
   if error:
      flash('An error occurred. Show could not be listed.')
@@ -482,29 +624,19 @@ def create_show_submission():
   return render_template('pages/home.html')
 
 
-@app.errorhandler(404)
+@routes.errorhandler(404)
 def not_found_error(error):
     return render_template('errors/404.html'), 404
 
-@app.errorhandler(500)
+@routes.errorhandler(500)
 def server_error(error):
     return render_template('errors/500.html'), 500
 
 
-if not app.debug:
-    file_handler = FileHandler('error.log')
-    file_handler.setFormatter(
-        Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
-    )
-    app.logger.setLevel(logging.INFO)
-    file_handler.setLevel(logging.INFO)
-    app.logger.addHandler(file_handler)
-    app.logger.info('errors')
-
 #----------------------------------------------------------------------------#
 # Launch.
 #----------------------------------------------------------------------------#
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000)
+    create_app().run(host='0.0.0.0', port=5000)
 
@@ -0,0 +1,246 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+import click
+from flask import current_app, request, send_file, send_from_directory, url_for
+from flask.cli import AppGroup
+from werkzeug.exceptions import NotFound
+from werkzeug.security import safe_join
+
+#----------------------------------------------------------------------------#
+# Static assets.
+#
+# `flask assets build` writes static/dist/: the BUNDLES concatenated (CSS
+# minified) and every other static file, all under content-hashed names,
+# with .gz (and .br, when the brotli package is installed) next to the text
+# files, and manifest.json mapping source names to built ones. Templates ask
+# for asset_url('img/front-splash.jpg') or asset_urls('css/app.css'); with a
+# manifest they get the hashed file, served by send_asset with an immutable
+# Cache-Control and the precompressed variant the client accepts. Without
+# one (development) they get the unbundled files under /static.
+#
+# Builds add files and never remove them unless --clean is given, so pages
+# still cached with the previous names keep working after a deploy.
+#----------------------------------------------------------------------------#
+
+BUNDLES = {
+    'css/app.css': [
+        'css/bootstrap.min.css',
+        'css/layout.main.css',
+        'css/main.css',
+        'css/main.responsive.css',
+        'css/main.quickfix.css',
+    ],
+    # loaded in <head>, before the page renders
+    'js/head.js': [
+        'js/libs/modernizr-2.8.2.min.js',
+    ],
+    # deferred, after jQuery
+    'js/app.js': [
+        'js/libs/moment.min.js',
+        'js/libs/bootstrap-3.1.1.min.js',
+        'js/plugins.js',
+        'js/script.js',
+    ],
+}
+
+DIST = 'dist'
+MANIFEST = 'manifest.json'
+COMPRESSIBLE = {'.css', '.js', '.map', '.svg', '.json', '.txt', '.ttf', '.otf', '.eot'}
+
+CSS_URL = re.compile(r'''url\(\s*(['"]?)([^'")]+)\1\s*\)''')
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def fingerprint(name, content):
+    root, ext = posixpath.splitext(name)
+    return f'{root}.{hashlib.sha1(content).hexdigest()[:12]}{ext}'
+
+
+def minify_css(text):
+    text = re.sub(r'/\*.*?\*/', '', text, flags=re.S)
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r'\s*([{};,])\s*', r'\1', text)
+    return text.replace(';}', '}').strip()
+
+
+def rewrite_css_urls(text, source, target, manifest):
+    """ Point source's relative url()s at the built files, relative to target.
+
+    References to files that are not built (e.g. missing fonts) are pointed
+    at the unbuilt path so they resolve exactly as before.
+    """
+    def replace(match):
+        url = match.group(2)
+        if url.startswith(('data:', '/', '#')) or '://' in url:
+            return match.group(0)
+        path = re.split(r'[?#]', url, maxsplit=1)[0]
+        suffix = url[len(path):]
+        name = posixpath.normpath(posixpath.join(posixpath.dirname(source), path))
+        built = manifest.get(name)
+        resolved = posixpath.join(DIST, built) if built else name
+        relative = posixpath.relpath(resolved, posixpath.dirname(posixpath.join(DIST, target)))
+        return f'url("{relative}{suffix}")'
+
+    return CSS_URL.sub(replace, text)
+
+
+def _write(dist, name, content):
+    path = os.path.join(dist, *name.split('/'))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if not os.path.exists(path):
+        with open(path, 'wb') as f:
+            f.write(content)
+    if posixpath.splitext(name)[1] in COMPRESSIBLE:
+        _precompress(path, content)
+
+
+def _precompress(path, content):
+    variants = [('.gz', gzip.compress(content, 9, mtime=0))]
+    if brotli is not None:
+        variants.append(('.br', brotli.compress(content)))
+    for suffix, compressed in variants:
+        if len(compressed) < len(content) and not os.path.exists(path + suffix):
+            with open(path + suffix, 'wb') as f:
+                f.write(compressed)
+
+
+def _sources(static_folder):
+    for directory, dirnames, filenames in os.walk(static_folder):
+        relative = os.path.relpath(directory, static_folder)
+        if relative == DIST:
+            dirnames[:] = []
+            continue
+        for filename in sorted(filenames):
+            if not filename.startswith('.'):
+                yield posixpath.normpath(posixpath.join(relative.replace(os.sep, '/'), filename))
+
+
+def _read(static_folder, name):
+    with open(os.path.join(static_folder, *name.split('/')), 'rb') as f:
+        return f.read()
+
+
+def build(static_folder, clean=False):
+    """Build static/dist and its manifest; returns the manifest."""
+    dist = os.path.join(static_folder, DIST)
+    manifest = {}
+    sources = sorted(_sources(static_folder))
+
+    # CSS last, so its url()s can point at the hashed fonts and images
+    for name in sorted(sources, key=lambda name: name.endswith('.css')):
+        content = _read(static_folder, name)
+        if name.endswith('.css'):
+            content = rewrite_css_urls(content.decode('utf-8'), name, name, manifest).encode('utf-8')
+        manifest[name] = fingerprint(name, content)
+        _write(dist, manifest[name], content)
+
+    for bundle, names in sorted(BUNDLES.items()):
+        parts = []
+        for name in names:
+            text = _read(static_folder, name).decode('utf-8')
+            if bundle.endswith('.css'):
+                text = rewrite_css_urls(text, name, bundle, manifest)
+                parts.append(text if name.endswith('.min.css') else minify_css(text))
+            else:
+                # a missing trailing semicolon must not join two scripts
+                parts.append(text.rstrip() + '\n;')
+        content = '\n'.join(parts).encode('utf-8')
+        manifest[bundle] = fingerprint(bundle, content)
+        _write(dist, manifest[bundle], content)
+
+    if clean:
+        keep = set(manifest.values())
+        for name in _sources(dist):
+            if re.sub(r'\.(gz|br)$', '', name) not in keep:
+                os.remove(os.path.join(dist, *name.split('/')))
+
+    path = os.path.join(dist, MANIFEST)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(path + '.tmp', path)
+    return manifest
+
+
+def load_manifest(static_folder):
+    try:
+        with open(os.path.join(static_folder, DIST, MANIFEST)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+#----------------------------------------------------------------------------#
+# Template helpers and the dist view.
+#----------------------------------------------------------------------------#
+
+def asset_url(name):
+    """URL of a static file, or of a bundle once built."""
+    built = current_app.extensions['assets'].get(name)
+    if built:
+        return url_for('send_asset', filename=built)
+    return url_for('static', filename=name)
+
+
+def asset_urls(name):
+    """URLs to include for a bundle: the built file, or its sources before a build."""
+    if name in current_app.extensions['assets'] or name not in BUNDLES:
+        return [asset_url(name)]
+    return [url_for('static', filename=source) for source in BUNDLES[name]]
+
+
+def send_asset(filename):
+    dist = os.path.join(current_app.static_folder, DIST)
+    path = safe_join(dist, filename)
+    if path is None:
+        raise NotFound()
+    accepted = request.accept_encodings
+    for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+        if accepted[encoding] and os.path.isfile(path + suffix):
+            response = send_file(path + suffix, mimetype=mimetypes.guess_type(path)[0],
+                                 conditional=True)
+            response.headers['Content-Encoding'] = encoding
+            break
+    else:
+        response = send_from_directory(dist, filename)
+    response.vary.add('Accept-Encoding')
+    # the name changes whenever the content does
+    response.headers['Cache-Control'] = 'public, max-age=%d, immutable' % current_app.config['ASSETS_MAX_AGE']
+    return response
+
+
+#----------------------------------------------------------------------------#
+# CLI.
+#----------------------------------------------------------------------------#
+
+assets_cli = AppGroup('assets', help='Build fingerprinted static assets.')
+
+
+@assets_cli.command('build')
+@click.option('--clean', is_flag=True, help='Remove built files the new manifest does not reference.')
+def build_command(clean):
+    """Bundle, fingerprint and precompress static/ into static/dist."""
+    manifest = build(current_app.static_folder, clean)
+    current_app.extensions['assets'] = manifest
+    dist = os.path.join(current_app.static_folder, DIST)
+    for bundle in sorted(BUNDLES):
+        size = os.path.getsize(os.path.join(dist, manifest[bundle]))
+        click.echo(f'{bundle} -> {manifest[bundle]} ({size} bytes)')
+    if brotli is None:
+        click.echo('brotli is not installed; wrote gzip variants only')
+
+
+def init_app(app):
+    app.config.setdefault('ASSETS_MAX_AGE', 365 * 24 * 3600)
+    app.extensions['assets'] = load_manifest(app.static_folder)
+    app.jinja_env.globals.update(asset_url=asset_url, asset_urls=asset_urls)
+    app.add_url_rule(f'{app.static_url_path}/{DIST}/<path:filename>', 'send_asset', send_asset)
+    app.cli.add_command(assets_cli)
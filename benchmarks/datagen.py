@@ -0,0 +1,257 @@
+""" Seeded synthetic venues, artists and shows.
+
+    python -m benchmarks.datagen --database-url postgresql://localhost/fyyur_bench --shows 100000
+
+States follow the US population (live music venues cluster where people
+live), genres follow a rough share of listening, and a few popular artists
+and busy venues get most of the shows (Zipf), so the long tails the pages
+have to cope with are there. The same seed and counts always produce the
+same rows.
+
+populate() empties venue, artist, show and the upcoming show feed first, so
+never point it at a database holding real data.
+"""
+import argparse
+import itertools
+import random
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from sqlalchemy import text
+
+from app import create_app
+from enums import Genre, State
+from models import db, Venue, Artist, Show
+import counters
+import facets
+import feed
+import search
+
+SEED = 42
+
+# 2020 census, millions
+STATE_WEIGHTS = {
+    'AL': 5.0, 'AK': 0.7, 'AZ': 7.2, 'AR': 3.0, 'CA': 39.5, 'CO': 5.8, 'CT': 3.6,
+    'DE': 1.0, 'DC': 0.7, 'FL': 21.5, 'GA': 10.7, 'HI': 1.5, 'ID': 1.8, 'IL': 12.8,
+    'IN': 6.8, 'IA': 3.2, 'KS': 2.9, 'KY': 4.5, 'LA': 4.7, 'ME': 1.4, 'MT': 1.1,
+    'NE': 2.0, 'NV': 3.1, 'NH': 1.4, 'NJ': 9.3, 'NM': 2.1, 'NY': 20.2, 'NC': 10.4,
+    'ND': 0.8, 'OH': 11.8, 'OK': 4.0, 'OR': 4.2, 'MD': 6.2, 'MA': 7.0, 'MI': 10.1,
+    'MN': 5.7, 'MS': 3.0, 'MO': 6.2, 'PA': 13.0, 'RI': 1.1, 'SC': 5.1, 'SD': 0.9,
+    'TN': 6.9, 'TX': 29.1, 'UT': 3.3, 'VT': 0.6, 'VA': 8.6, 'WA': 7.7, 'WV': 1.8,
+    'WI': 5.9, 'WY': 0.6,
+}
+
+# biggest first; the first city of a state gets the most rows
+CITIES = {
+    'CA': ['Los Angeles', 'San Francisco', 'San Diego', 'Oakland', 'Sacramento'],
+    'TX': ['Austin', 'Houston', 'Dallas', 'San Antonio'],
+    'FL': ['Miami', 'Orlando', 'Tampa', 'Jacksonville'],
+    'NY': ['New York', 'Brooklyn', 'Buffalo', 'Rochester'],
+    'IL': ['Chicago', 'Springfield'],
+    'PA': ['Philadelphia', 'Pittsburgh'],
+    'GA': ['Atlanta', 'Athens', 'Savannah'],
+    'TN': ['Nashville', 'Memphis', 'Knoxville'],
+    'LA': ['New Orleans', 'Baton Rouge', 'Lafayette'],
+    'WA': ['Seattle', 'Spokane', 'Tacoma'],
+    'OR': ['Portland', 'Eugene'],
+    'CO': ['Denver', 'Boulder'],
+    'MA': ['Boston', 'Cambridge'],
+    'MN': ['Minneapolis', 'Saint Paul'],
+    'MI': ['Detroit', 'Ann Arbor', 'Grand Rapids'],
+    'OH': ['Columbus', 'Cleveland', 'Cincinnati'],
+    'NC': ['Charlotte', 'Raleigh', 'Asheville'],
+}
+# everywhere else
+TOWNS = ['Springfield', 'Franklin', 'Greenville', 'Madison', 'Clinton', 'Salem']
+
+GENRE_WEIGHTS = {
+    'RocknRoll': 20, 'Pop': 16, 'HipHop': 15, 'RnB': 9, 'Alternative': 8,
+    'Electronic': 7, 'Jazz': 5, 'Blues': 4, 'Folk': 4, 'Soul': 4, 'HeavyMetal': 4,
+    'Punk': 3, 'Classical': 3, 'Reggae': 2, 'Funk': 2, 'Instrumental': 2,
+    'MusicalTheatre': 1, 'Other': 2,
+}
+# how many genres a venue or artist lists
+GENRE_COUNTS = {1: 55, 2: 35, 3: 10}
+
+ADJECTIVES = ['Blue', 'Velvet', 'Golden', 'Electric', 'Crimson', 'Silver', 'Midnight',
+              'Rusty', 'Lucky', 'Wild', 'Neon', 'Hollow', 'Broken', 'Little', 'Royal']
+NOUNS = ['Note', 'Room', 'Hall', 'Lounge', 'Cellar', 'Garage', 'Palace', 'Tavern',
+         'Owls', 'Horses', 'Saints', 'Wolves', 'Echoes', 'Rivers', 'Machines']
+VENUE_KINDS = ['Club', 'Theatre', 'Bar', 'Ballroom', 'Music Hall', 'Social Club']
+STREETS = ['Main St', 'Broadway', 'Market St', 'Oak Ave', 'Church St', '2nd Ave']
+FIRST_NAMES = ['Ana', 'Ben', 'Cleo', 'Dev', 'Etta', 'Finn', 'Gus', 'Hana', 'Ike', 'June',
+               'Kofi', 'Lena', 'Milo', 'Nina', 'Otis', 'Pia', 'Ray', 'Sade', 'Theo', 'Zoe']
+LAST_NAMES = ['Adams', 'Brooks', 'Cruz', 'Diaz', 'Evans', 'Fox', 'Gray', 'Hale', 'Ito',
+              'James', 'Khan', 'Lee', 'Moss', 'Nash', 'Owens', 'Park', 'Reyes', 'Stone']
+
+
+def sizes(shows):
+    """(venues, artists, shows) for a catalog of that many shows."""
+    return max(10, shows // 50), max(10, shows // 20), shows
+
+
+def weighted(rng, weights):
+    population = list(weights)
+    cum_weights = list(itertools.accumulate(weights.values()))
+    return lambda: rng.choices(population, cum_weights=cum_weights)[0]
+
+
+def zipf(rng, n, s=1.1):
+    """Picks from 1..n, 1 the most often."""
+    cum_weights = list(itertools.accumulate(1 / rank ** s for rank in range(1, n + 1)))
+    return lambda k: rng.choices(range(1, n + 1), cum_weights=cum_weights, k=k)
+
+
+class Generator(object):
+
+    def __init__(self, seed=SEED):
+        self.rng = random.Random(seed)
+        states = {state.value: STATE_WEIGHTS.get(state.value, 1.0) for state in State}
+        self.state = weighted(self.rng, states)
+        self.genre_count = weighted(self.rng, GENRE_COUNTS)
+        self.genre_weights = {genre.value: GENRE_WEIGHTS.get(genre.value, 1) for genre in Genre}
+
+    def genres(self):
+        weights = dict(self.genre_weights)
+        picked = []
+        for _ in range(self.genre_count()):
+            genre = weighted(self.rng, weights)()
+            picked.append(genre)
+            del weights[genre]
+        return picked
+
+    def area(self):
+        state = self.state()
+        cities = CITIES.get(state, TOWNS)
+        city = self.rng.choices(cities, weights=[1 / rank for rank in range(1, len(cities) + 1)])[0]
+        return city, state
+
+    def phone(self):
+        rng = self.rng
+        return f'{rng.randint(200, 989)}-{rng.randint(200, 999)}-{rng.randint(0, 9999):04d}'
+
+    def links(self, name):
+        slug = ''.join(ch for ch in name.lower() if ch.isalnum())
+        return {
+            'image_link': f'https://images.example.com/{slug}.jpg',
+            'facebook_link': f'https://www.facebook.com/{slug}',
+            'website': f'https://{slug}.example.com',
+        }
+
+    def venue(self):
+        rng = self.rng
+        city, state = self.area()
+        name = f'The {rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {rng.choice(VENUE_KINDS)}'
+        seeking = rng.random() < 0.3
+        return dict(self.links(name),
+                    name=name, city=city, state=state, genres=self.genres(),
+                    address=f'{rng.randint(1, 9999)} {rng.choice(STREETS)}', phone=self.phone(),
+                    seeking_talent=seeking,
+                    seeking_description='Looking for local acts on weeknights.' if seeking else None)
+
+    def artist(self):
+        rng = self.rng
+        if rng.random() < 0.4:
+            name = f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}'
+        else:
+            name = f'The {rng.choice(ADJECTIVES)} {rng.choice(NOUNS)}'
+        city, state = self.area()
+        seeking = rng.random() < 0.4
+        return dict(self.links(name),
+                    name=name, city=city, state=state, genres=self.genres(), phone=self.phone(),
+                    seeking_venue=seeking,
+                    seeking_description='Booking a tour for next season.' if seeking else None)
+
+    def start_time(self, now):
+        """Mostly past shows over five years, a fifth in the coming year, evenings."""
+        rng = self.rng
+        days = rng.randint(1, 365) if rng.random() < 0.2 else -rng.randint(0, 5 * 365)
+        day = (now + timedelta(days=days)).replace(hour=0, minute=0, second=0, microsecond=0)
+        return day + timedelta(hours=rng.randint(19, 22), minutes=rng.choice((0, 30)))
+
+    def shows(self, venues, artists, n, now):
+        """n shows between venue ids 1..venues and artist ids 1..artists."""
+        venue_ids = zipf(self.rng, venues)(n)
+        artist_ids = zipf(self.rng, artists)(n)
+        # popular ranks are spread over the id range, not all at the low ids
+        venue_map = self.rng.sample(range(1, venues + 1), venues)
+        artist_map = self.rng.sample(range(1, artists + 1), artists)
+        for venue_id, artist_id in zip(venue_ids, artist_ids):
+            yield {
+                'venue_id': venue_map[venue_id - 1],
+                'artist_id': artist_map[artist_id - 1],
+                'start_time': self.start_time(now),
+            }
+
+
+def clear():
+    """Empty the catalog tables and restart their ids at 1."""
+    if db.session.connection().dialect.name == 'postgresql':
+        db.session.execute(text('TRUNCATE upcoming_show_feed, show, venue, artist RESTART IDENTITY CASCADE'))
+        return
+    # SQLite hands out max(id) + 1, so empty tables start again at 1
+    for table in ('upcoming_show_feed', 'show', 'venue', 'artist'):
+        db.session.execute(text(f'DELETE FROM {table}'))
+    for model in search.SEARCHABLE:
+        db.session.execute(text(f'DELETE FROM {search.fts_table(model)}'))
+
+
+def _insert_batches(model, rows, batch):
+    while True:
+        chunk = list(itertools.islice(rows, batch))
+        if not chunk:
+            return
+        db.session.execute(model.__table__.insert(), chunk)
+
+
+def _documented(rows):
+    for row in rows:
+        row['search_text'] = search.search_document(SimpleNamespace(**row))
+        row['genre_mask'] = facets.genre_mask(row['genres'])
+        yield row
+
+
+def populate(shows, venues=None, artists=None, seed=SEED, batch=10000, now=None):
+    """ Replace the catalog with generated rows and commit.
+
+    Venue and artist counts default to sizes(shows). Counters, the search
+    index and the upcoming show feed are brought up to date, and the tables
+    are analyzed. Returns the (venues, artists, shows) counts.
+    """
+    default_venues, default_artists, _ = sizes(shows)
+    venues, artists = venues or default_venues, artists or default_artists
+    now = now or datetime.now()
+    generator = Generator(seed)
+
+    clear()
+    _insert_batches(Venue, _documented(generator.venue() for _ in range(venues)), batch)
+    _insert_batches(Artist, _documented(generator.artist() for _ in range(artists)), batch)
+    for model in search.SEARCHABLE:
+        search.mirror_inserted(model)
+    _insert_batches(Show, generator.shows(venues, artists, shows, now), batch)
+    counters.refresh_counters(now=now)
+    feed.rebuild(now)
+    db.session.commit()
+
+    db.session.execute(text('ANALYZE'))
+    db.session.commit()
+    return venues, artists, shows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-url', required=True,
+                        help='the catalog tables in this database are emptied first')
+    parser.add_argument('--shows', type=int, default=100000)
+    parser.add_argument('--venues', type=int, help='defaults to shows / 50')
+    parser.add_argument('--artists', type=int, help='defaults to shows / 20')
+    parser.add_argument('--seed', type=int, default=SEED)
+    args = parser.parse_args()
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': args.database_url, 'SQLALCHEMY_ECHO': False})
+    with app.app_context():
+        counts = populate(args.shows, args.venues, args.artists, seed=args.seed)
+    print('venues={} artists={} shows={}'.format(*counts))
+
+
+if __name__ == '__main__':
+    main()
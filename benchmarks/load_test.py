@@ -0,0 +1,126 @@
+""" Compare throughput and tail latency of gunicorn configurations.
+
+Start each configuration against the same database, with CACHE_ENABLED =
+False so every request reaches it, then point the harness at them:
+
+    gunicorn -c gunicorn.conf.py -w 4 -b 127.0.0.1:5000
+    gunicorn -c gunicorn.conf.py -w 4 --threads 8 -b 127.0.0.1:5001
+    python -m benchmarks.load_test --target workers=http://127.0.0.1:5000 \\
+        --target threads=http://127.0.0.1:5001 --clients 500 --seconds 30
+
+Each client holds one keep-alive connection and requests the read paths in
+random order; requests/sec, p50/p99 latency and errors are reported per
+target. The client is a single asyncio process, so watch its CPU: when it
+is saturated the numbers measure the harness, not the server.
+"""
+import argparse
+import asyncio
+import random
+import time
+from urllib.parse import urlsplit
+
+
+PATHS = [
+    '/venues',
+    '/artists',
+    '/shows',
+    '/venues/search?search_term=the',
+    '/artists/search?search_term=the',
+    '/venues/1',
+    '/artists/1',
+]
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def read_response(reader):
+    """Return (status, body length) of one HTTP/1.1 response."""
+    status = int((await reader.readline()).split()[1])
+    length, chunked = None, False
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin1').partition(':')
+        name = name.strip().lower()
+        if name == 'content-length':
+            length = int(value)
+        elif name == 'transfer-encoding' and 'chunked' in value.lower():
+            chunked = True
+    if chunked:
+        size = total = 0
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            total += size
+            if size == 0:
+                return status, total
+    await reader.readexactly(length or 0)
+    return status, length or 0
+
+
+async def client(host, port, paths, deadline, latencies, errors, rng):
+    reader = writer = None
+    while time.perf_counter() < deadline:
+        path = rng.choice(paths)
+        started = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(host, port)
+            writer.write(f'GET {path} HTTP/1.1\r\nHost: {host}\r\n\r\n'.encode())
+            status, _ = await read_response(reader)
+            if status >= 500:
+                errors.append(status)
+            else:
+                latencies.append(time.perf_counter() - started)
+        except (OSError, asyncio.IncompleteReadError, ValueError, IndexError) as e:
+            errors.append(type(e).__name__)
+            if writer is not None:
+                writer.close()
+            reader = writer = None
+    if writer is not None:
+        writer.close()
+
+
+async def run(url, clients, seconds, paths, seed):
+    parts = urlsplit(url)
+    host, port = parts.hostname, parts.port or 80
+    latencies, errors = [], []
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    deadline = started + seconds
+    await asyncio.gather(*[
+        client(host, port, paths, deadline, latencies, errors, random.Random(rng.random()))
+        for _ in range(clients)])
+    return latencies, errors, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--target', action='append', required=True, metavar='NAME=URL')
+    parser.add_argument('--clients', type=int, default=500)
+    parser.add_argument('--seconds', type=float, default=30)
+    parser.add_argument('--warmup', type=float, default=5)
+    parser.add_argument('--path', action='append', dest='paths',
+                        help='Path to request; repeat for several. Defaults to the hot read paths.')
+    args = parser.parse_args()
+
+    for target in args.target:
+        name, _, url = target.partition('=')
+        if args.warmup:
+            asyncio.run(run(url, min(args.clients, 50), args.warmup, args.paths or PATHS, 0))
+        latencies, errors, elapsed = asyncio.run(
+            run(url, args.clients, args.seconds, args.paths or PATHS, 1))
+        if not latencies:
+            print(f'{name:<8} no successful requests, errors={len(errors)}')
+            continue
+        p50, p99 = (percentile(latencies, pct) * 1000 for pct in (50, 99))
+        print(f'{name:<8} clients={args.clients} rps={len(latencies) / elapsed:.1f} '
+              f'p50={p50:.1f}ms p99={p99:.1f}ms errors={len(errors)}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+""" Benchmark rendering show tiles through the `datetime` Jinja filter.
+
+Renders pages/venue_show_tiles.html for --tiles shows twice: the legacy
+way (start_time pre-formatted with strftime, parsed back by dateutil and
+formatted by babel on every row) and the current way (datetimes passed
+straight to the filter, babel pattern compiled once).
+
+    python -m benchmarks.render_tiles --tiles 10000
+
+No database is needed.
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+import dateutil.parser
+import babel.dates
+from flask import render_template
+
+from app import create_app, format_datetime
+
+
+def legacy_format_datetime(value, format='medium'):
+    """The pre-datetime filter, kept here for comparison."""
+    date = dateutil.parser.parse(value)
+    if format == 'full':
+        format = "EEEE MMMM, d, y 'at' h:mma"
+    elif format == 'medium':
+        format = "EE MM, dd, y h:mma"
+    return babel.dates.format_datetime(date, format, locale='en')
+
+
+def tiles(count):
+    start = datetime(2021, 1, 1, 20, 0)
+    return [{
+        'artist_id': i,
+        'artist_name': f'Artist {i}',
+        'artist_image_link': f'https://example.com/{i}.jpg',
+        'start_time': start + timedelta(hours=i),
+    } for i in range(count)]
+
+
+def measure(label, shows, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        render_template('pages/venue_show_tiles.html', shows=shows,
+                        next_cursor=None, venue_id=1, when='upcoming')
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    print(f'{label:<10} tiles={len(shows):<8} seconds={best:.3f}')
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tiles', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    shows = tiles(args.tiles)
+    legacy_shows = [dict(show, start_time=show['start_time'].strftime('%m/%d/%Y, %H:%M'))
+                    for show in shows]
+
+    app = create_app({'SQLALCHEMY_ECHO': False})
+    with app.test_request_context():
+        app.jinja_env.filters['datetime'] = legacy_format_datetime
+        try:
+            legacy = measure('legacy', legacy_shows, args.repeat)
+        finally:
+            app.jinja_env.filters['datetime'] = format_datetime
+        current = measure('current', shows, args.repeat)
+
+    print(f'speedup    {legacy / current:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
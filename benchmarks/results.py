@@ -0,0 +1,154 @@
+""" Stored benchmark runs, compared to flag latency regressions.
+
+    python -m benchmarks.results list
+    python -m benchmarks.results compare [--baseline RUN] [--run RUN]
+
+Every run of benchmarks.scenarios is saved as one JSON file in RESULTS_DIR
+(benchmarks/results, or $BENCH_RESULTS_DIR). compare checks a run (the
+latest by default) against a baseline (the run before it on the same
+database and driver by default): a scenario regressed when its p95 grew by
+more than --threshold and by at least --min-ms, or when it issues more
+queries than before. Exits 1 when anything regressed.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from datetime import datetime
+
+RESULTS_DIR = os.environ.get('BENCH_RESULTS_DIR',
+                             os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results'))
+
+
+def _git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def new_run(database, driver, scales):
+    """A run record; fill run['results'][scenario][str(scale)] with stats and save() it."""
+    created = datetime.now()
+    revision = _git_revision()
+    return {
+        'id': f'{created:%Y%m%dT%H%M%S}-{revision}',
+        'created': created.isoformat(timespec='seconds'),
+        'revision': revision,
+        'database': database,
+        'driver': driver,
+        'scales': scales,
+        'results': {},
+    }
+
+
+def save(run, directory=RESULTS_DIR):
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, run['id'] + '.json'), 'w') as f:
+        json.dump(run, f, indent=1, sort_keys=True)
+
+
+def runs(directory=RESULTS_DIR):
+    """Every stored run, oldest first."""
+    if not os.path.isdir(directory):
+        return []
+    found = []
+    for name in sorted(os.listdir(directory)):
+        if name.endswith('.json'):
+            with open(os.path.join(directory, name)) as f:
+                found.append(json.load(f))
+    return found
+
+
+def find(run_id, directory=RESULTS_DIR):
+    """The stored run whose id starts with run_id."""
+    matches = [run for run in runs(directory) if run['id'].startswith(run_id)]
+    if len(matches) != 1:
+        raise LookupError(f'{len(matches)} stored runs match {run_id!r}')
+    return matches[0]
+
+
+def baseline_for(run, directory=RESULTS_DIR):
+    """The latest earlier run on the same database and driver, or None."""
+    earlier = [other for other in runs(directory)
+               if other['id'] < run['id']
+               and (other['database'], other['driver']) == (run['database'], run['driver'])]
+    return earlier[-1] if earlier else None
+
+
+def compare(baseline, run, threshold=0.25, min_ms=2.0):
+    """ Yield (scenario, scale, before, after, verdict) for every measurement in run.
+
+    verdict is 'regressed', 'improved', 'ok' or 'new'.
+    """
+    for scenario, by_scale in sorted(run['results'].items()):
+        for scale, after in sorted(by_scale.items(), key=lambda item: int(item[0])):
+            before = baseline['results'].get(scenario, {}).get(scale)
+            if before is None:
+                yield scenario, scale, None, after, 'new'
+                continue
+            grown = after['p95_ms'] - before['p95_ms']
+            if (grown > before['p95_ms'] * threshold and grown >= min_ms) \
+                    or after.get('queries', 0) > before.get('queries', 0):
+                verdict = 'regressed'
+            elif -grown > before['p95_ms'] * threshold and -grown >= min_ms:
+                verdict = 'improved'
+            else:
+                verdict = 'ok'
+            yield scenario, scale, before, after, verdict
+
+
+def report(baseline, run, threshold=0.25, min_ms=2.0, out=sys.stdout):
+    """Print the comparison; returns the number of regressions."""
+    print(f'{run["id"]} against {baseline["id"]} '
+          f'({run["database"]}, {run["driver"]}, p95 +{threshold:.0%} and +{min_ms}ms)', file=out)
+    if (baseline['database'], baseline['driver']) != (run['database'], run['driver']):
+        print('warning: the runs used different databases or drivers', file=out)
+    regressions = 0
+    for scenario, scale, before, after, verdict in compare(baseline, run, threshold, min_ms):
+        if verdict == 'ok':
+            continue
+        regressions += verdict == 'regressed'
+        was = f'{before["p95_ms"]:.1f}ms/{before.get("queries", "?")}q' if before else '-'
+        print(f'{verdict:<10} {scenario:<28} {scale:>8} rows  p95 {was} -> '
+              f'{after["p95_ms"]:.1f}ms/{after.get("queries", "?")}q', file=out)
+    if not regressions:
+        print('no regressions', file=out)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--dir', default=RESULTS_DIR)
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('list')
+    compare_parser = commands.add_parser('compare')
+    compare_parser.add_argument('--run', help='run id or prefix; defaults to the latest')
+    compare_parser.add_argument('--baseline', help='defaults to the previous comparable run')
+    compare_parser.add_argument('--threshold', type=float, default=0.25)
+    compare_parser.add_argument('--min-ms', type=float, default=2.0)
+    args = parser.parse_args()
+
+    stored = runs(args.dir)
+    if args.command == 'list':
+        for run in stored:
+            print(f'{run["id"]}  {run["database"]:<10} {run["driver"]:<7} '
+                  f'scales={",".join(map(str, run["scales"]))}')
+        return
+
+    try:
+        run = find(args.run, args.dir) if args.run else (stored[-1] if stored else None)
+        if run is None:
+            sys.exit('no stored runs')
+        baseline = find(args.baseline, args.dir) if args.baseline else baseline_for(run, args.dir)
+    except LookupError as e:
+        sys.exit(str(e))
+    if baseline is None:
+        sys.exit(f'no earlier {run["database"]} / {run["driver"]} run to compare {run["id"]} with')
+    sys.exit(1 if report(baseline, run, args.threshold, args.min_ms) else 0)
+
+
+if __name__ == '__main__':
+    main()
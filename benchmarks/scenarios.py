@@ -0,0 +1,258 @@
+""" Latency of every app.py route against growing generated catalogs.
+
+    python -m benchmarks.scenarios --database-url postgresql://localhost/fyyur_bench \\
+        --scales 1000,10000,100000
+
+For each scale (number of shows; venues and artists follow datagen.sizes)
+the database is repopulated by benchmarks.datagen and every scenario is
+requested through the Flask test client, reporting p50/p95 latency and the
+queries issued. The table printed at the end is each endpoint's scaling
+curve; growth is the log-log slope of p50 over the scales, so ~0 means the
+page does not care how big the catalog is and ~1 means it grows linearly.
+
+With --http URL the read scenarios are instead driven over HTTP against a
+running server (pointed at the same database, CACHE_ENABLED = False) by the
+benchmarks.load_test client.
+
+The run is stored (see benchmarks.results) and compared with the previous
+run on the same database; the exit status is 1 when a scenario regressed.
+A route in app.py without a scenario is an error, so new pages get one.
+"""
+import argparse
+import asyncio
+import math
+import random
+import sys
+import time
+from collections import namedtuple
+from datetime import datetime
+from urllib.parse import urlencode
+from sqlalchemy.engine import make_url
+
+from app import create_app
+from bulk import formdata
+from benchmarks import datagen, load_test, results
+
+# consumes: 'venue' / 'artist' for scenarios that delete one per request
+Scenario = namedtuple('Scenario', 'name endpoint method path data consumes')
+
+
+def scenario(name, endpoint, path, method='GET', data=None, consumes=None):
+    return Scenario(name, endpoint, method, path, data, consumes)
+
+
+class Dataset(object):
+    """Ids and form data for scenarios, drawn from the generated catalog."""
+
+    def __init__(self, venues, artists, shows, seed=datagen.SEED):
+        self.venues, self.artists, self.shows = venues, artists, shows
+        self.rng = random.Random(seed)
+        self.generator = datagen.Generator(seed + 1)
+        self.genre = datagen.weighted(self.rng, datagen.GENRE_WEIGHTS)
+        self.state = datagen.weighted(self.rng, datagen.STATE_WEIGHTS)
+        # deletes count down from the highest ids, leaving at least half
+        self.doomed = {'venue': venues, 'artist': artists}
+
+    def venue_id(self):
+        return self.rng.randint(1, self.venues)
+
+    def artist_id(self):
+        return self.rng.randint(1, self.artists)
+
+    def term(self):
+        return self.rng.choice(datagen.ADJECTIVES + datagen.NOUNS).lower()
+
+    def facets(self):
+        """A query string for one or two weighted genres, in a weighted state half the time."""
+        genres = {self.genre() for _ in range(self.rng.randint(1, 2))}
+        args = [('genre', genre) for genre in sorted(genres)]
+        if self.rng.random() < 0.5:
+            args.append(('state', self.state()))
+        return urlencode(args)
+
+    def spare(self, kind):
+        return self.doomed[kind] - getattr(self, kind + 's') // 2
+
+    def take(self, kind):
+        self.doomed[kind] -= 1
+        return self.doomed[kind] + 1
+
+    def show_form(self):
+        start_time = self.generator.start_time(datetime.now())
+        return {'venue_id': self.venue_id(), 'artist_id': self.artist_id(),
+                'start_time': start_time.strftime('%Y-%m-%d %H:%M:%S')}
+
+
+SCENARIOS = [
+    scenario('home', 'index', lambda ds: '/'),
+    scenario('venues', 'venues', lambda ds: '/venues'),
+    scenario('search_venues', 'search_venues', lambda ds: f'/venues/search?search_term={ds.term()}'),
+    scenario('search_venues_post', 'search_venues', lambda ds: '/venues/search', 'POST',
+             lambda ds: {'search_term': ds.term()}),
+    scenario('browse_venues', 'browse_venues', lambda ds: f'/venues/browse?{ds.facets()}'),
+    scenario('show_venue', 'show_venue', lambda ds: f'/venues/{ds.venue_id()}'),
+    scenario('venue_upcoming_shows', 'venue_show_tiles', lambda ds: f'/venues/{ds.venue_id()}/shows/upcoming'),
+    scenario('venue_past_shows', 'venue_show_tiles', lambda ds: f'/venues/{ds.venue_id()}/shows/past'),
+    scenario('artists', 'artists', lambda ds: '/artists'),
+    scenario('search_artists', 'search_artists', lambda ds: f'/artists/search?search_term={ds.term()}'),
+    scenario('search_artists_post', 'search_artists', lambda ds: '/artists/search', 'POST',
+             lambda ds: {'search_term': ds.term()}),
+    scenario('browse_artists', 'browse_artists', lambda ds: f'/artists/browse?{ds.facets()}'),
+    scenario('show_artist', 'show_artist', lambda ds: f'/artists/{ds.artist_id()}'),
+    scenario('artist_upcoming_shows', 'artist_show_tiles', lambda ds: f'/artists/{ds.artist_id()}/shows/upcoming'),
+    scenario('artist_past_shows', 'artist_show_tiles', lambda ds: f'/artists/{ds.artist_id()}/shows/past'),
+    scenario('shows', 'shows', lambda ds: '/shows'),
+    scenario('create_venue_form', 'create_venue_form', lambda ds: '/venues/create'),
+    scenario('create_artist_form', 'create_artist_form', lambda ds: '/artists/create'),
+    scenario('create_show_form', 'create_shows', lambda ds: '/shows/create'),
+    scenario('edit_venue_form', 'edit_venue', lambda ds: f'/venues/{ds.venue_id()}/edit'),
+    scenario('edit_artist_form', 'edit_artist', lambda ds: f'/artists/{ds.artist_id()}/edit'),
+    # writes, after the reads so those see the generated catalog unchanged
+    scenario('create_venue', 'create_venue_submission', lambda ds: '/venues/create', 'POST',
+             lambda ds: formdata(ds.generator.venue())),
+    scenario('create_artist', 'create_artist_submission', lambda ds: '/artists/create', 'POST',
+             lambda ds: formdata(ds.generator.artist())),
+    scenario('create_show', 'create_show_submission', lambda ds: '/shows/create', 'POST',
+             lambda ds: ds.show_form()),
+    scenario('edit_venue', 'edit_venue_submission', lambda ds: f'/venues/{ds.venue_id()}/edit', 'POST',
+             lambda ds: formdata(ds.generator.venue())),
+    scenario('edit_artist', 'edit_artist_submission', lambda ds: f'/artists/{ds.artist_id()}/edit', 'POST',
+             lambda ds: formdata(ds.generator.artist())),
+    scenario('delete_venue', 'delete_venue', lambda ds: f'/venues/{ds.take("venue")}/delete', 'POST',
+             consumes='venue'),
+    scenario('delete_artist', 'delete_artist', lambda ds: f'/artists/{ds.take("artist")}/delete', 'POST',
+             consumes='artist'),
+]
+
+
+def uncovered(app):
+    """Endpoints defined in app.py that no scenario requests."""
+    endpoints = {endpoint for endpoint, view in app.view_functions.items() if view.__module__ == 'app'}
+    return endpoints - {scenario.endpoint for scenario in SCENARIOS}
+
+
+def stats(latencies, **extra):
+    return dict(extra,
+                n=len(latencies),
+                p50_ms=round(load_test.percentile(latencies, 50) * 1000, 3),
+                p95_ms=round(load_test.percentile(latencies, 95) * 1000, 3),
+                mean_ms=round(sum(latencies) / len(latencies) * 1000, 3))
+
+
+def measure_client(client, scenario, ds, requests, warmup):
+    if scenario.consumes:
+        budget = ds.spare(scenario.consumes)
+        warmup, requests = min(warmup, budget // 2), min(requests, budget - min(warmup, budget // 2))
+        if not requests:
+            return None
+    latencies, queries, errors = [], [], 0
+    for i in range(warmup + requests):
+        path = scenario.path(ds)
+        data = scenario.data(ds) if scenario.data else None
+        started = time.perf_counter()
+        response = client.open(path, method=scenario.method, data=data)
+        elapsed = time.perf_counter() - started
+        if i < warmup:
+            continue
+        latencies.append(elapsed)
+        queries.append(int(response.headers.get('X-Query-Count', 0)))
+        errors += response.status_code >= 400
+    return stats(latencies, queries=sorted(queries)[len(queries) // 2], errors=errors)
+
+
+def measure_http(url, scenario, ds, clients, seconds, seed):
+    if scenario.method != 'GET':
+        return None
+    paths = [scenario.path(ds) for _ in range(100)]
+    latencies, errors, elapsed = asyncio.run(load_test.run(url, clients, seconds, paths, seed))
+    if not latencies:
+        return {'n': 0, 'errors': len(errors), 'p50_ms': 0, 'p95_ms': 0, 'mean_ms': 0}
+    return stats(latencies, errors=len(errors), rps=round(len(latencies) / elapsed, 1))
+
+
+def growth(points):
+    """Least-squares slope of log(p50) against log(rows)."""
+    points = [(math.log(rows), math.log(max(p50, 1e-3))) for rows, p50 in points]
+    if len(points) < 2:
+        return None
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    spread = sum((x - mean_x) ** 2 for x, _ in points)
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / spread
+
+
+def print_curves(run):
+    scales = run['scales']
+    print()
+    print(f'{"p50 ms by shows":<28}' + ''.join(f'{scale:>10}' for scale in scales) + '    growth')
+    for name, by_scale in run['results'].items():
+        cells = [by_scale.get(str(scale)) for scale in scales]
+        slope = growth([(scale, cell['p50_ms']) for scale, cell in zip(scales, cells) if cell])
+        print(f'{name:<28}' + ''.join(f'{cell["p50_ms"]:>10.2f}' if cell else f'{"-":>10}' for cell in cells)
+              + (f'{slope:>10.2f}' if slope is not None else ''))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-url', required=True,
+                        help='the catalog tables in this database are replaced for every scale')
+    parser.add_argument('--scales', default='1000,10000,100000', help='comma separated show counts')
+    parser.add_argument('--requests', type=int, default=50, help='timed requests per scenario')
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=datagen.SEED)
+    parser.add_argument('--only', action='append', metavar='SCENARIO', help='repeat for several')
+    parser.add_argument('--cache', action='store_true', help='keep the page cache enabled')
+    parser.add_argument('--http', metavar='URL', help='drive a running server instead of the test client')
+    parser.add_argument('--clients', type=int, default=50)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--no-save', action='store_true')
+    parser.add_argument('--threshold', type=float, default=0.25)
+    parser.add_argument('--min-ms', type=float, default=2.0)
+    args = parser.parse_args()
+
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': args.database_url,
+        'SQLALCHEMY_ECHO': False,
+        'QUERY_STATS_HEADERS': True,
+        'WTF_CSRF_ENABLED': False,
+    })
+    missing = uncovered(app)
+    if missing:
+        sys.exit(f'no benchmark scenario for: {", ".join(sorted(missing))}')
+    scenarios = [s for s in SCENARIOS if not args.only or s.name in args.only]
+    scales = [int(scale) for scale in args.scales.split(',')]
+
+    if not args.cache:
+        app.extensions.pop('cache', None)
+    client = app.test_client()
+
+    run = results.new_run(make_url(args.database_url).get_backend_name(),
+                          'http' if args.http else 'client', scales)
+    for scale in scales:
+        with app.app_context():
+            counts = datagen.populate(scale, seed=args.seed)
+        print('venues={} artists={} shows={}'.format(*counts))
+        ds = Dataset(*counts, seed=args.seed)
+        for scenario in scenarios:
+            if args.http:
+                measured = measure_http(args.http, scenario, ds, args.clients, args.seconds, args.seed)
+            else:
+                measured = measure_client(client, scenario, ds, args.requests, args.warmup)
+            if measured is None:
+                continue
+            run['results'].setdefault(scenario.name, {})[str(scale)] = measured
+            print(f'  {scenario.name:<26} p50={measured["p50_ms"]:.2f}ms p95={measured["p95_ms"]:.2f}ms '
+                  f'queries={measured.get("queries", "-")} errors={measured["errors"]}')
+
+    print_curves(run)
+    if args.no_save:
+        return
+    results.save(run)
+    print(f'\nsaved {run["id"]}')
+    baseline = results.baseline_for(run)
+    if baseline is not None:
+        sys.exit(1 if results.report(baseline, run, args.threshold, args.min_ms) else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+""" Benchmark venue search latency against a large catalog.
+
+    python -m benchmarks.search --database-url postgresql://localhost/fyyur_bench --seed
+
+Runs random substring searches through search.search and reports latency
+percentiles; exits non-zero when p95 is above --target-ms. --seed truncates
+the venue table (and its shows) first; on SQLite it also creates the tables
+and fills the FTS5 mirror.
+"""
+import argparse
+import random
+import sys
+import time
+
+from app import create_app
+from models import db, Venue
+from search import fts_table, mirror_inserted, search, search_document
+from benchmarks.venue_areas import CITIES
+import facets
+
+WORDS = ['blue', 'note', 'fillmore', 'hall', 'club', 'lounge', 'room', 'theatre',
+         'garage', 'cellar', 'palace', 'house', 'tavern', 'arena', 'bowl', 'stage']
+GENRES = ['Jazz', 'Blues', 'Folk', 'Funk', 'Soul', 'Punk', 'Pop', 'RocknRoll']
+
+
+class Row(object):
+    def __init__(self, **kw):
+        self.__dict__.update(kw)
+
+
+def seed(rows, batch=20000):
+    rng = random.Random(7)
+    sqlite = db.engine.dialect.name == 'sqlite'
+    if sqlite:
+        db.create_all()
+        db.session.execute('DELETE FROM show')
+        db.session.execute('DELETE FROM venue')
+        db.session.execute(f'DELETE FROM {fts_table(Venue)}')
+    else:
+        db.session.execute('TRUNCATE show, venue RESTART IDENTITY CASCADE')
+    for start in range(0, rows, batch):
+        values = []
+        for i in range(start, min(start + batch, rows)):
+            city, state = rng.choice(CITIES)
+            venue = Row(name=f'The {rng.choice(WORDS).title()} {rng.choice(WORDS).title()} {i}',
+                        city=city, state=state, genres=rng.sample(GENRES, 2))
+            values.append(dict(venue.__dict__, search_text=search_document(venue),
+                               genre_mask=facets.genre_mask(venue.genres)))
+        db.session.execute(Venue.__table__.insert(), values)
+        db.session.commit()
+    if sqlite:
+        mirror_inserted(Venue)
+    db.session.execute('ANALYZE venue')
+    db.session.commit()
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-url', default=None)
+    parser.add_argument('--seed', action='store_true')
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--target-ms', type=float, default=20.0)
+    parser.add_argument('--count-limit', type=int, default=None,
+                        help='defaults to SEARCH_COUNT_LIMIT')
+    args = parser.parse_args()
+
+    config = {'SQLALCHEMY_ECHO': False}
+    if args.database_url:
+        config['SQLALCHEMY_DATABASE_URI'] = args.database_url
+    app = create_app(config)
+
+    rng = random.Random(11)
+    terms = [rng.choice(WORDS + [city.lower() for city, _ in CITIES] + [g.lower() for g in GENRES])
+             for _ in range(args.queries)]
+    terms = [term[:rng.randint(3, len(term))] for term in terms]
+
+    with app.app_context():
+        if args.seed:
+            seed(args.rows)
+        count_limit = args.count_limit or app.config['SEARCH_COUNT_LIMIT']
+        samples = []
+        for term in terms:
+            started = time.perf_counter()
+            search(Venue, term, count_limit=count_limit)
+            samples.append((time.perf_counter() - started) * 1000)
+            db.session.rollback()
+            db.session.expunge_all()
+
+    p50, p95, p99 = (percentile(samples, pct) for pct in (50, 95, 99))
+    print(f'queries={len(samples)} p50={p50:.2f}ms p95={p95:.2f}ms p99={p99:.2f}ms')
+    if p95 > args.target_ms:
+        print(f'p95 above target of {args.target_ms}ms')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
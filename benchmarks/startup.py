@@ -0,0 +1,110 @@
+""" Worker startup cost: a cold start against a fork of a warmed master.
+
+    python -m benchmarks.startup --runs 10
+
+cold: a fresh interpreter imports app.py, calls create_app() and serves its
+first requests, as every worker does without --preload.
+forked: the app is created and startup.warm()ed once, and each run forks a
+child that serves the same first requests, as workers started by
+gunicorn.conf.py do.
+
+The requested pages render templates and forms without reading the
+database. Medians over --runs are reported.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+PATHS = ['/', '/venues/create', '/artists/create', '/shows/create']
+CONFIG = {'SQLALCHEMY_ECHO': False, 'LOG_FILE': None, 'LOG_STDERR': False, 'LOG_ACCESS': False}
+
+
+def first_requests(app):
+    """Seconds taken by the first request to each of PATHS."""
+    client = app.test_client()
+    timings = {}
+    for path in PATHS:
+        started = time.perf_counter()
+        response = client.get(path)
+        timings[path] = time.perf_counter() - started
+        if response.status_code != 200:
+            raise RuntimeError(f'{path} returned {response.status_code}')
+    return timings
+
+
+def cold_child():
+    started = time.perf_counter()
+    from app import create_app
+    imported = time.perf_counter()
+    app = create_app(CONFIG)
+    created = time.perf_counter()
+    timings = {'import': imported - started, 'create_app': created - imported}
+    timings.update(first_requests(app))
+    print(json.dumps(timings))
+
+
+def cold(runs):
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = subprocess.run([sys.executable, '-m', 'benchmarks.startup', '--cold-child'],
+                                capture_output=True, text=True, check=True)
+        timings = json.loads(result.stdout.splitlines()[-1])
+        timings['total (with interpreter)'] = time.perf_counter() - started
+        samples.append(timings)
+    return samples
+
+
+def forked(runs):
+    import startup
+    from app import create_app
+    started = time.perf_counter()
+    app = create_app(CONFIG)
+    startup.warm(app)
+    warmed = time.perf_counter() - started
+
+    samples = []
+    for _ in range(runs):
+        read, write = os.pipe()
+        started = time.perf_counter()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read)
+            timings = first_requests(app)
+            os.write(write, json.dumps(timings).encode())
+            os._exit(0)
+        os.close(write)
+        with os.fdopen(read) as f:
+            timings = json.loads(f.read())
+        os.waitpid(pid, 0)
+        timings['total (from fork)'] = time.perf_counter() - started
+        samples.append(timings)
+    return warmed, samples
+
+
+def report(name, samples):
+    print(name)
+    for key in samples[0]:
+        print(f'  {key:<28}{statistics.median(sample[key] for sample in samples) * 1000:>10.1f} ms')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--cold-child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.cold_child:
+        return cold_child()
+
+    report('cold', cold(args.runs))
+    warmed, samples = forked(args.runs)
+    print(f'master create_app + warm once: {warmed * 1000:.1f} ms')
+    report('forked', samples)
+
+
+if __name__ == '__main__':
+    main()
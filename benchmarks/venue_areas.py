@@ -0,0 +1,120 @@
+""" Benchmark the /venues area listing against a large catalog.
+
+Compares the legacy per-area / per-venue query loop with the grouped
+query in queries.venue_areas, reporting statements issued and wall time.
+
+    python -m benchmarks.venue_areas --database-url postgresql://localhost/fyyur_bench --seed
+
+--seed truncates venue/artist/show in the target database first, so never
+point it at a database holding real data.
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import event, func
+
+from app import create_app
+from models import db, Venue, Artist, Show
+from queries import venue_areas
+from counters import refresh_counters
+import facets
+
+CITIES = [
+    ('San Francisco', 'CA'), ('Los Angeles', 'CA'), ('New York', 'NY'),
+    ('Austin', 'TX'), ('Chicago', 'IL'), ('Seattle', 'WA'), ('Denver', 'CO'),
+    ('Nashville', 'TN'), ('New Orleans', 'LA'), ('Portland', 'OR'),
+]
+
+
+def seed(venues, artists, shows, batch=10000):
+    rng = random.Random(42)
+    db.session.execute('TRUNCATE show, venue, artist RESTART IDENTITY CASCADE')
+    areas = [rng.choice(CITIES) for _ in range(venues)]
+    db.session.execute(Venue.__table__.insert(), [{
+        'name': f'Venue {i}',
+        'city': city,
+        'state': state,
+        'genres': ['Jazz'],
+        'genre_mask': facets.genre_mask(['Jazz']),
+    } for i, (city, state) in enumerate(areas)])
+    db.session.execute(Artist.__table__.insert(), [{
+        'name': f'Artist {i}',
+        'genres': ['Jazz'],
+        'genre_mask': facets.genre_mask(['Jazz']),
+    } for i in range(artists)])
+
+    now = datetime.now()
+    for start in range(0, shows, batch):
+        db.session.execute(Show.__table__.insert(), [{
+            'venue_id': rng.randint(1, venues),
+            'artist_id': rng.randint(1, artists),
+            'start_time': now + timedelta(days=rng.randint(-3650, 365)),
+        } for _ in range(start, min(start + batch, shows))])
+        db.session.commit()
+    refresh_counters()
+    db.session.commit()
+    db.session.execute('ANALYZE')
+    db.session.commit()
+
+
+def legacy_venue_areas():
+    """The pre-aggregation /venues implementation, kept here for comparison."""
+    area_list = Venue.query.with_entities(func.count(Venue.id), Venue.city, Venue.state) \
+        .group_by(Venue.city, Venue.state).all()
+    data = []
+    for area in area_list:
+        venue_list = Venue.query.filter_by(state=area.state).filter_by(city=area.city).all()
+        data.append({"city": area.city, "state": area.state, "venues": [{
+            "id": venue.id,
+            "name": venue.name,
+            "num_upcoming_shows": len(db.session.query(Show).filter(Show.venue_id == venue.id)
+                                      .filter(Show.start_time > datetime.now()).all()),
+        } for venue in venue_list]})
+    return data
+
+
+def measure(label, fn):
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', count)
+    try:
+        started = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - started
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count)
+        db.session.rollback()
+        db.session.expunge_all()
+    print(f'{label:<10} queries={len(statements):<8} seconds={elapsed:.3f}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-url', default=None)
+    parser.add_argument('--seed', action='store_true')
+    parser.add_argument('--venues', type=int, default=10000)
+    parser.add_argument('--artists', type=int, default=5000)
+    parser.add_argument('--shows', type=int, default=1000000)
+    parser.add_argument('--skip-legacy', action='store_true',
+                        help='the legacy loop issues one query per venue and can take minutes')
+    args = parser.parse_args()
+
+    config = {'SQLALCHEMY_ECHO': False}
+    if args.database_url:
+        config['SQLALCHEMY_DATABASE_URI'] = args.database_url
+    app = create_app(config)
+
+    with app.app_context():
+        if args.seed:
+            seed(args.venues, args.artists, args.shows)
+        if not args.skip_legacy:
+            measure('legacy', legacy_venue_areas)
+        measure('grouped', lambda: venue_areas(per_page=args.venues))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,253 @@
+import csv
+import json
+import os
+from types import SimpleNamespace
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from werkzeug.datastructures import MultiDict
+from forms import VenueForm, ArtistForm, ShowForm, owner_ids
+from models import db, Venue, Artist, Show, ImportCheckpoint
+import cache
+import counters
+import facets
+import feed
+import search
+
+#----------------------------------------------------------------------------#
+# Bulk loads of venues, artists and shows from CSV or NDJSON.
+#
+# Every row goes through the same WTForms form as the create pages, so the
+# phone, genre, state and URL rules cannot drift apart. Valid rows of a
+# batch are written with one INSERT and committed together with the load's
+# ImportCheckpoint row; a load that stops half way resumes after the last
+# committed batch, without skipping or duplicating rows. The feed and the
+# search mirror are given exactly the ids that INSERT assigned.
+#----------------------------------------------------------------------------#
+
+KINDS = {
+    'venues': (Venue, VenueForm),
+    'artists': (Artist, ArtistForm),
+    'shows': (Show, ShowForm),
+}
+
+# form field -> column, where the two differ
+FIELD_COLUMNS = {'website_link': 'website'}
+COLUMN_FIELDS = {column: field for field, column in FIELD_COLUMNS.items()}
+
+
+class Rejected(object):
+    """A source row that could not be read (e.g. a malformed NDJSON line)."""
+
+    def __init__(self, message):
+        self.message = message
+
+
+def read_rows(stream, format):
+    """Yield dicts from a text stream; genres in CSV are comma separated."""
+    if format == 'csv':
+        for row in csv.DictReader(stream):
+            if row.get('genres'):
+                row['genres'] = [genre.strip() for genre in row['genres'].split(',') if genre.strip()]
+            yield row
+    elif format == 'ndjson':
+        for line in stream:
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield Rejected(f'invalid JSON: {e}')
+                continue
+            yield row if isinstance(row, dict) else Rejected('expected a JSON object')
+    else:
+        raise ValueError(f'unknown format {format!r}, expected csv or ndjson')
+
+
+def formdata(row):
+    """The row as a browser would post it: lists repeat, unchecked boxes are left out."""
+    data = MultiDict()
+    for name, value in row.items():
+        name = COLUMN_FIELDS.get(name, name)
+        if value is None or value is False:
+            continue
+        if value is True:
+            data.add(name, 'y')
+        elif isinstance(value, list):
+            for item in value:
+                data.add(name, str(item))
+        else:
+            data.add(name, str(value))
+    return data
+
+
+def validate(kind, row):
+    """Return (column values, None) for a valid row, or (None, errors)."""
+    if isinstance(row, Rejected):
+        return None, {'row': [row.message]}
+    model, form_class = KINDS[kind]
+    form = form_class(formdata(row), meta={'csrf': False})
+    # owners are checked per batch, see _missing_owners
+    form.check_owners = False
+    if not form.validate():
+        return None, form.errors
+
+    values = {}
+    for field, value in form.data.items():
+        column = FIELD_COLUMNS.get(field, field)
+        if column in model.__table__.c and column != 'id':
+            values[column] = value
+    if kind == 'shows':
+        values['venue_id'] = int(values['venue_id'])
+        values['artist_id'] = int(values['artist_id'])
+    else:
+        values['search_text'] = search.search_document(SimpleNamespace(**values))
+        values['genre_mask'] = facets.genre_mask(values['genres'])
+    return values, None
+
+
+def _missing_owners(batch):
+    """Errors for shows whose venue or artist does not exist, at most one query per table."""
+    errors = {}
+    for model, field in ((Venue, 'venue_id'), (Artist, 'artist_id')):
+        found = owner_ids.existing(model, {values[field] for _, values in batch})
+        for number, values in batch:
+            if values[field] not in found:
+                errors.setdefault(number, {})[field] = [f'no {model.__tablename__} with id {values[field]}']
+    return errors
+
+
+def _insert(kind, rows):
+    """Insert a batch of rows and return their ids, in order."""
+    model = KINDS[kind][0]
+    table = model.__table__
+    connection = db.session.connection()
+    if connection.dialect.implicit_returning:
+        # one multi-row INSERT ... RETURNING id
+        ids = [row.id for row in db.session.execute(table.insert().values(rows).returning(table.c.id))]
+    else:
+        # SQLite: the INSERT takes the database's write lock, held until
+        # commit, so nothing else can insert in between and the batch's
+        # rowids are the last len(rows) assigned
+        db.session.execute(table.insert(), rows)
+        last = db.session.query(db.func.max(model.id)).scalar()
+        ids = list(range(last - len(rows) + 1, last + 1))
+
+    if kind == 'shows':
+        counters.record_shows(rows)
+        feed.add_shows(Show.id.in_(ids))
+    else:
+        search.mirror_inserted(model, ids)
+    return ids
+
+
+def _invalidate(kind, rows):
+    if kind == 'shows':
+        cache.invalidate('shows', 'venues',
+                         *{f'venue:{row["venue_id"]}' for row in rows},
+                         *{f'artist:{row["artist_id"]}' for row in rows})
+    else:
+        cache.invalidate(kind)
+
+
+def checkpoint_for(name, kind, restart=False):
+    checkpoint = ImportCheckpoint.query.get(name)
+    if checkpoint is not None and checkpoint.kind != kind:
+        raise ValueError(f'checkpoint {name!r} belongs to a {checkpoint.kind} load')
+    if checkpoint is None or restart:
+        checkpoint = db.session.merge(ImportCheckpoint(
+            name=name, kind=kind, rows_done=0, inserted=0, rejected=0, finished=False))
+        db.session.commit()
+    return checkpoint
+
+
+def load(kind, rows, checkpoint, batch_size=1000, on_error=None):
+    """ Validate and insert rows, resuming after checkpoint.rows_done.
+
+    on_error(row_number, errors) is called for every rejected row; row
+    numbers count data rows from 1. Returns the checkpoint.
+    """
+    if checkpoint.finished:
+        return checkpoint
+
+    def flush(batch, number):
+        if kind == 'shows' and batch:
+            missing = _missing_owners(batch)
+            for row_number, errors in missing.items():
+                checkpoint.rejected += 1
+                if on_error:
+                    on_error(row_number, errors)
+            batch = [(n, values) for n, values in batch if n not in missing]
+        rows = [values for _, values in batch]
+        if rows:
+            _insert(kind, rows)
+        checkpoint.rows_done = number
+        checkpoint.inserted += len(rows)
+        db.session.commit()
+        if rows:
+            _invalidate(kind, rows)
+
+    batch, number = [], checkpoint.rows_done
+    for number, row in enumerate(rows, start=1):
+        if number <= checkpoint.rows_done:
+            continue
+        values, errors = validate(kind, row)
+        if errors:
+            checkpoint.rejected += 1
+            if on_error:
+                on_error(number, errors)
+        else:
+            batch.append((number, values))
+        if number % batch_size == 0:
+            flush(batch, number)
+            batch = []
+
+    flush(batch, number)
+    checkpoint.finished = True
+    db.session.commit()
+    return checkpoint
+
+
+#----------------------------------------------------------------------------#
+# CLI.
+#----------------------------------------------------------------------------#
+
+bulk_cli = AppGroup('bulk', help='Bulk load venues, artists and shows.')
+
+
+@bulk_cli.command('load')
+@click.argument('kind', type=click.Choice(sorted(KINDS)))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'format', type=click.Choice(['csv', 'ndjson']),
+              help='Defaults to the file extension.')
+@click.option('--name', help='Checkpoint name; defaults to the file name.')
+@click.option('--batch-size', type=int, help='Defaults to IMPORT_BATCH_SIZE.')
+@click.option('--restart', is_flag=True, help='Ignore an existing checkpoint and start over.')
+def load_command(kind, path, format, name, batch_size, restart):
+    """Load KIND rows from PATH, resuming an interrupted load of the same name."""
+    format = format or ('csv' if path.endswith('.csv') else 'ndjson')
+    try:
+        checkpoint = checkpoint_for(name or os.path.basename(path), kind, restart)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    if checkpoint.finished:
+        click.echo(f'{checkpoint.name} was already loaded; pass --restart to load it again')
+        return
+    if checkpoint.rows_done:
+        click.echo(f'resuming after row {checkpoint.rows_done}')
+
+    def report(number, errors):
+        for field, messages in errors.items():
+            click.echo(f'row {number}: {field}: {"; ".join(messages)}', err=True)
+
+    with open(path, newline='', encoding='utf-8') as stream:
+        checkpoint = load(kind, read_rows(stream, format), checkpoint,
+                          batch_size or current_app.config['IMPORT_BATCH_SIZE'], on_error=report)
+    click.echo(f'{checkpoint.name}: {checkpoint.rows_done} rows, {checkpoint.inserted} inserted, '
+               f'{checkpoint.rejected} rejected')
+
+
+def init_app(app):
+    app.config.setdefault('IMPORT_BATCH_SIZE', 1000)
+    app.config.setdefault('IMPORT_MAX_REPORTED_ERRORS', 1000)
+    app.cli.add_command(bulk_cli)
@@ -0,0 +1,220 @@
+import hashlib
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import (
+    _request_ctx_stack,
+    current_app,
+    g,
+    make_response,
+    request,
+    session
+)
+from markupsafe import Markup
+from werkzeug.utils import import_string
+
+#----------------------------------------------------------------------------#
+# Page and fragment cache.
+#
+# Entries are tagged ("venue:3", "shows", ...). Writers bump a tag's version
+# instead of hunting down keys, and an entry is only served while every tag
+# it was stored under is still at the version it saw. That keeps invalidation
+# exact across every ?cursor= variant of a page, and works the same on the
+# in-process LRU and on a shared backend.
+#----------------------------------------------------------------------------#
+
+class MemoryBackend(object):
+    """In-process LRU with per-entry TTL. Invalidations only reach this worker."""
+
+    def __init__(self, max_entries=1024, **options):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def versions(self, tags):
+        with self._lock:
+            return [self._versions.get(tag, 0) for tag in tags]
+
+    def bump(self, tags):
+        with self._lock:
+            for tag in tags:
+                self._versions[tag] = self._versions.get(tag, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+
+
+class RedisBackend(object):
+    """Shared backend so every worker sees the same entries and invalidations."""
+
+    def __init__(self, url='redis://localhost:6379/0', prefix='fyyur:', **options):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return None if value is None else pickle.loads(value)
+
+    def set(self, key, value, ttl):
+        self.client.setex(self.prefix + key, int(ttl), pickle.dumps(value))
+
+    def versions(self, tags):
+        if not tags:
+            return []
+        return [int(v or 0) for v in self.client.mget([self.prefix + 'tag:' + t for t in tags])]
+
+    def bump(self, tags):
+        pipe = self.client.pipeline()
+        for tag in tags:
+            pipe.incr(self.prefix + 'tag:' + tag)
+        pipe.execute()
+
+    def clear(self):
+        keys = list(self.client.scan_iter(self.prefix + '*'))
+        if keys:
+            self.client.delete(*keys)
+
+
+BACKENDS = {'memory': MemoryBackend, 'redis': RedisBackend}
+
+
+class Cache(object):
+
+    def __init__(self, backend, ttl):
+        self.backend = backend
+        self.ttl = ttl
+
+    def get(self, key, tags):
+        """ Return (value, versions): value is None unless it was stored at the
+        tags' current versions, which are returned for a following set().
+        """
+        versions = self.backend.versions(tags)
+        entry = self.backend.get(key)
+        if entry is None or entry[0] != versions:
+            return None, versions
+        return entry[1], versions
+
+    def set(self, key, versions, value, ttl=None):
+        self.backend.set(key, (versions, value), ttl or self.ttl)
+
+    def invalidate(self, *tags):
+        self.backend.bump(tags)
+
+
+def invalidate(*tags):
+    """Drop every cached page and fragment stored under any of tags."""
+    cache = current_app.extensions.get('cache')
+    if cache is not None and tags:
+        cache.invalidate(*tags)
+
+
+def _cacheable_request():
+    # flashed messages are rendered into the page and are per-user
+    return request.method in ('GET', 'HEAD') and '_flashes' not in session
+
+
+def _flashed_during_render():
+    return bool(getattr(_request_ctx_stack.top, 'flashes', None))
+
+
+def cached(*tags, ttl=None):
+    """ Cache a GET view's 200 response under tags, with ETag / 304 support.
+
+    Tags may reference view arguments, e.g. cached('venue:{venue_id}').
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(**kwargs):
+            cache = current_app.extensions.get('cache')
+            if cache is None or not _cacheable_request():
+                return view(**kwargs)
+
+            resolved = [tag.format(**kwargs) for tag in tags]
+            key = 'page:' + request.full_path
+            # versions are read before rendering, so a write that lands
+            # mid-render leaves this entry already stale
+            entry, versions = cache.get(key, resolved)
+            if entry is None:
+                response = make_response(view(**kwargs))
+                if response.status_code != 200 or response.is_streamed or _flashed_during_render():
+                    return response
+                body = response.get_data()
+                entry = (body, response.mimetype, hashlib.sha1(body).hexdigest(), g.get('last_modified'))
+                cache.set(key, versions, entry, ttl)
+            else:
+                response = current_app.response_class(entry[0], mimetype=entry[1])
+
+            # weak: responses.py may serve the body gzip or brotli encoded
+            response.set_etag(entry[2], weak=True)
+            # entries stored before Last-Modified was kept have three fields
+            if len(entry) > 3 and entry[3] is not None:
+                response.last_modified = entry[3]
+            response.cache_control.no_cache = True
+            return response.make_conditional(request)
+        return wrapper
+    return decorator
+
+
+def cache_fragment(key, *tags, caller, ttl=None):
+    """ Jinja call block caching the rendered body under key and tags:
+
+        {% call cache_fragment('venue-info:' ~ venue.id, 'venue-info:' ~ venue.id) %}...{% endcall %}
+    """
+    cache = current_app.extensions.get('cache')
+    if cache is None:
+        return caller()
+    html, versions = cache.get('fragment:' + key, tags)
+    if html is None:
+        html = str(caller())
+        cache.set('fragment:' + key, versions, html, ttl)
+    return Markup(html)
+
+
+def init_app(app):
+    app.config.setdefault('CACHE_ENABLED', True)
+    app.config.setdefault('CACHE_BACKEND', 'memory')
+    app.config.setdefault('CACHE_OPTIONS', {})
+    app.config.setdefault('CACHE_DEFAULT_TTL', 300)
+    app.config.setdefault('CACHE_REDIS_URL', None)
+
+    app.jinja_env.globals['cache_fragment'] = cache_fragment
+    if not app.config['CACHE_ENABLED']:
+        return
+
+    backend = app.config['CACHE_BACKEND']
+    options = dict(app.config['CACHE_OPTIONS'])
+    if backend == 'memory' and app.config.get('PROFILE') == 'production':
+        raise RuntimeError("The memory cache is per worker and would serve stale pages: "
+                           "set CACHE_BACKEND = 'redis' or CACHE_ENABLED = False.")
+    if backend == 'redis':
+        if app.config['CACHE_REDIS_URL']:
+            options['url'] = app.config['CACHE_REDIS_URL']
+        elif 'url' not in options:
+            raise RuntimeError('Set CACHE_REDIS_URL for the redis cache, or CACHE_ENABLED = False.')
+    backend_class = BACKENDS.get(backend) or import_string(backend)
+    app.extensions['cache'] = Cache(backend_class(**options), app.config['CACHE_DEFAULT_TTL'])
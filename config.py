@@ -1,5 +1,9 @@
 import os
-SECRET_KEY = os.urandom(32)
+# Sessions, flashes and CSRF tokens are signed with SECRET_KEY, which every
+# worker must share: set SECRET_KEY or SECRET_KEY_FILE. Outside production a
+# key generated once into instance/secret_key is used (see startup.py).
+SECRET_KEY = os.environ.get('SECRET_KEY')
+SECRET_KEY_FILE = os.environ.get('SECRET_KEY_FILE')
 # Grabs the folder where the script runs.
 basedir = os.path.abspath(os.path.dirname(__file__))
 
@@ -7,6 +11,164 @@ basedir = os.path.abspath(os.path.dirname(__file__))
 DEBUG = True
 
 # Connect to the database
-SQLALCHEMY_DATABASE_URI = 'postgresql://rirving@localhost:5432/fyyur'
+SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'postgresql://rirving@localhost:5432/fyyur')
 SQLALCHEMY_TRACK_MODIFICATIONS = False
 SQLALCHEMY_ECHO = True
+
+# Connection pool, per process (see database.py). Every gunicorn worker has
+# its own pool, so workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW) must stay below
+# the server's max_connections. Pre-ping and recycle drop connections that
+# died in a failover or were closed by the server before they are used.
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+DB_POOL_TIMEOUT = 10
+DB_POOL_RECYCLE = 1800
+DB_POOL_PRE_PING = True
+DB_STATEMENT_TIMEOUT_MS = 30000
+POOL_STATS_ENDPOINT = DEBUG
+
+# Logging (see logs.py). Records are written as JSON lines by a background
+# thread; a burst beyond LOG_QUEUE_SIZE queued records is dropped, not waited
+# on. Rotation is per process: forked workers (gunicorn) rotate only a LOG_FILE
+# with {pid} in it, and otherwise append to the shared file, which must then be
+# rotated outside the app (logrotate). Production logs to stderr instead.
+# LOG_SAMPLE_RATES keeps that fraction of each high-volume event (ERROR and
+# above are never sampled).
+LOG_LEVEL = 'INFO'
+LOG_FILE = 'error.log'
+LOG_STDERR = DEBUG
+LOG_ROTATE = 'size'  # or 'time', every LOG_ROTATE_WHEN
+LOG_MAX_BYTES = 50 * 1024 * 1024
+LOG_ROTATE_WHEN = 'midnight'
+LOG_BACKUP_COUNT = 7
+LOG_QUEUE_SIZE = 10000
+LOG_ACCESS = True
+LOG_SAMPLE_RATES = {'access': 0.1, 'query_budget': 0.1, 'replica_lag': 0.1}
+
+# Read replicas (see database.py), e.g.
+# DATABASE_REPLICA_URLS=postgresql://replica1/fyyur,postgresql://replica2/fyyur
+SQLALCHEMY_REPLICA_URIS = [uri for uri in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if uri]
+# GET endpoints that only read and may be served slightly stale data.
+REPLICA_ENDPOINTS = {
+    'venues', 'search_venues', 'browse_venues', 'show_venue', 'venue_show_tiles',
+    'artists', 'search_artists', 'browse_artists', 'show_artist', 'artist_show_tiles',
+    'shows', 'api.collection', 'api.item', 'api.export',
+}
+REPLICA_MAX_LAG_SECONDS = 5
+REPLICA_CHECK_INTERVAL = 5
+# After a write, that client reads from the primary for this long.
+PRIMARY_PIN_SECONDS = 10
+
+# Per-request SQL instrumentation (see instrumentation.py).
+# Budgets are the most queries an endpoint may issue before a warning is
+# logged; QUERY_BUDGET_STRICT turns that warning into an exception so a
+# test run fails when a view regresses into N+1 queries.
+QUERY_STATS_HEADERS = DEBUG
+QUERY_STATS_ENDPOINT = DEBUG
+QUERY_BUDGET_DEFAULT = 10
+QUERY_BUDGETS = {
+    'venues': 1,
+    'search_venues': 2,
+    'browse_venues': 2,
+    'show_venue': 4,
+    'venue_show_tiles': 1,
+    'artists': 1,
+    'search_artists': 2,
+    'browse_artists': 2,
+    'show_artist': 4,
+    'artist_show_tiles': 1,
+    'shows': 1,
+    'api.collection': 1,
+    'api.item': 1,
+}
+QUERY_REPEAT_THRESHOLD = 5
+QUERY_BUDGET_STRICT = False
+# Batch jobs that repeat statements by design.
+QUERY_BUDGET_EXEMPT = {'api.import_rows'}
+
+# Rows per page on the listing pages and on search results (see pagination.py).
+PAGE_SIZE = 50
+SEARCH_PAGE_SIZE = 20
+DETAIL_SHOWS_PAGE_SIZE = 12
+# Search (see search.py) counts at most this many matches and shows "1000+"
+# beyond. On PostgreSQL a match must also have a word_similarity of at least
+# SEARCH_SIMILARITY_THRESHOLD, which the trigram index applies; raising it
+# trims weak matches of short terms before they are ranked.
+SEARCH_COUNT_LIMIT = 1000
+SEARCH_SIMILARITY_THRESHOLD = 0.5
+
+# JSON API (see api.py): default and largest ?limit=, and rows fetched per
+# round trip by the NDJSON export.
+API_PAGE_SIZE = 100
+API_MAX_PAGE_SIZE = 1000
+API_EXPORT_BATCH = 1000
+
+# Bulk loads (see bulk.py): rows per INSERT/commit, and how many rejected
+# rows the HTTP endpoint lists in its response.
+IMPORT_BATCH_SIZE = 1000
+IMPORT_MAX_REPORTED_ERRORS = 1000
+# Seconds a venue or artist id seen to exist is trusted by the show forms
+# (see forms.py). Per process, like the memory cache: production sets 0, so
+# a delete in one worker is never missed by another.
+OWNER_ID_TTL = 60
+
+# Page and fragment cache (see cache.py). The memory backend is per process:
+# with several workers an invalidation only reaches the worker that made it,
+# so the production profile uses 'redis' at CACHE_REDIS_URL and does not start
+# without it (or with CACHE_ENABLED = False).
+CACHE_ENABLED = True
+CACHE_BACKEND = 'memory'
+CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL')
+CACHE_OPTIONS = {'max_entries': 1024}
+CACHE_DEFAULT_TTL = 300
+
+# Response compression and conditional GET (see responses.py). Bodies below
+# COMPRESS_MIN_SIZE are not worth the CPU; brotli is used when the package is
+# installed, at a quality fast enough for pages rendered per request.
+CONDITIONAL_GET = True
+COMPRESS_ENABLED = True
+COMPRESS_MIN_SIZE = 500
+COMPRESS_MIMETYPES = {'text/html', 'text/css', 'text/plain', 'application/json'}
+COMPRESS_LEVEL = 6
+COMPRESS_BROTLI_QUALITY = 4
+
+# Static assets (see assets.py). Built files are named by their content, so
+# browsers may keep them for good. Install the brotli package for .br files.
+ASSETS_MAX_AGE = 365 * 24 * 3600
+
+# Streamed listing pages (see rendering.py): /venues, /artists and /shows send
+# their head at once and render rows as they are read from a server-side
+# cursor, so large PAGE_SIZEs neither wait for nor buffer every row. Streamed
+# pages are not cached, compressed or answered with 304s. Compiled templates
+# are kept in TEMPLATE_BYTECODE_DIR (default: instance/jinja) across starts.
+STREAM_LISTINGS = False
+STREAM_BUFFER_SIZE = 40
+TEMPLATE_BYTECODE_CACHE = True
+TEMPLATE_BYTECODE_DIR = os.environ.get('TEMPLATE_BYTECODE_DIR')
+
+# Prometheus metrics on /metrics (see metrics.py). Each process records into
+# its own file in METRICS_DIR (default: instance/metrics), which every worker
+# of one deployment must share; /metrics sums them. Latency buckets are in
+# seconds.
+METRICS_ENABLED = True
+METRICS_ENDPOINT = True
+METRICS_DIR = os.environ.get('METRICS_DIR')
+METRICS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Profiles: create_app() applies PROFILES[PROFILE] over the settings above
+# ($FYYUR_PROFILE, or PROFILE in the config passed to create_app).
+PROFILE = os.environ.get('FYYUR_PROFILE', 'development')
+PROFILES = {
+    'development': {},
+    'production': {
+        'DEBUG': False,
+        'SQLALCHEMY_ECHO': False,
+        'POOL_STATS_ENDPOINT': False,
+        'QUERY_STATS_HEADERS': False,
+        'QUERY_STATS_ENDPOINT': False,
+        'LOG_FILE': None,
+        'LOG_STDERR': True,
+        'CACHE_BACKEND': 'redis',
+        'OWNER_ID_TTL': 0,
+    },
+}
@@ -0,0 +1,144 @@
+from datetime import datetime, timedelta
+import click
+from flask.cli import AppGroup
+from sqlalchemy import func, select, update
+from models import db, Venue, Artist, Show, UpcomingShow
+import cache
+import feed
+
+#----------------------------------------------------------------------------#
+# Denormalized upcoming/past show counters on Venue and Artist.
+#----------------------------------------------------------------------------#
+
+OWNERS = ((Venue, Show.venue_id), (Artist, Show.artist_id))
+
+
+def record_show(show, now=None):
+    """Count a new show against its venue and artist, in the caller's transaction."""
+    now = now or datetime.now()
+    attr = 'upcoming_shows_count' if show.start_time > now else 'past_shows_count'
+    for model, owner_id in ((Venue, show.venue_id), (Artist, show.artist_id)):
+        column = getattr(model, attr)
+        db.session.query(model).filter(model.id == owner_id) \
+            .update({column: column + 1}, synchronize_session=False)
+
+
+def record_shows(shows, now=None):
+    """ Count a batch of new shows (dicts with venue_id, artist_id, start_time).
+
+    One executemany UPDATE per owner table, adding each owner's totals.
+    """
+    now = now or datetime.now()
+    for model, owner_key in ((Venue, 'venue_id'), (Artist, 'artist_id')):
+        totals = {}
+        for show in shows:
+            upcoming, past = totals.get(show[owner_key], (0, 0))
+            if show['start_time'] > now:
+                upcoming += 1
+            else:
+                past += 1
+            totals[show[owner_key]] = (upcoming, past)
+        if totals:
+            owners = model.__table__
+            db.session.execute(owners.update().where(owners.c.id == db.bindparam('owner_id')).values(
+                upcoming_shows_count=owners.c.upcoming_shows_count + db.bindparam('upcoming'),
+                past_shows_count=owners.c.past_shows_count + db.bindparam('past'),
+            ), [
+                {'owner_id': owner, 'upcoming': upcoming, 'past': past}
+                for owner, (upcoming, past) in totals.items()])
+
+
+def forget_shows(criterion, now=None):
+    """ Delete the shows matching criterion and take them off every counter.
+
+    One UPDATE per owner table subtracts, for each affected venue or artist,
+    the number of its removed upcoming and past shows, however many shows
+    are removed.
+    """
+    now = now or datetime.now()
+    for model, owner_id in OWNERS:
+        removed = select(func.count(Show.id)).where(criterion, owner_id == model.id)
+        db.session.execute(update(model).values(
+            upcoming_shows_count=model.upcoming_shows_count
+                - removed.where(Show.start_time > now).scalar_subquery(),
+            past_shows_count=model.past_shows_count
+                - removed.where(Show.start_time <= now).scalar_subquery(),
+        ).where(model.id.in_(select(owner_id).where(criterion)))
+         .execution_options(synchronize_session=False))
+
+    return db.session.query(Show).filter(criterion).delete(synchronize_session=False)
+
+
+def refresh_counters(since=None, now=None):
+    """ Recompute counters from the show table.
+
+    With since=None every venue and artist is recounted (used for backfills
+    and repairs). Otherwise only owners with a show that started in
+    (since, now] are touched, which is what moves shows from upcoming to past.
+    """
+    now = now or datetime.now()
+    for model, owner_id in OWNERS:
+        stmt = update(model).values(
+            upcoming_shows_count=select(func.count(Show.id))
+                .where(owner_id == model.id, Show.start_time > now).scalar_subquery(),
+            past_shows_count=select(func.count(Show.id))
+                .where(owner_id == model.id, Show.start_time <= now).scalar_subquery(),
+        ).execution_options(synchronize_session=False)
+        if since is not None:
+            stmt = stmt.where(model.id.in_(
+                select(owner_id).where(Show.start_time > since, Show.start_time <= now)))
+        db.session.execute(stmt)
+
+
+def rollover(since, now=None):
+    """ Move shows that started in (since, now] from upcoming to past counts and off the feed.
+
+    Returns the cache tags of the pages showing them: the listings and the
+    pages of every venue and artist whose counts moved.
+    """
+    now = now or datetime.now()
+    started = (Show.start_time > since, Show.start_time <= now)
+    venue_ids = [id for id, in db.session.query(Show.venue_id).filter(*started).distinct()]
+    artist_ids = [id for id, in db.session.query(Show.artist_id).filter(*started).distinct()]
+    refresh_counters(since=since, now=now)
+    feed.drop_started(now)
+    return ['shows', 'venues', 'artists'] + [f'venue:{id}' for id in venue_ids] + \
+           [f'artist:{id}' for id in artist_ids]
+
+
+#----------------------------------------------------------------------------#
+# CLI.
+#----------------------------------------------------------------------------#
+
+shows_cli = AppGroup('shows', help='Maintain show counters and the upcoming show feed.')
+
+
+@shows_cli.command('rollover')
+@click.option('--window-minutes', default=90, show_default=True,
+              help='How far back to look for shows that have started. '
+                   'Keep it longer than the schedule interval.')
+def rollover_command(window_minutes):
+    """Move shows that have started from upcoming to past counts and off the feed."""
+    now = datetime.now()
+    tags = rollover(now - timedelta(minutes=window_minutes), now)
+    db.session.commit()
+    cache.invalidate(*tags)
+
+
+@shows_cli.command('recount')
+def recount_command():
+    """Rebuild every venue and artist counter from the show table."""
+    refresh_counters()
+    db.session.commit()
+
+
+@shows_cli.command('rebuild-feed')
+def rebuild_feed_command():
+    """Recompute the upcoming show feed from the show table."""
+    feed.rebuild()
+    db.session.commit()
+    click.echo(f'{UpcomingShow.query.count()} upcoming shows in the feed')
+
+
+def init_app(app):
+    app.cli.add_command(shows_cli)
@@ -0,0 +1,227 @@
+import random
+import threading
+import time
+from flask import current_app, g, has_request_context, jsonify, request, session
+from flask_sqlalchemy import SQLAlchemy as BaseSQLAlchemy, SignallingSession
+from sqlalchemy import event, orm
+from sqlalchemy.sql.dml import UpdateBase
+
+#----------------------------------------------------------------------------#
+# Engine and connection pool.
+#
+# Pool sizing, pre-ping, recycle and the statement timeout come from the
+# DB_* settings in config.py and are applied to PostgreSQL engines only;
+# SQLite (local testing) keeps Flask-SQLAlchemy's defaults. Anything in
+# SQLALCHEMY_ENGINE_OPTIONS still wins over these.
+#
+# Sessions are the scoped session Flask-SQLAlchemy removes on app context
+# teardown, which returns the connection to the pool; views do not close
+# sessions themselves.
+#
+# With SQLALCHEMY_REPLICA_URIS set, GET requests to the endpoints listed in
+# REPLICA_ENDPOINTS read from one replica per request. Flushes and
+# INSERT/UPDATE/DELETE statements always go to the primary, and a client
+# that wrote is pinned to the primary for PRIMARY_PIN_SECONDS so it reads
+# its own writes after the redirect. Replicas lagging more than
+# REPLICA_MAX_LAG_SECONDS, or failing the check, are skipped; with none left
+# reads fall back to the primary.
+#----------------------------------------------------------------------------#
+
+# replay lag, 0 when the replica has applied everything it received (an idle
+# primary would otherwise show a growing replay timestamp age)
+LAG_SQL = '''
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+END
+'''
+
+class PoolStats(object):
+    """Connections opened, checked out and invalidated by this process's pool."""
+
+    def __init__(self):
+        self.connects = 0
+        self.checkouts = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+
+    def listen(self, pool):
+        event.listen(pool, 'connect', lambda *args: self._bump('connects'))
+        event.listen(pool, 'checkout', lambda *args: self._bump('checkouts'))
+        event.listen(pool, 'invalidate', lambda *args: self._bump('invalidations'))
+
+    def _bump(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def as_dict(self, pool):
+        stats = {
+            'pool': type(pool).__name__,
+            'status': pool.status(),
+            'connects': self.connects,
+            'checkouts': self.checkouts,
+            'invalidations': self.invalidations,
+        }
+        # QueuePool only
+        for name in ('size', 'checkedin', 'checkedout', 'overflow'):
+            if hasattr(pool, name):
+                stats[name] = getattr(pool, name)()
+        return stats
+
+
+class ReplicaMonitor(object):
+    """Caches each replica's lag check for REPLICA_CHECK_INTERVAL seconds."""
+
+    def __init__(self):
+        self._checked = {}
+        self._lock = threading.Lock()
+
+    def lag(self, engine):
+        if engine.dialect.name != 'postgresql':
+            return 0.0
+        # a raw DBAPI connection, so the check stays out of the per-request query stats
+        connection = engine.raw_connection()
+        try:
+            cursor = connection.cursor()
+            cursor.execute(LAG_SQL)
+            return float(cursor.fetchone()[0] or 0)
+        finally:
+            connection.close()
+
+    def healthy(self, key, engine, config):
+        now = time.monotonic()
+        with self._lock:
+            checked_at, ok = self._checked.get(key, (None, False))
+            if checked_at is not None and now - checked_at < config['REPLICA_CHECK_INTERVAL']:
+                return ok
+            # other requests keep the previous verdict while this one checks
+            self._checked[key] = (now, ok if checked_at is not None else True)
+        try:
+            lag = self.lag(engine)
+            ok = lag <= config['REPLICA_MAX_LAG_SECONDS']
+            if not ok:
+                current_app.logger.warning(f'replica {key} is {lag:.1f}s behind; reading from primary',
+                                           extra={'event': 'replica_lag'})
+        except Exception as e:
+            ok = False
+            current_app.logger.warning(f'replica {key} check failed ({e}); reading from primary',
+                                           extra={'event': 'replica_lag'})
+        with self._lock:
+            self._checked[key] = (now, ok)
+        return ok
+
+    def status(self):
+        with self._lock:
+            return {key: ok for key, (checked_at, ok) in self._checked.items()}
+
+
+class RoutingSession(SignallingSession):
+    """Sends reads of replica-enabled requests to a replica, everything else to the primary."""
+
+    def __init__(self, db, **options):
+        self._db = db
+        super().__init__(db, **options)
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self._flushing or isinstance(clause, UpdateBase):
+            if has_request_context():
+                g.db_wrote = True
+        else:
+            replica = self._db.replica_engine()
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper, clause)
+
+
+class SQLAlchemy(BaseSQLAlchemy):
+
+    def __init__(self, *args, **kwargs):
+        self.pool_stats = PoolStats()
+        self.replicas = ReplicaMonitor()
+        super().__init__(*args, **kwargs)
+
+    def init_app(self, app):
+        app.config.setdefault('DB_POOL_SIZE', 5)
+        app.config.setdefault('DB_MAX_OVERFLOW', 10)
+        app.config.setdefault('DB_POOL_TIMEOUT', 10)
+        app.config.setdefault('DB_POOL_RECYCLE', 1800)
+        app.config.setdefault('DB_POOL_PRE_PING', True)
+        app.config.setdefault('DB_STATEMENT_TIMEOUT_MS', None)
+        app.config.setdefault('POOL_STATS_ENDPOINT', False)
+        app.config.setdefault('SQLALCHEMY_REPLICA_URIS', [])
+        app.config.setdefault('REPLICA_ENDPOINTS', ())
+        app.config.setdefault('REPLICA_MAX_LAG_SECONDS', 5)
+        app.config.setdefault('REPLICA_CHECK_INTERVAL', 5)
+        app.config.setdefault('PRIMARY_PIN_SECONDS', 10)
+
+        # replicas are extra binds, so they get the same engine options and
+        # pooling; no table is assigned to them
+        binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+        for i, uri in enumerate(app.config['SQLALCHEMY_REPLICA_URIS']):
+            binds[f'replica{i}'] = uri
+        app.config['SQLALCHEMY_BINDS'] = binds or None
+        super().init_app(app)
+
+        @app.after_request
+        def pin_writer_to_primary(response):
+            if g.get('db_wrote') and app.config['SQLALCHEMY_REPLICA_URIS']:
+                session['db_primary_until'] = time.time() + app.config['PRIMARY_PIN_SECONDS']
+            return response
+
+        if app.config['POOL_STATS_ENDPOINT']:
+            @app.route('/_debug/pool')
+            def pool_stats():
+                stats = self.pool_stats.as_dict(self.engine.pool)
+                stats['replicas'] = self.replicas.status()
+                return jsonify(stats)
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+    def replica_engine(self):
+        """The replica this request reads from, or None for the primary."""
+        if not has_request_context():
+            return None
+        if 'db_replica' not in g:
+            g.db_replica = None
+            config = current_app.config
+            if (config['SQLALCHEMY_REPLICA_URIS']
+                    and request.method in ('GET', 'HEAD')
+                    and request.endpoint in config['REPLICA_ENDPOINTS']
+                    and session.get('db_primary_until', 0) < time.time()):
+                keys = [f'replica{i}' for i in range(len(config['SQLALCHEMY_REPLICA_URIS']))]
+                random.shuffle(keys)
+                for key in keys:
+                    engine = self.get_engine(current_app, bind=key)
+                    if self.replicas.healthy(key, engine, config):
+                        g.db_replica = engine
+                        break
+        return g.db_replica
+
+    def apply_driver_hacks(self, app, sa_url, options):
+        sa_url, options = super().apply_driver_hacks(app, sa_url, options)
+        if sa_url.drivername.startswith('postgresql'):
+            config = app.config
+            options.update(
+                pool_size=config['DB_POOL_SIZE'],
+                max_overflow=config['DB_MAX_OVERFLOW'],
+                pool_timeout=config['DB_POOL_TIMEOUT'],
+                pool_recycle=config['DB_POOL_RECYCLE'],
+                pool_pre_ping=config['DB_POOL_PRE_PING'],
+            )
+            settings = []
+            if config['DB_STATEMENT_TIMEOUT_MS']:
+                settings.append('-c statement_timeout=%d' % config['DB_STATEMENT_TIMEOUT_MS'])
+            # the threshold of search's %> operator (search.py), set per
+            # connection so a search costs no extra statement
+            if config.get('SEARCH_SIMILARITY_THRESHOLD') is not None:
+                settings.append('-c pg_trgm.word_similarity_threshold=%s' % config['SEARCH_SIMILARITY_THRESHOLD'])
+            if settings:
+                connect_args = options.setdefault('connect_args', {})
+                connect_args['options'] = ' '.join(settings)
+        return sa_url, options
+
+    def create_engine(self, sa_url, engine_opts):
+        engine = super().create_engine(sa_url, engine_opts)
+        self.pool_stats.listen(engine.pool)
+        return engine
@@ -0,0 +1,123 @@
+import json
+import sys
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import event, func
+from models import db, Venue, Artist
+
+#----------------------------------------------------------------------------#
+# EXPLAIN check for the hot read paths.
+#
+# Renders each read endpoint through the test client, captures the SELECTs
+# it issues and EXPLAINs them against the configured database. On
+# PostgreSQL the plans are taken with enable_seqscan off, so a sequential
+# scan only survives when no index can serve the query at all, regardless
+# of how small the local tables are.
+#----------------------------------------------------------------------------#
+
+def hot_paths():
+    venue_id = db.session.query(func.min(Venue.id)).scalar() or 1
+    artist_id = db.session.query(func.min(Artist.id)).scalar() or 1
+    return [
+        '/venues',
+        '/artists',
+        '/shows',
+        f'/venues/{venue_id}',
+        f'/venues/{venue_id}/shows/past',
+        f'/artists/{artist_id}',
+        f'/artists/{artist_id}/shows/past',
+        '/venues/search?search_term=the',
+        '/artists/search?search_term=the',
+    ]
+
+
+def capture(client, path):
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            statements.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        client.get(path)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+    return statements
+
+
+def _postgresql_scans(cursor, statement, parameters):
+    cursor.execute('SET enable_seqscan = off')
+    cursor.execute('EXPLAIN (FORMAT JSON) ' + statement, parameters)
+    plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    scans, nodes = [], [plan[0]['Plan']]
+    while nodes:
+        node = nodes.pop()
+        if node['Node Type'] == 'Seq Scan':
+            scans.append(node.get('Relation Name'))
+        nodes.extend(node.get('Plans', []))
+    return scans
+
+
+def _sqlite_scans(cursor, statement, parameters):
+    cursor.execute('EXPLAIN QUERY PLAN ' + statement, parameters)
+    scans = []
+    for row in cursor.fetchall():
+        detail = row[-1].split()
+        # "SCAN show" is a full scan; "SCAN show USING INDEX ..." is not
+        if detail[0] == 'SCAN' and 'USING' not in detail:
+            scans.append(detail[1])
+    return scans
+
+
+def sequential_scans(tables):
+    """ Yield (path, statements, scans) for each hot path: the SELECTs it
+    issued, and a (statement, table) for each sequential scan on one of tables.
+    """
+    client = current_app.test_client()
+    scans_of = _sqlite_scans if db.engine.dialect.name == 'sqlite' else _postgresql_scans
+    # a page served from the cache issues no SQL, and would pass unchecked
+    cache = current_app.extensions.pop('cache', None)
+    raw = db.engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        for path in hot_paths():
+            statements = capture(client, path)
+            scans = [(statement, table)
+                     for statement, parameters in statements
+                     for table in scans_of(cursor, statement, parameters)
+                     if table in tables]
+            yield path, statements, scans
+        raw.rollback()
+    finally:
+        raw.close()
+        if cache is not None:
+            current_app.extensions['cache'] = cache
+
+
+explain_cli = AppGroup('explain', help='Check query plans of the hot read paths.')
+
+
+@explain_cli.command('check')
+@click.option('--table', 'tables', multiple=True, default=['show'], show_default=True,
+              help='Tables that must never be scanned sequentially.')
+def check_command(tables):
+    """Fail if any hot query plans a sequential scan on the given tables."""
+    failures = 0
+    for path, statements, scans in sequential_scans(set(tables)):
+        if not statements:
+            failures += 1
+            click.echo(f'No SELECT captured for {path}: nothing to EXPLAIN\n', err=True)
+        for statement, table in scans:
+            failures += 1
+            click.echo(f'Seq Scan on {table} for {path}:\n    {" ".join(statement.split())}\n', err=True)
+    if failures:
+        sys.exit(1)
+    click.echo('no sequential scans on: ' + ', '.join(tables))
+
+
+def init_app(app):
+    app.cli.add_command(explain_cli)
@@ -1,3 +1,4 @@
+import os
 from fabric.api import local, settings, abort
 from fabric.contrib.console import confirm
 
@@ -5,11 +6,22 @@ from fabric.contrib.console import confirm
 
 
 def test():
+    with settings(warn_only=True):
+        result = local("python -m pytest -q", capture=True)
+    if result.failed and not confirm("Tests failed. Continue?"):
+        abort("Aborted at user request.")
+
+
+def bench():
+    # benchmarks/scenarios.py; repopulates BENCH_DATABASE_URL and exits
+    # non-zero when a route regressed against the previous run
+    if not os.environ.get("BENCH_DATABASE_URL"):
+        abort("Set BENCH_DATABASE_URL to a scratch database for the benchmarks.")
     with settings(warn_only=True):
         result = local(
-            "python test_tasks.py -v && python test_users.py -v", capture=True
+            "python -m benchmarks.scenarios --database-url \"$BENCH_DATABASE_URL\""
         )
-    if result.failed and not confirm("Tests failed. Continue?"):
+    if result.failed and not confirm("Benchmarks regressed. Continue?"):
         abort("Aborted at user request.")
 
 
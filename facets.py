@@ -0,0 +1,141 @@
+from collections import namedtuple
+from sqlalchemy import and_, event, func
+from werkzeug.exceptions import BadRequest
+from enums import Genre, State
+from models import db, Venue, Artist
+from pagination import key, keyset_page
+
+#----------------------------------------------------------------------------#
+# Faceted browsing by genre and state.
+#
+# genres is a string array, and filtering on it means unnesting every row.
+# Venues and artists also carry genre_mask, an integer with bit i set for
+# the i-th Genre member, kept in sync by the mapper events below on every
+# ORM save and written next to search_text by bulk loads. "Jazz and Blues"
+# is then genre_mask & mask = mask, one integer test per row.
+#
+# A B-tree cannot look up a bitwise test, so the index is on (state,
+# genre_mask): a state filter is a range scan, the genre test is evaluated
+# on the index entries, and the facet counts are an index-only scan instead
+# of a pass over the wide rows.
+#
+# Bits follow the declaration order of Genre: add new genres at the end.
+#----------------------------------------------------------------------------#
+
+BROWSABLE = (Venue, Artist)
+GENRE_BITS = {genre.value: 1 << i for i, genre in enumerate(Genre)}
+STATES = frozenset(state.value for state in State)
+
+Facets = namedtuple('Facets', 'total genres states')
+Facet = namedtuple('Facet', 'value count selected')
+
+
+def genre_mask(genres):
+    """Bitmask of genres; values that are not a Genre are ignored."""
+    mask = 0
+    for genre in genres or ():
+        mask |= GENRE_BITS.get(genre, 0)
+    return mask
+
+
+def mask_genres(mask):
+    """The genres whose bits are set in mask, in Genre order."""
+    return [genre for genre, bit in GENRE_BITS.items() if mask & bit]
+
+
+def parse_filters(args):
+    """ (genres, states) selected by ?genre=...&state=... request args.
+
+    Unknown values are a 400, so a typo does not silently widen the filter.
+    """
+    genres = [genre for genre in GENRE_BITS if genre in args.getlist('genre')]
+    unknown = set(args.getlist('genre')) - set(genres)
+    states = sorted({state.upper() for state in args.getlist('state')})
+    unknown |= set(states) - STATES
+    if unknown:
+        raise BadRequest(f'Unknown genre or state: {", ".join(sorted(unknown))}.')
+    return genres, states
+
+
+def _has_all(model, mask):
+    return model.genre_mask.op('&')(mask) == mask
+
+
+def _criteria(model, genres, states):
+    criteria = []
+    if genres:
+        criteria.append(_has_all(model, genre_mask(genres)))
+    if states:
+        criteria.append(model.state.in_(states))
+    return criteria
+
+
+def facet_counts(model, genres, states):
+    """ Result total and per-genre / per-state counts, in one aggregate query.
+
+    Counts are what each facet would show if it were added: a genre's count
+    is the matches that also have that genre, and a state's count is the
+    genre matches in that state (the state selection is not applied to it,
+    so other states can be added).
+    """
+    matches = _has_all(model, genre_mask(genres)) if genres else None
+    columns = [model.state, func.count().filter(matches) if genres else func.count()]
+    for bit in GENRE_BITS.values():
+        has_genre = model.genre_mask.op('&')(bit) != 0
+        columns.append(func.count().filter(and_(matches, has_genre) if genres else has_genre))
+    # rows without a state count toward the total, but have no state facet
+    rows = db.session.query(*columns).group_by(model.state).all()
+    stated = sorted((row for row in rows if row[0] is not None), key=lambda row: row[0])
+
+    chosen = [row for row in rows if not states or row[0] in states]
+    by_genre = [sum(row[i + 2] for row in chosen) for i in range(len(GENRE_BITS))]
+    return Facets(
+        total=sum(row[1] for row in chosen),
+        genres=[Facet(genre, count, genre in genres) for genre, count in zip(GENRE_BITS, by_genre)],
+        states=[Facet(row[0], row[1], row[0] in states) for row in stated if row[1] or row[0] in states],
+    )
+
+
+def browse_venues(genres, states, cursor=None, per_page=50):
+    """One page of venues matching the filters, keyset on (state, city, name, id) like /venues."""
+    query = db.session.query(
+        Venue.id,
+        Venue.name,
+        Venue.city,
+        Venue.state,
+        Venue.genre_mask,
+        Venue.upcoming_shows_count.label('num_upcoming_shows'),
+        Venue.updated_at
+    ).filter(*_criteria(Venue, genres, states))
+    return keyset_page(query, [key(Venue.state, null=''), key(Venue.city, null=''),
+                               key(Venue.name, null=''), key(Venue.id)],
+                       cursor=cursor, per_page=per_page)
+
+
+def browse_artists(genres, states, cursor=None, per_page=50):
+    """One page of artists matching the filters, keyset on (name, id) like /artists."""
+    query = db.session.query(
+        Artist.id,
+        Artist.name,
+        Artist.city,
+        Artist.state,
+        Artist.genre_mask,
+        Artist.updated_at
+    ).filter(*_criteria(Artist, genres, states))
+    return keyset_page(query, [key(Artist.name, null=''), key(Artist.id)], cursor=cursor, per_page=per_page)
+
+
+#----------------------------------------------------------------------------#
+# Mask maintenance.
+#----------------------------------------------------------------------------#
+
+def _set_genre_mask(mapper, connection, target):
+    target.genre_mask = genre_mask(target.genres)
+
+
+def init_app(app):
+    for model in BROWSABLE:
+        if not event.contains(model, 'before_insert', _set_genre_mask):
+            event.listen(model, 'before_insert', _set_genre_mask)
+            event.listen(model, 'before_update', _set_genre_mask)
+    app.jinja_env.globals.update(mask_genres=mask_genres)
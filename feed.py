@@ -0,0 +1,69 @@
+from datetime import datetime
+from sqlalchemy import delete, insert, select, true, update
+from models import db, Venue, Artist, Show, UpcomingShow
+
+#----------------------------------------------------------------------------#
+# Upcoming show feed.
+#
+# upcoming_show_feed holds one denormalized row (venue and artist name,
+# artist image, start time) per show that has not started, so /shows reads
+# a single table in start_time order with no joins and no past shows. The
+# write paths keep it current in their own transaction; `flask shows
+# rollover` drops shows as they start, and `flask shows rebuild-feed`
+# recomputes it (see counters.py).
+#----------------------------------------------------------------------------#
+
+FEED_COLUMNS = ['show_id', 'venue_id', 'venue_name', 'artist_id', 'artist_name',
+                'artist_image_link', 'start_time']
+
+
+def _feed_rows(criterion, now):
+    return select(Show.id, Venue.id, Venue.name, Artist.id, Artist.name, Artist.image_link,
+                  Show.start_time) \
+        .join(Venue, Venue.id == Show.venue_id) \
+        .join(Artist, Artist.id == Show.artist_id) \
+        .where(criterion, Show.start_time > now)
+
+
+def add_shows(criterion, now=None):
+    """Add the upcoming shows matching criterion, e.g. Show.id == show.id."""
+    db.session.flush()
+    db.session.execute(insert(UpcomingShow.__table__)
+                       .from_select(FEED_COLUMNS, _feed_rows(criterion, now or datetime.now())))
+
+
+def forget_shows(criterion):
+    """Remove the feed rows of shows matching criterion, before they are deleted."""
+    db.session.execute(delete(UpcomingShow.__table__)
+                       .where(UpcomingShow.show_id.in_(select(Show.id).where(criterion))))
+
+
+def refresh_venue(venue_id):
+    """Copy a venue's (edited) name onto its feed rows."""
+    db.session.flush()
+    db.session.execute(update(UpcomingShow.__table__)
+                       .where(UpcomingShow.venue_id == venue_id)
+                       .values(venue_name=select(Venue.name).where(Venue.id == venue_id).scalar_subquery()))
+
+
+def refresh_artist(artist_id):
+    """Copy an artist's (edited) name and image onto its feed rows."""
+    db.session.flush()
+    db.session.execute(update(UpcomingShow.__table__)
+                       .where(UpcomingShow.artist_id == artist_id)
+                       .values(artist_name=select(Artist.name)
+                                   .where(Artist.id == artist_id).scalar_subquery(),
+                               artist_image_link=select(Artist.image_link)
+                                   .where(Artist.id == artist_id).scalar_subquery()))
+
+
+def drop_started(now=None):
+    """Remove shows that have started; returns how many."""
+    result = db.session.execute(delete(UpcomingShow.__table__)
+                                .where(UpcomingShow.start_time <= (now or datetime.now())))
+    return result.rowcount
+
+
+def rebuild(now=None):
+    db.session.execute(delete(UpcomingShow.__table__))
+    add_shows(true(), now)
@@ -1,23 +1,84 @@
+import re
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime
 from flask_wtf import FlaskForm as Form
 from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField
 from wtforms.validators import DataRequired, AnyOf, URL, Length, Regexp, InputRequired
 from wtforms import validators, ValidationError  
 from enums import Genre, State
-import re
+from models import db, Venue, Artist
+
+#----------------------------------------------------------------------------#
+# Validation.
+#
+# Enum membership is checked against frozensets built once at import, and
+# the phone pattern is compiled once. Shows are checked against existing
+# venue and artist ids before anything is written, through owner_ids: one
+# query per table for a whole batch of ids, with ids known to exist kept for
+# OWNER_ID_TTL seconds. A hit can only go stale by the row being deleted;
+# the delete views forget the id in their own worker, and the foreign key
+# still guards the rest.
+#----------------------------------------------------------------------------#
+
+GENRES = frozenset(name for name, _ in Genre.choices())
+STATES = frozenset(name for name, _ in State.choices())
+
+# see is_valid_phone
+PHONE_PATTERN = re.compile(r'^\(?([0-9]{3})\)?[-. ]?([0-9]{3})[-. ]?([0-9]{4})$')
+
+OWNER_ID_TTL = 60
+OWNER_ID_MAX_ENTRIES = 10000
+
+
+class IdLookup(object):
+    """Which ids of a table exist, remembering the ones that did for a while."""
+
+    def __init__(self, ttl=OWNER_ID_TTL, max_entries=OWNER_ID_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._seen = OrderedDict()
+        self._lock = threading.Lock()
+
+    def existing(self, model, ids):
+        """The subset of ids that are rows of model; one query for those not remembered."""
+        now = time.monotonic()
+        found, wanted = set(), set()
+        with self._lock:
+            for id in set(ids):
+                seen_at = self._seen.get((model.__tablename__, id))
+                if seen_at is not None and now - seen_at < self.ttl:
+                    found.add(id)
+                else:
+                    wanted.add(id)
+        if wanted:
+            hits = {id for id, in db.session.query(model.id).filter(model.id.in_(wanted))}
+            if not self.ttl:
+                return found | hits
+            with self._lock:
+                for id in hits:
+                    self._seen[(model.__tablename__, id)] = now
+                    self._seen.move_to_end((model.__tablename__, id))
+                while len(self._seen) > self.max_entries:
+                    self._seen.popitem(last=False)
+            found |= hits
+        return found
+
+    def forget(self, model, id):
+        with self._lock:
+            self._seen.pop((model.__tablename__, int(id)), None)
+
+    def init_app(self, app):
+        # remembered ids are per process; 0 always asks the database
+        app.config.setdefault('OWNER_ID_TTL', OWNER_ID_TTL)
+        self.ttl = app.config['OWNER_ID_TTL']
+        with self._lock:
+            self._seen.clear()
+
+
+owner_ids = IdLookup()
 
-class ShowForm(Form):
-    artist_id = StringField(
-        'artist_id'
-    )
-    venue_id = StringField(
-        'venue_id'
-    )
-    start_time = DateTimeField(
-        'start_time',
-        validators=[DataRequired()],
-        default= datetime.today()
-    )
 
 def is_valid_phone(number):
     """ Validate phone numbers like:
@@ -33,10 +94,47 @@ def is_valid_phone(number):
 
     Note: (? = optional) - Learn more: https://regex101.com/
     """
-    regex = re.compile('^\(?([0-9]{3})\)?[-. ]?([0-9]{3})[-. ]?([0-9]{4})$')
-    return regex.match(number)
+    return PHONE_PATTERN.match(number or '')
+
+
+class ShowForm(Form):
+    # the bulk loader checks a whole batch's owners at once instead
+    check_owners = True
+
+    def validate(self):
+      rv = Form.validate(self)
+      if not rv:
+          return False
+      owners = ((self.venue_id, Venue), (self.artist_id, Artist))
+      for field, model in owners:
+          try:
+              int(field.data)
+          except (TypeError, ValueError):
+              field.errors.append(':: Must be a number.')
+              return False
+      if self.check_owners:
+          for field, model in owners:
+              if int(field.data) not in owner_ids.existing(model, [int(field.data)]):
+                  field.errors.append(f':: No {model.__tablename__} with id {field.data}.')
+                  return False
+      return True
+
+    artist_id = StringField(
+        'artist_id', validators=[DataRequired()]
+    )
+    venue_id = StringField(
+        'venue_id', validators=[DataRequired()]
+    )
+    start_time = DateTimeField(
+        'start_time',
+        validators=[DataRequired()],
+        default= datetime.today()
+    )
+
+
+class ListingForm(Form):
+    """Rules shared by VenueForm and ArtistForm."""
 
-class VenueForm(Form):
     def validate(self):
       """Define a custom validate method in your Form:"""
       rv = Form.validate(self)
@@ -45,15 +143,17 @@ class VenueForm(Form):
       if not is_valid_phone(self.phone.data):
           self.phone.errors.append(':: Invalid phone number:')
           return False
-      if not set(self.genres.data).issubset(dict(Genre.choices()).keys()):
+      if not GENRES.issuperset(self.genres.data):
           self.genres.errors.append(':: Invalid genres.')
           return False
-      if self.state.data not in dict(State.choices()).keys():
+      if self.state.data not in STATES:
           self.state.errors.append(':: Invalid state.')
           return False
       # if pass validation
       return True
 
+
+class VenueForm(ListingForm):
     name = StringField(
         'name', validators=[DataRequired()]
     )
@@ -93,25 +193,7 @@ class VenueForm(Form):
 
 
 
-class ArtistForm(Form):
-
-    def validate(self):
-      """Define a custom validate method in your Form:"""
-      rv = Form.validate(self)
-      if not rv:
-          return False
-      if not is_valid_phone(self.phone.data):
-          self.phone.errors.append(':: Invalid phone number:')
-          return False
-      if not set(self.genres.data).issubset(dict(Genre.choices()).keys()):
-          self.genres.errors.append(':: Invalid genres.')
-          return False
-      if self.state.data not in dict(State.choices()).keys():
-          self.state.errors.append(':: Invalid state.')
-          return False
-      # if pass validation
-      return True
-
+class ArtistForm(ListingForm):
 
     name = StringField(
         'name', validators=[DataRequired()]
@@ -0,0 +1,36 @@
+""" gunicorn settings: preload the app in the master, then fork workers.
+
+    FYYUR_PROFILE=production SECRET_KEY_FILE=/etc/fyyur/secret_key \\
+        CACHE_REDIS_URL=redis://localhost:6379/0 gunicorn -c gunicorn.conf.py
+
+The master imports app.py, builds the app and warms it (startup.warm) once;
+workers are forked from it instead of each importing and initializing
+everything again. gc.freeze() keeps the collector from touching, and so
+copying, the objects the master built.
+"""
+import gc
+import multiprocessing
+import os
+
+wsgi_app = 'app:create_app()'
+preload_app = True
+bind = os.environ.get('BIND', '127.0.0.1:5000')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+
+
+def when_ready(server):
+    import startup
+    app = server.app.wsgi()
+    startup.warm(app)
+    # a new master starts its workers' metrics from zero
+    if 'metrics' in app.extensions:
+        app.extensions['metrics'].clear()
+    gc.freeze()
+
+
+def child_exit(server, worker):
+    # fold the worker's metrics file into the dead workers' totals
+    app = server.app.wsgi()
+    if 'metrics' in app.extensions:
+        app.extensions['metrics'].mark_process_dead(worker.pid)
@@ -0,0 +1,132 @@
+import re
+import time
+from collections import Counter, deque
+from flask import g, has_request_context, jsonify, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+#----------------------------------------------------------------------------#
+# Per-request SQL instrumentation.
+#----------------------------------------------------------------------------#
+
+_IN_LIST = re.compile(r'\bIN\s*\((?:[^()]|\([^()]*\))*\)', re.IGNORECASE)
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_SPACE = re.compile(r'\s+')
+
+
+class QueryBudgetExceeded(Exception):
+    """Raised in strict mode when a request issues more queries than allowed."""
+
+
+def statement_shape(statement):
+    """Collapse literals and IN lists so repeats of the same query compare equal."""
+    shape = _IN_LIST.sub('IN (?)', statement)
+    shape = _LITERAL.sub('?', shape)
+    return _SPACE.sub(' ', shape).strip()
+
+
+class QueryStats(object):
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.rows = 0
+        self.shapes = Counter()
+
+    def record(self, statement, seconds, rows=0):
+        self.count += 1
+        self.seconds += seconds
+        self.rows += rows
+        self.shapes[statement_shape(statement)] += 1
+
+    def repeated(self, threshold):
+        return [(shape, n) for shape, n in self.shapes.most_common() if n >= threshold]
+
+    def as_dict(self, threshold):
+        return {
+            "queries": self.count,
+            "db_ms": round(self.seconds * 1000, 3),
+            "rows": self.rows,
+            "repeated": [{"count": n, "statement": shape} for shape, n in self.repeated(threshold)]
+        }
+
+
+def current_stats():
+    """QueryStats for the active request, or None outside of one."""
+    if not has_request_context():
+        return None
+    return g.get('query_stats')
+
+
+# The start time is kept on the statement's execution context rather than on
+# the connection: a statement that raises never reaches after_cursor_execute,
+# and would leave a stale entry behind for the next query on that connection.
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context.query_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, 'query_started', None)
+    stats = current_stats()
+    if stats is not None and started is not None:
+        # psycopg2 reports the rows a SELECT returned; sqlite3 reports -1
+        stats.record(statement, time.perf_counter() - started, max(cursor.rowcount, 0))
+
+
+def init_app(app):
+    app.config.setdefault('QUERY_STATS_HEADERS', False)
+    app.config.setdefault('QUERY_STATS_ENDPOINT', app.debug)
+    app.config.setdefault('QUERY_STATS_HISTORY', 100)
+    app.config.setdefault('QUERY_BUDGETS', {})
+    app.config.setdefault('QUERY_BUDGET_DEFAULT', None)
+    app.config.setdefault('QUERY_BUDGET_STRICT', False)
+    app.config.setdefault('QUERY_BUDGET_EXEMPT', ())
+    app.config.setdefault('QUERY_REPEAT_THRESHOLD', 5)
+
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+
+    history = deque(maxlen=app.config['QUERY_STATS_HISTORY'])
+
+    @app.before_request
+    def start_query_stats():
+        g.query_stats = QueryStats()
+
+    @app.after_request
+    def finish_query_stats(response):
+        stats = g.get('query_stats')
+        if stats is None or request.endpoint == 'query_stats':
+            return response
+
+        config = app.config
+        threshold = config['QUERY_REPEAT_THRESHOLD']
+        summary = stats.as_dict(threshold)
+        history.append(dict(summary, endpoint=request.endpoint, path=request.full_path))
+
+        if config['QUERY_STATS_HEADERS']:
+            response.headers['X-Query-Count'] = str(stats.count)
+            response.headers['X-Query-Time-Ms'] = '%.3f' % (stats.seconds * 1000)
+
+        if request.endpoint in config['QUERY_BUDGET_EXEMPT']:
+            return response
+        problems = []
+        budget = config['QUERY_BUDGETS'].get(request.endpoint, config['QUERY_BUDGET_DEFAULT'])
+        if budget is not None and stats.count > budget:
+            problems.append(f'{stats.count} queries (budget {budget})')
+        for shape, n in stats.repeated(threshold):
+            problems.append(f'N+1 suspect, {n}x: {shape[:200]}')
+
+        if problems:
+            message = f'Query budget exceeded on {request.endpoint}: ' + '; '.join(problems)
+            if config['QUERY_BUDGET_STRICT']:
+                raise QueryBudgetExceeded(message)
+            app.logger.warning(message, extra={'event': 'query_budget'})
+        return response
+
+    if app.config['QUERY_STATS_ENDPOINT']:
+        @app.route('/_debug/queries')
+        def query_stats():
+            return jsonify(requests=list(history))
@@ -0,0 +1,24 @@
+from models import db, Venue, Artist
+
+#----------------------------------------------------------------------------#
+# Loading strategies.
+#
+# Venue.shows, Artist.shows and the Show.venue / Show.artist backrefs are
+# declared lazy="raise", so touching a relationship a view did not ask for
+# fails loudly instead of issuing a query per row. Each view picks one of
+# the option sets below for the columns and relationships it renders.
+#----------------------------------------------------------------------------#
+
+def venue_detail():
+    """show_venue: the header columns only; show tiles come from queries.venue_shows."""
+    return [db.defer(Venue.search_text)]
+
+
+def artist_detail():
+    """show_artist: the header columns only; show tiles come from queries.artist_shows."""
+    return [db.defer(Artist.search_text)]
+
+
+def search_row(model):
+    """search_venues / search_artists: just what a result line shows."""
+    return [db.load_only(model.id, model.name, model.upcoming_shows_count, model.updated_at)]
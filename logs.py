@@ -0,0 +1,221 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import time
+import traceback
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import (QueueHandler, QueueListener, RotatingFileHandler, TimedRotatingFileHandler,
+                              WatchedFileHandler)
+from flask import g, has_request_context, request
+from flask.logging import default_handler
+import instrumentation
+
+#----------------------------------------------------------------------------#
+# Logging.
+#
+# The app logger only puts records on a bounded in-memory queue; a
+# QueueListener thread formats them as one JSON object per line and does
+# the file I/O, with size or time rotation. When the queue is full (the
+# writer cannot keep up, e.g. an error burst during a database incident)
+# records are dropped and counted instead of waited on, so logging never
+# adds latency to a request.
+#
+# Request fields (request id, endpoint, DB time so far) are captured when a
+# record is created, in the request's thread. Records with an `event` extra
+# ("access", "query_budget", ...) are kept at the LOG_SAMPLE_RATES fraction
+# for that event; ERROR and above are always kept.
+#
+#   app.logger.warning('replica lagging', extra={'event': 'replica_lag'})
+#----------------------------------------------------------------------------#
+
+# attributes every LogRecord has; anything else on a record came from extra=
+_STANDARD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: time, level, logger, message, request fields, extras."""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for name, value in vars(record).items():
+            if name not in _STANDARD_ATTRS and value is not None:
+                entry[name] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Keep each record with an `event` extra at that event's rate."""
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record):
+        rate = self.rates.get(getattr(record, 'event', None))
+        if rate is None or rate >= 1 or record.levelno >= logging.ERROR:
+            return True
+        if random.random() >= rate:
+            return False
+        record.sample_rate = rate
+        return True
+
+
+class RequestQueueHandler(QueueHandler):
+    """ Enqueue without blocking, after attaching the current request's fields.
+
+    Exceptions are rendered here, since tracebacks reference the request
+    thread's frames and must not outlive it.
+    """
+
+    def __init__(self, queue):
+        super().__init__(queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        record = logging.makeLogRecord(vars(record))
+        if has_request_context():
+            record.request_id = g.get('request_id')
+            record.method = request.method
+            record.path = request.path
+            record.endpoint = request.endpoint
+            stats = instrumentation.current_stats()
+            if stats is not None:
+                record.queries = stats.count
+                record.db_ms = round(stats.seconds * 1000, 3)
+        if record.exc_info:
+            record.exc_text = ''.join(traceback.format_exception(*record.exc_info)).rstrip()
+            record.exc_info = None
+        record.msg, record.args = record.getMessage(), None
+        return record
+
+    def enqueue(self, record):
+        try:
+            if self.dropped:
+                self.queue.put_nowait(logging.makeLogRecord({
+                    'name': record.name, 'levelno': logging.WARNING, 'levelname': 'WARNING',
+                    'msg': f'{self.dropped} log records dropped: queue full', 'event': 'log_dropped'}))
+                self.dropped = 0
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class Listener(QueueListener):
+
+    def stop(self):
+        if self._thread is not None:
+            super().stop()
+
+
+def file_handler(config, forked=False):
+    path = config['LOG_FILE'].format(pid=os.getpid())
+    if forked and '{pid}' not in config['LOG_FILE']:
+        # workers sharing one file must not each rotate it; they append,
+        # and reopen it when something else (logrotate) has moved it
+        return WatchedFileHandler(path, delay=True)
+    if config['LOG_ROTATE'] == 'time':
+        return TimedRotatingFileHandler(path, when=config['LOG_ROTATE_WHEN'],
+                                        backupCount=config['LOG_BACKUP_COUNT'], delay=True)
+    return RotatingFileHandler(path, maxBytes=config['LOG_MAX_BYTES'],
+                               backupCount=config['LOG_BACKUP_COUNT'], delay=True)
+
+
+def _listener(config, records, forked=False):
+    handlers = []
+    if config['LOG_FILE']:
+        handlers.append(file_handler(config, forked))
+        handlers[-1].setFormatter(JsonFormatter())
+    if config['LOG_STDERR']:
+        handlers.append(logging.StreamHandler(sys.stderr))
+        handlers[-1].setFormatter(JsonFormatter())
+    return Listener(records, *handlers, respect_handler_level=True)
+
+
+# logger name -> its RequestQueueHandler; Flask apps share a logger per
+# import name, so a later init_app replaces the earlier one's handler and
+# listener instead of adding another
+_handlers = {}
+_hooks_registered = False
+
+
+def _restart_in_child():
+    # the listener thread does not survive a fork (gunicorn --preload);
+    # each worker gets its own queue and thread
+    for handler in _handlers.values():
+        handler.queue = queue.Queue(handler.queue.maxsize)
+        handler.dropped = 0
+        handler.listener = _listener(handler.config, handler.queue, forked=True)
+        handler.listener.start()
+
+
+def _stop_listeners():
+    # flush what is still queued on a clean exit
+    for handler in _handlers.values():
+        handler.listener.stop()
+
+
+def init_app(app):
+    global _hooks_registered
+    app.config.setdefault('LOG_LEVEL', 'INFO')
+    app.config.setdefault('LOG_FILE', None)
+    app.config.setdefault('LOG_STDERR', True)
+    app.config.setdefault('LOG_ROTATE', 'size')
+    app.config.setdefault('LOG_MAX_BYTES', 50 * 1024 * 1024)
+    app.config.setdefault('LOG_ROTATE_WHEN', 'midnight')
+    app.config.setdefault('LOG_BACKUP_COUNT', 7)
+    app.config.setdefault('LOG_QUEUE_SIZE', 10000)
+    app.config.setdefault('LOG_ACCESS', True)
+    app.config.setdefault('LOG_SAMPLE_RATES', {})
+
+    config = app.config
+    previous = _handlers.pop(app.logger.name, None)
+    if previous is not None:
+        app.logger.removeHandler(previous)
+        previous.listener.stop()
+
+    handler = RequestQueueHandler(queue.Queue(config['LOG_QUEUE_SIZE']))
+    handler.addFilter(SamplingFilter(config['LOG_SAMPLE_RATES']))
+    handler.config = config
+    handler.listener = _listener(config, handler.queue)
+    handler.listener.start()
+    _handlers[app.logger.name] = handler
+    app.logger.removeHandler(default_handler)
+    app.logger.addHandler(handler)
+    app.logger.setLevel(config['LOG_LEVEL'])
+    app.extensions['logs'] = handler
+    access = app.logger.getChild('access')
+
+    if not _hooks_registered:
+        os.register_at_fork(after_in_child=_restart_in_child)
+        atexit.register(_stop_listeners)
+        _hooks_registered = True
+
+    @app.before_request
+    def start_request_log():
+        g.request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def log_request(response):
+        if 'request_id' not in g:
+            return response
+        response.headers['X-Request-ID'] = g.request_id
+        if config['LOG_ACCESS']:
+            access.info('%s %s %s', request.method, request.full_path.rstrip('?'), response.status_code,
+                        extra={'event': 'access', 'status': response.status_code,
+                               'duration_ms': round((time.perf_counter() - g.request_started) * 1000, 3)})
+        return response
@@ -0,0 +1,360 @@
+import errno
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from bisect import bisect_left
+from flask import Response, g, has_request_context, request
+import jinja2
+import instrumentation
+
+#----------------------------------------------------------------------------#
+# Prometheus metrics, aggregated across worker processes.
+#
+# Each process adds to its own memory-mapped file, METRICS_DIR/<pid>.db: a
+# list of (sample, float64) entries appended once and then updated in place,
+# so recording a request costs a few dict lookups and 8-byte writes. GET
+# /metrics reads every process's file and sums the samples: counters and
+# histograms keep what exited workers counted, while the in-progress gauge
+# only counts processes that are still running. When gunicorn reaps a worker
+# (child_exit in gunicorn.conf.py) its file is folded into METRICS_DIR/dead.db
+# and removed, so restarted workers do not leave a file each behind.
+#
+# Latency is measured from the first before_request to the last
+# after_request; for streamed responses, until the body has been sent.
+# Rows are those reported by the driver (psycopg2 counts SELECT rows,
+# sqlite3 does not).
+#----------------------------------------------------------------------------#
+
+METRICS = {
+    'fyyur_http_requests_total': ('counter', 'Requests handled, by endpoint, method and status.'),
+    'fyyur_http_request_duration_seconds': ('histogram', 'Request latency, by endpoint.'),
+    'fyyur_http_requests_in_progress': ('gauge', 'Requests being handled.'),
+    'fyyur_http_response_bytes_total': ('counter', 'Response body bytes sent, by endpoint.'),
+    'fyyur_db_duration_seconds': ('histogram', 'Database time per request, by endpoint.'),
+    'fyyur_db_queries_total': ('counter', 'SQL statements executed, by endpoint.'),
+    'fyyur_db_rows_total': ('counter', 'Rows fetched from the database, by endpoint.'),
+    'fyyur_template_render_seconds_total': ('counter', 'Time spent rendering templates, by endpoint.'),
+}
+# summed over live processes only
+LIVE_GAUGES = {'fyyur_http_requests_in_progress'}
+# what exited processes counted
+DEAD_FILE = 'dead.db'
+
+_USED = struct.Struct('q')
+_LENGTH = struct.Struct('i')
+_VALUE = struct.Struct('d')
+INITIAL_SIZE = 1 << 16
+
+
+def _value_offset(pos, length):
+    # values are 8-byte aligned, after the key's length and bytes
+    return (pos + _LENGTH.size + length + 7) & ~7
+
+
+def _entries(data):
+    """(key, value, offset) for each entry of a values file's contents."""
+    used = _USED.unpack_from(data, 0)[0]
+    pos = _USED.size
+    while pos < used:
+        length = _LENGTH.unpack_from(data, pos)[0]
+        start = pos + _LENGTH.size
+        name, labels = json.loads(bytes(data[start:start + length]))
+        offset = _value_offset(pos, length)
+        yield (name, tuple(map(tuple, labels))), _VALUE.unpack_from(data, offset)[0], offset
+        pos = offset + _VALUE.size
+
+
+class ValueFile(object):
+    """One process's samples, keyed by (name, labels)."""
+
+    def __init__(self, path):
+        self.lock = threading.Lock()
+        self.file = open(path, 'a+b')
+        if os.fstat(self.file.fileno()).st_size == 0:
+            self.file.truncate(INITIAL_SIZE)
+        self.map = mmap.mmap(self.file.fileno(), 0)
+        self.used = _USED.unpack_from(self.map, 0)[0] or _USED.size
+        # a file left by an earlier process with the same pid carries on
+        self.offsets = {key: offset for key, _, offset in _entries(self.map)}
+        for key in self.offsets:
+            if key[0] in LIVE_GAUGES:
+                _VALUE.pack_into(self.map, self.offsets[key], 0.0)
+
+    def _append(self, key):
+        encoded = json.dumps(key).encode()
+        offset = _value_offset(self.used, len(encoded))
+        end = offset + _VALUE.size
+        if end > len(self.map):
+            self.map.resize(max(end, len(self.map) * 2))
+        _LENGTH.pack_into(self.map, self.used, len(encoded))
+        start = self.used + _LENGTH.size
+        self.map[start:start + len(encoded)] = encoded
+        _VALUE.pack_into(self.map, offset, 0.0)
+        # readers only look up to `used`, so the entry is complete before it
+        # becomes visible
+        self.used = end
+        _USED.pack_into(self.map, 0, self.used)
+        self.offsets[key] = offset
+        return offset
+
+    def add(self, samples):
+        """Add each (key, amount) of samples."""
+        with self.lock:
+            for key, amount in samples:
+                offset = self.offsets.get(key)
+                if offset is None:
+                    offset = self._append(key)
+                _VALUE.pack_into(self.map, offset, _VALUE.unpack_from(self.map, offset)[0] + amount)
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except OSError as e:
+        return e.errno == errno.EPERM
+    return True
+
+
+class Metrics(object):
+
+    def __init__(self, directory, buckets):
+        self.directory = directory
+        self.buckets = sorted(buckets)
+        self.pid = None
+        self.values = None
+        self.pid_lock = threading.Lock()
+
+    def _file(self):
+        # opened lazily, and again after a fork, so each worker has its own
+        pid = os.getpid()
+        if self.pid != pid:
+            with self.pid_lock:
+                if self.pid != pid:
+                    os.makedirs(self.directory, exist_ok=True)
+                    self.values = ValueFile(os.path.join(self.directory, f'{pid}.db'))
+                    self.pid = pid
+        return self.values
+
+    def add(self, samples):
+        self._file().add(samples)
+
+    def observe(self, samples, name, labels, value):
+        """Append a histogram observation's samples: its bucket, sum and count."""
+        index = bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            samples.append(((name + '_bucket', labels + (('le', repr(self.buckets[index])),)), 1))
+        samples.append(((name + '_sum', labels), value))
+        samples.append(((name + '_count', labels), 1))
+
+    def mark_process_dead(self, pid):
+        """Add an exited process's counters and histograms to the dead file, and remove its own."""
+        path = os.path.join(self.directory, f'{pid}.db')
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return
+        samples = [(key, value) for key, value, _ in _entries(data) if key[0] not in LIVE_GAUGES]
+        dead = ValueFile(os.path.join(self.directory, DEAD_FILE))
+        try:
+            dead.add(samples)
+        finally:
+            dead.close()
+        os.remove(path)
+
+    def collect(self):
+        """Samples summed over every process's file."""
+        totals = {}
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            names = []
+        for filename in names:
+            if not filename.endswith('.db'):
+                continue
+            pid = filename[:-3]
+            live = pid.isdigit() and _alive(int(pid))
+            try:
+                with open(os.path.join(self.directory, filename), 'rb') as f:
+                    data = f.read()
+            except FileNotFoundError:
+                continue
+            for key, value, _ in _entries(data):
+                if live or key[0] not in LIVE_GAUGES:
+                    totals[key] = totals.get(key, 0.0) + value
+        return totals
+
+    def clear(self):
+        """Remove every process's file, e.g. before a new master forks its workers."""
+        if not os.path.isdir(self.directory):
+            return
+        for filename in os.listdir(self.directory):
+            if filename.endswith('.db'):
+                os.remove(os.path.join(self.directory, filename))
+        self.pid = self.values = None
+
+
+#----------------------------------------------------------------------------#
+# Text exposition.
+#----------------------------------------------------------------------------#
+
+def _labels(labels):
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+               for _, value in labels)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(labels, escaped)) + '}'
+
+
+def _number(value):
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def exposition(totals, buckets):
+    """The Prometheus text format for summed samples; histograms report every bucket bound."""
+    bounds = [repr(bound) for bound in sorted(buckets)]
+    lines = []
+    for name, (kind, help) in METRICS.items():
+        lines.append(f'# HELP {name} {help}')
+        lines.append(f'# TYPE {name} {kind}')
+        if kind != 'histogram':
+            for (sample, labels), value in sorted(totals.items()):
+                if sample == name:
+                    lines.append(f'{name}{_labels(labels)} {_number(value)}')
+            continue
+        # buckets are stored per bucket, only once observed, and reported
+        # cumulatively, each configured bound included
+        series = {}
+        for (sample, labels), value in totals.items():
+            if sample == name + '_bucket':
+                bound = dict(labels)['le']
+                rest = tuple(label for label in labels if label[0] != 'le')
+                series.setdefault(rest, {})[bound] = value
+            elif sample == name + '_count':
+                series.setdefault(labels, {})
+        for labels in sorted(series):
+            cumulative = 0.0
+            # bounds recorded under an earlier METRICS_BUCKETS are kept
+            for bound in sorted(set(bounds) | set(series[labels]), key=float):
+                cumulative += series[labels].get(bound, 0.0)
+                lines.append(f'{name}_bucket{_labels(labels + (("le", bound),))} {_number(cumulative)}')
+            count = totals.get((name + '_count', labels), 0.0)
+            lines.append(f'{name}_bucket{_labels(labels + (("le", "+Inf"),))} {_number(count)}')
+            lines.append(f'{name}_sum{_labels(labels)} {_number(totals.get((name + "_sum", labels), 0.0))}')
+            lines.append(f'{name}_count{_labels(labels)} {_number(count)}')
+    return '\n'.join(lines) + '\n'
+
+
+#----------------------------------------------------------------------------#
+# Request hooks.
+#----------------------------------------------------------------------------#
+
+def _add_render_time(started):
+    if has_request_context():
+        g.render_seconds = g.get('render_seconds', 0.0) + time.perf_counter() - started
+
+
+class TimedTemplate(jinja2.Template):
+    """Adds its render time to the request's; includes and macros count toward their page."""
+
+    def render(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return super().render(*args, **kwargs)
+        finally:
+            _add_render_time(started)
+
+    def generate(self, *args, **kwargs):
+        # streamed pages (rendering.py): from the first piece to the last,
+        # which includes reading their rows and waiting on the client
+        started = time.perf_counter()
+        try:
+            yield from super().generate(*args, **kwargs)
+        finally:
+            _add_render_time(started)
+
+
+def _counting(body, charset, sent):
+    """Iterate body, encoded, adding up its size in sent."""
+    try:
+        for chunk in body:
+            if isinstance(chunk, str):
+                chunk = chunk.encode(charset)
+            sent[0] += len(chunk)
+            yield chunk
+    finally:
+        if hasattr(body, 'close'):
+            body.close()
+
+
+def init_app(app):
+    app.config.setdefault('METRICS_ENABLED', True)
+    app.config.setdefault('METRICS_ENDPOINT', True)
+    app.config.setdefault('METRICS_DIR', None)
+    app.config.setdefault('METRICS_BUCKETS', (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0))
+    if not app.config['METRICS_ENABLED']:
+        return
+
+    metrics = app.extensions['metrics'] = Metrics(
+        app.config['METRICS_DIR'] or os.path.join(app.instance_path, 'metrics'),
+        app.config['METRICS_BUCKETS'])
+    app.jinja_env.template_class = TimedTemplate
+    in_progress = (('fyyur_http_requests_in_progress', ()), 1)
+
+    def record(endpoint, method, status, started, stats, render_seconds, size):
+        labels = (('endpoint', endpoint),)
+        samples = [
+            (('fyyur_http_requests_total', labels + (('method', method), ('status', str(status)))), 1),
+            (('fyyur_http_response_bytes_total', labels), size),
+            (('fyyur_template_render_seconds_total', labels), render_seconds),
+            (in_progress[0], -1),
+        ]
+        if stats is not None:
+            samples.append((('fyyur_db_queries_total', labels), stats.count))
+            samples.append((('fyyur_db_rows_total', labels), stats.rows))
+            metrics.observe(samples, 'fyyur_db_duration_seconds', labels, stats.seconds)
+        metrics.observe(samples, 'fyyur_http_request_duration_seconds', labels,
+                        time.perf_counter() - started)
+        metrics.add(samples)
+
+    # registered after logs.py and before the other modules, so this runs
+    # first, and its after_request last
+    @app.before_request
+    def start_metrics():
+        g.metrics_started = time.perf_counter()
+        metrics.add([in_progress])
+
+    @app.after_request
+    def finish_metrics(response):
+        started = g.pop('metrics_started', None)
+        if started is None:
+            return response
+        # the stats object keeps counting while a streamed body is generated
+        args = (request.endpoint or 'none', request.method, response.status_code, started,
+                instrumentation.current_stats())
+        if response.content_length is not None or not response.is_streamed:
+            record(*args, g.get('render_seconds', 0.0), response.content_length or 0)
+            return response
+
+        # recorded once the server has sent the body, after the request
+        # context is gone; the body may still render templates into this g
+        request_g = g._get_current_object()
+        sent = [0]
+        response.response = _counting(response.response, response.charset, sent)
+        response.call_on_close(lambda: record(*args, request_g.get('render_seconds', 0.0), sent[0]))
+        return response
+
+    if app.config['METRICS_ENDPOINT']:
+        @app.route('/metrics')
+        def metrics_exposition():
+            response = Response(exposition(metrics.collect(), metrics.buckets),
+                                mimetype='text/plain; version=0.0.4')
+            response.headers['Cache-Control'] = 'no-store'
+            return response
@@ -0,0 +1,40 @@
+"""show counters on venue and artist
+
+Revision ID: 04c35ac5881c
+Revises: 860c3b0cd65d
+Create Date: 2026-10-18 09:12:44.201356
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '04c35ac5881c'
+down_revision = '860c3b0cd65d'
+branch_labels = None
+depends_on = None
+
+
+BACKFILL = """
+UPDATE {table} SET
+    upcoming_shows_count = (SELECT count(*) FROM show
+                            WHERE show.{fk} = {table}.id AND show.start_time > localtimestamp),
+    past_shows_count     = (SELECT count(*) FROM show
+                            WHERE show.{fk} = {table}.id AND show.start_time <= localtimestamp)
+"""
+
+
+def upgrade():
+    for table in ('venue', 'artist'):
+        op.add_column(table, sa.Column('upcoming_shows_count', sa.Integer(), server_default='0', nullable=False))
+        op.add_column(table, sa.Column('past_shows_count', sa.Integer(), server_default='0', nullable=False))
+
+    op.execute(BACKFILL.format(table='venue', fk='venue_id'))
+    op.execute(BACKFILL.format(table='artist', fk='artist_id'))
+
+
+def downgrade():
+    for table in ('artist', 'venue'):
+        op.drop_column(table, 'past_shows_count')
+        op.drop_column(table, 'upcoming_shows_count')
@@ -0,0 +1,52 @@
+"""upcoming_show_feed table backing /shows
+
+Revision ID: 14ebf6ee10ca
+Revises: c280fa841c16
+Create Date: 2026-10-18 18:21:47.902114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '14ebf6ee10ca'
+down_revision = 'c280fa841c16'
+branch_labels = None
+depends_on = None
+
+
+BACKFILL = """
+INSERT INTO upcoming_show_feed
+    (show_id, venue_id, venue_name, artist_id, artist_name, artist_image_link, start_time)
+SELECT show.id, venue.id, venue.name, artist.id, artist.name, artist.image_link, show.start_time
+FROM show
+JOIN venue ON venue.id = show.venue_id
+JOIN artist ON artist.id = show.artist_id
+WHERE show.start_time > localtimestamp
+"""
+
+
+def upgrade():
+    op.create_table('upcoming_show_feed',
+    sa.Column('show_id', sa.Integer(), nullable=False),
+    sa.Column('venue_id', sa.Integer(), nullable=False),
+    sa.Column('venue_name', sa.String(), nullable=True),
+    sa.Column('artist_id', sa.Integer(), nullable=False),
+    sa.Column('artist_name', sa.String(), nullable=True),
+    sa.Column('artist_image_link', sa.String(length=500), nullable=True),
+    sa.Column('start_time', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['show_id'], ['show.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('show_id')
+    )
+    op.create_index('ix_upcoming_show_feed_start_time', 'upcoming_show_feed', ['start_time', 'show_id'])
+    op.create_index(op.f('ix_upcoming_show_feed_venue_id'), 'upcoming_show_feed', ['venue_id'])
+    op.create_index(op.f('ix_upcoming_show_feed_artist_id'), 'upcoming_show_feed', ['artist_id'])
+    op.execute(BACKFILL)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_upcoming_show_feed_artist_id'), table_name='upcoming_show_feed')
+    op.drop_index(op.f('ix_upcoming_show_feed_venue_id'), table_name='upcoming_show_feed')
+    op.drop_index('ix_upcoming_show_feed_start_time', table_name='upcoming_show_feed')
+    op.drop_table('upcoming_show_feed')
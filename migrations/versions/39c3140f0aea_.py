@@ -0,0 +1,39 @@
+"""indexes for show lookups by owner and start time, and listing sort keys
+
+Revision ID: 39c3140f0aea
+Revises: 3d1f0b7a6e92
+Create Date: 2026-10-18 14:05:31.774402
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '39c3140f0aea'
+down_revision = '3d1f0b7a6e92'
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ('ix_show_venue_id_start_time', 'show', ['venue_id', 'start_time', 'id']),
+    ('ix_show_artist_id_start_time', 'show', ['artist_id', 'start_time', 'id']),
+    ('ix_show_start_time', 'show', ['start_time', 'id']),
+    ('ix_venue_state_city_name', 'venue', ['state', 'city', 'name', 'id']),
+    ('ix_artist_name', 'artist', ['name', 'id']),
+]
+
+
+def upgrade():
+    # CONCURRENTLY keeps the show table writable while the indexes build,
+    # and cannot run inside a transaction.
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table, columns in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
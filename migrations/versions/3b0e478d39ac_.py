@@ -0,0 +1,32 @@
+"""updated_at on venue, artist and upcoming_show_feed for Last-Modified
+
+Revision ID: 3b0e478d39ac
+Revises: 14ebf6ee10ca
+Create Date: 2026-10-18 18:32:05.114027
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b0e478d39ac'
+down_revision = '14ebf6ee10ca'
+branch_labels = None
+depends_on = None
+
+TABLES = ['venue', 'artist', 'upcoming_show_feed']
+
+
+def upgrade():
+    # existing rows count as modified now; the application sets the value
+    # from then on, so the server default is dropped again
+    for table in TABLES:
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(), nullable=False,
+                                       server_default=sa.text("timezone('utc', now())")))
+        op.alter_column(table, 'updated_at', server_default=None)
+
+
+def downgrade():
+    for table in TABLES:
+        op.drop_column(table, 'updated_at')
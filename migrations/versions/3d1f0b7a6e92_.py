@@ -0,0 +1,37 @@
+"""trigram search documents for venue and artist
+
+Revision ID: 3d1f0b7a6e92
+Revises: 04c35ac5881c
+Create Date: 2026-10-18 11:40:02.518930
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3d1f0b7a6e92'
+down_revision = '04c35ac5881c'
+branch_labels = None
+depends_on = None
+
+
+BACKFILL = """
+UPDATE {table} SET search_text = lower(concat_ws(' ', name, city, state, array_to_string(genres, ' ')))
+"""
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for table in ('venue', 'artist'):
+        op.add_column(table, sa.Column('search_text', sa.Text(), nullable=True))
+        op.execute(BACKFILL.format(table=table))
+        op.create_index(
+            f'ix_{table}_search_text_trgm', table, ['search_text'],
+            postgresql_using='gin', postgresql_ops={'search_text': 'gin_trgm_ops'})
+
+
+def downgrade():
+    for table in ('artist', 'venue'):
+        op.drop_index(f'ix_{table}_search_text_trgm', table_name=table)
+        op.drop_column(table, 'search_text')
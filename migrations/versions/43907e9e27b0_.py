@@ -0,0 +1,42 @@
+"""listing indexes on coalesce(column, '') to match keys that sort NULLs as ''
+
+Revision ID: 43907e9e27b0
+Revises: f6d83d91b8c3
+Create Date: 2026-10-18 21:12:40.118305
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '43907e9e27b0'
+down_revision = 'f6d83d91b8c3'
+branch_labels = None
+depends_on = None
+
+# (name, table, nullable key columns, then id)
+INDEXES = [
+    ('ix_venue_state_city_name', 'venue', ['state', 'city', 'name']),
+    ('ix_artist_name', 'artist', ['name']),
+]
+
+
+def _replace(name, table, columns):
+    # CONCURRENTLY keeps the table writable while the index builds, and
+    # cannot run inside a transaction; the new index is built beside the old
+    # one and renamed into place, so the listings are never without one
+    with op.get_context().autocommit_block():
+        op.create_index(f'{name}_new', table, columns, unique=False, postgresql_concurrently=True)
+        op.drop_index(name, table_name=table, postgresql_concurrently=True)
+        op.execute(f'ALTER INDEX {name}_new RENAME TO {name}')
+
+
+def upgrade():
+    for name, table, columns in INDEXES:
+        _replace(name, table, [sa.text(f"coalesce({column}, '')") for column in columns] + ['id'])
+
+
+def downgrade():
+    for name, table, columns in INDEXES:
+        _replace(name, table, columns + ['id'])
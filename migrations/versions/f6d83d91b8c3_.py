@@ -0,0 +1,43 @@
+"""genre_mask on venue and artist for faceted browsing
+
+Revision ID: f6d83d91b8c3
+Revises: 3b0e478d39ac
+Create Date: 2026-10-18 20:04:51.382716
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f6d83d91b8c3'
+down_revision = '3b0e478d39ac'
+branch_labels = None
+depends_on = None
+
+TABLES = ['venue', 'artist']
+
+# enums.Genre in declaration order, as of this revision: bit i is GENRES[i]
+GENRES = [
+    'Alternative', 'Blues', 'Classical', 'Electronic', 'Folk', 'Funk',
+    'HipHop', 'HeavyMetal', 'Instrumental', 'Jazz', 'MusicalTheatre', 'Pop',
+    'Punk', 'RnB', 'Reggae', 'RocknRoll', 'Soul', 'Other',
+]
+
+
+def upgrade():
+    bits = ', '.join(f"('{genre}', {1 << i})" for i, genre in enumerate(GENRES))
+    for table in TABLES:
+        op.add_column(table, sa.Column('genre_mask', sa.Integer(), nullable=False, server_default='0'))
+        op.execute(
+            f'UPDATE {table} SET genre_mask = ('
+            f'SELECT coalesce(bit_or(bits.bit), 0) FROM unnest({table}.genres) AS genre(name) '
+            f'JOIN (VALUES {bits}) AS bits(name, bit) ON bits.name = genre.name'
+            f') WHERE genres IS NOT NULL')
+        op.create_index(f'ix_{table}_state_genre_mask', table, ['state', 'genre_mask'], unique=False)
+
+
+def downgrade():
+    for table in TABLES:
+        op.drop_index(f'ix_{table}_state_genre_mask', table_name=table)
+        op.drop_column(table, 'genre_mask')
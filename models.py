@@ -1,17 +1,28 @@
-from flask_sqlalchemy import SQLAlchemy
+from database import SQLAlchemy
 from datetime import datetime
 
 db = SQLAlchemy()
 
+# updated_at columns are UTC: they become the Last-Modified of the pages
+# rendering the row (see responses.py).
+
+# Genres are a PostgreSQL array; SQLite (local testing) stores them as JSON.
+GenreList = db.ARRAY(db.String()).with_variant(db.JSON(), 'sqlite')
+
 #----------------------------------------------------------------------------#
 # Models.
 #----------------------------------------------------------------------------#
 
 class Venue(db.Model):
      __tablename__ = 'venue'
+     __table_args__ = (
+         # /venues/browse filters and facet counts (see facets.py)
+         db.Index('ix_venue_state_genre_mask', 'state', 'genre_mask'),
+     )
      id                  = db.Column(db.Integer, primary_key=True)
      name                = db.Column(db.String)
-     genres              = db.Column(db.ARRAY(db.String()))
+     genres              = db.Column(GenreList)
+     genre_mask          = db.Column(db.Integer, nullable=False, default=0, server_default='0')
      address             = db.Column(db.String(120))
      city                = db.Column(db.String(120))
      state               = db.Column(db.String(120))
@@ -21,7 +32,11 @@ class Venue(db.Model):
      website             = db.Column(db.String(120))
      seeking_talent      = db.Column(db.Boolean)
      seeking_description = db.Column(db.String(500))
-     shows               = db.relationship('Show', backref=db.backref('venue'), lazy="joined")
+     upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+     past_shows_count     = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+     search_text          = db.Column(db.Text)
+     updated_at           = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+     shows               = db.relationship('Show', backref=db.backref('venue', lazy="raise"), lazy="raise")
 
      def __repr__(self):
 	     value = "Venue({}, {})".format(self.id, self.name)
@@ -30,9 +45,14 @@ class Venue(db.Model):
 
 class Artist(db.Model):
     __tablename__ = 'artist'
+    __table_args__ = (
+        # /artists/browse filters and facet counts (see facets.py)
+        db.Index('ix_artist_state_genre_mask', 'state', 'genre_mask'),
+    )
     id                  = db.Column(db.Integer, primary_key=True)
     name                = db.Column(db.String)
-    genres              = db.Column(db.ARRAY(db.String()))
+    genres              = db.Column(GenreList)
+    genre_mask          = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     city                = db.Column(db.String(120))
     state               = db.Column(db.String(120))
     phone               = db.Column(db.String(120))
@@ -41,13 +61,34 @@ class Artist(db.Model):
     facebook_link       = db.Column(db.String(120))
     seeking_venue       = db.Column(db.Boolean)
     seeking_description = db.Column(db.String(500))
-    shows               = db.relationship('Show', backref=db.backref('artist'), lazy="joined")
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count     = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    search_text          = db.Column(db.Text)
+    updated_at           = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+    shows               = db.relationship('Show', backref=db.backref('artist', lazy="raise"), lazy="raise")
 
     def __repr__(self):
         return f'<Artist:: id:{self.id}, name:{self.name}>'
 
+
+# /venues and /artists listings, keyset on (state, city, name, id) and
+# (name, id). The keys sort NULLs as '' (see pagination.key), and so do these.
+db.Index('ix_venue_state_city_name', db.func.coalesce(Venue.state, ''), db.func.coalesce(Venue.city, ''),
+         db.func.coalesce(Venue.name, ''), Venue.id)
+db.Index('ix_artist_name', db.func.coalesce(Artist.name, ''), Artist.id)
+
 class Show(db.Model):
      __tablename__ = 'show'
+     __table_args__ = (
+         # detail pages: one owner's shows split on start_time, keyset on (start_time, id)
+         db.Index('ix_show_venue_id_start_time', 'venue_id', 'start_time', 'id'),
+         db.Index('ix_show_artist_id_start_time', 'artist_id', 'start_time', 'id'),
+         # /shows listing and the counter roll-over window
+         db.Index('ix_show_start_time', 'start_time', 'id'),
+         # No partial "upcoming" index: start_time > now() is not immutable,
+         # so it cannot be an index predicate, and a fixed cutoff would go
+         # stale. upcoming_show_feed holds exactly those rows instead.
+     )
      id         = db.Column(db.Integer, primary_key=True)
      artist_id  = db.Column(db.Integer, db.ForeignKey('artist.id'), nullable=False)
      venue_id   = db.Column(db.Integer, db.ForeignKey('venue.id'), nullable=False)
@@ -56,3 +97,36 @@ class Show(db.Model):
      def __repr__(self):
          return '<Show: Artist: {} Venue: {} start: {}>'.format(self.artist_id, self.venue_id, self.start_time)
 
+
+class UpcomingShow(db.Model):
+     """Denormalized /shows feed row for a show that has not started (see feed.py)."""
+     __tablename__ = 'upcoming_show_feed'
+     __table_args__ = (
+         db.Index('ix_upcoming_show_feed_start_time', 'start_time', 'show_id'),
+     )
+     show_id           = db.Column(db.Integer, db.ForeignKey('show.id', ondelete='CASCADE'), primary_key=True)
+     venue_id          = db.Column(db.Integer, nullable=False, index=True)
+     venue_name        = db.Column(db.String)
+     artist_id         = db.Column(db.Integer, nullable=False, index=True)
+     artist_name       = db.Column(db.String)
+     artist_image_link = db.Column(db.String(500))
+     start_time        = db.Column(db.DateTime, nullable=False)
+     updated_at        = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+     def __repr__(self):
+         return '<UpcomingShow: {} {} @ {}>'.format(self.artist_name, self.venue_name, self.start_time)
+
+
+class ImportCheckpoint(db.Model):
+     """Progress of a named bulk load, committed with each batch (see bulk.py)."""
+     __tablename__ = 'import_checkpoint'
+     name       = db.Column(db.String(200), primary_key=True)
+     kind       = db.Column(db.String(20), nullable=False)
+     rows_done  = db.Column(db.Integer, nullable=False, default=0)
+     inserted   = db.Column(db.Integer, nullable=False, default=0)
+     rejected   = db.Column(db.Integer, nullable=False, default=0)
+     finished   = db.Column(db.Boolean, nullable=False, default=False)
+     updated_at = db.Column(db.DateTime, nullable=False, default=datetime.now, onupdate=datetime.now)
+
+     def __repr__(self):
+         return '<ImportCheckpoint: {} {} rows: {}>'.format(self.name, self.kind, self.rows_done)
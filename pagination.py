@@ -0,0 +1,203 @@
+import base64
+import binascii
+import json
+from collections import namedtuple
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from operator import attrgetter
+from sqlalchemy import and_, bindparam, func, or_
+from werkzeug.exceptions import BadRequest
+
+#----------------------------------------------------------------------------#
+# Keyset (cursor) pagination.
+#
+# Pages are fetched with WHERE (key) > (last key seen) instead of OFFSET, so
+# page 1000 costs the same index range scan as page 1. The sort keys must
+# end in a unique column (the id) for pages to be stable.
+#----------------------------------------------------------------------------#
+
+class Key(namedtuple('Key', 'column descending attr null')):
+    """A sort key: the SQL expression, its direction and where to read it on a row."""
+
+    def value_of(self, row):
+        value = attrgetter(self.attr)(row)
+        return self.null if value is None else value
+
+
+def key(column, attr=None, descending=False, null=None):
+    """ A sort key on column, read from the row's attr (column.key by default).
+
+    Keys on nullable columns must give null, the value NULLs sort as: NULL
+    compares neither greater nor equal to anything, so a NULL key would end
+    the pages at its row and a NULL in a cursor would match nothing.
+    """
+    attr = attr or column.key
+    if null is not None:
+        # rendered inline, so the SQL matches expression indexes on it
+        column = func.coalesce(column, bindparam(None, null, type_=column.type, literal_execute=True))
+    return Key(column, descending, attr, null)
+
+
+class Page(namedtuple('Page', 'items next_cursor prev_cursor')):
+    pass
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {'dt': value.isoformat()}
+    if isinstance(value, Decimal):
+        return {'dec': str(value)}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict):
+        if 'dec' in value:
+            return Decimal(value['dec'])
+        return datetime.fromisoformat(value['dt'])
+    return value
+
+
+def encode_cursor(values, backwards=False):
+    payload = json.dumps({'k': [_encode_value(v) for v in values], 'b': int(backwards)},
+                         separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Return (key values, backwards) for an opaque cursor token."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+        return [_decode_value(v) for v in payload['k']], bool(payload['b'])
+    except (ValueError, KeyError, TypeError, InvalidOperation, binascii.Error):
+        raise BadRequest('Invalid page cursor.')
+
+
+def _key_type(k):
+    """The Python type(s) a cursor value for k must have, or None if unknown."""
+    try:
+        python_type = k.column.type.python_type
+    except NotImplementedError:
+        return None
+    return (int, float) if python_type is float else python_type
+
+
+def _check_cursor(keys, values):
+    """ Reject a cursor whose values do not fit keys.
+
+    A cursor is opaque but not trusted: a value of the wrong type would
+    reach the database as a comparison it cannot make.
+    """
+    if len(values) != len(keys):
+        raise BadRequest('Invalid page cursor.')
+    for k, value in zip(keys, values):
+        expected = _key_type(k)
+        if value is None or expected is None:
+            continue
+        if not isinstance(value, expected) or (isinstance(value, bool) and expected is not bool):
+            raise BadRequest('Invalid page cursor.')
+
+
+def _beyond(keys, values, backwards):
+    """WHERE clause selecting rows strictly after (or before) values in key order."""
+    clauses = []
+    for i, k in enumerate(keys):
+        forward = k.descending == backwards
+        step = k.column > values[i] if forward else k.column < values[i]
+        clauses.append(and_(*[keys[j].column == values[j] for j in range(i)], step))
+    return or_(*clauses)
+
+
+def keyset_page(query, keys, cursor=None, per_page=50):
+    """ Fetch one page of query ordered by keys, starting from cursor.
+
+    Returns a Page whose next_cursor / prev_cursor are None at either end.
+    """
+    values, backwards = decode_cursor(cursor) if cursor else (None, False)
+    if values is not None:
+        _check_cursor(keys, values)
+        query = query.filter(_beyond(keys, values, backwards))
+
+    order = [k.column.desc() if k.descending != backwards else k.column.asc() for k in keys]
+    rows = query.order_by(*order).limit(per_page + 1).all()
+    more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+
+    has_next = more if not backwards else True
+    has_prev = values is not None if not backwards else more
+    next_cursor = prev_cursor = None
+    if rows and has_next:
+        next_cursor = encode_cursor([k.value_of(rows[-1]) for k in keys])
+    if rows and has_prev:
+        prev_cursor = encode_cursor([k.value_of(rows[0]) for k in keys], backwards=True)
+    return Page(rows, next_cursor, prev_cursor)
+
+
+class StreamedPage(object):
+    """ A forward page whose rows are read from the database as they are iterated.
+
+    items can be iterated once; next_cursor and prev_cursor are known after
+    that, which suits templates that render the pager below the rows.
+    """
+
+    def __init__(self, query, keys, after, per_page, batch_size):
+        self.keys = keys
+        self.after = after
+        self.first = self.last = None
+        self.more = False
+        self.read = False
+        self.items = self._rows(query, per_page, batch_size)
+
+    def _rows(self, query, per_page, batch_size):
+        # yield_per reads through a server-side cursor (psycopg2) batch_size
+        # rows at a time instead of loading the page into memory
+        rows = iter(query.yield_per(batch_size))
+        try:
+            for n, row in enumerate(rows):
+                if n == per_page:
+                    self.more = True
+                    break
+                if self.first is None:
+                    self.first = row
+                self.last = row
+                yield row
+        finally:
+            self.read = True
+            if hasattr(rows, 'close'):
+                rows.close()
+
+    def _cursor(self, row, backwards=False):
+        if not self.read:
+            raise RuntimeError('The cursors of a streamed page are known once its items have been read.')
+        return encode_cursor([k.value_of(row) for k in self.keys], backwards)
+
+    @property
+    def next_cursor(self):
+        if self.read and (self.last is None or not self.more):
+            return None
+        return self._cursor(self.last)
+
+    @property
+    def prev_cursor(self):
+        if self.read and (self.first is None or self.after is None):
+            return None
+        return self._cursor(self.first, backwards=True)
+
+
+def keyset_stream(query, keys, cursor=None, per_page=50, batch_size=500):
+    """ Like keyset_page, but rows are streamed as the page's items are iterated.
+
+    Previous pages, whose rows come back in reverse, are fetched whole with
+    keyset_page.
+    """
+    values, backwards = decode_cursor(cursor) if cursor else (None, False)
+    if backwards:
+        return keyset_page(query, keys, cursor=cursor, per_page=per_page)
+    if values is not None:
+        _check_cursor(keys, values)
+        query = query.filter(_beyond(keys, values, False))
+    order = [k.column.desc() if k.descending else k.column.asc() for k in keys]
+    query = query.order_by(*order).limit(per_page + 1)
+    return StreamedPage(query, keys, values, per_page, min(batch_size, per_page + 1))
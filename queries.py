@@ -0,0 +1,131 @@
+from itertools import groupby
+from sqlalchemy import func
+from models import db, Venue, Artist, Show, UpcomingShow
+from pagination import key, keyset_page, keyset_stream
+
+#----------------------------------------------------------------------------#
+# Listing queries.
+#----------------------------------------------------------------------------#
+
+def venue_areas(cursor=None, per_page=50, stream=False):
+    """ Build the city/state -> venues -> upcoming count tree for /venues.
+
+    One statement over the venue table only: venues are selected as plain
+    columns and the upcoming count comes from the counter column maintained
+    by counters.py, so no Show rows are read. Rows are paged by keyset on
+    (state, city, name, id) and grouped into areas in a single pass; an area
+    may continue onto the next page.
+
+    Returns (areas, page). With stream, areas is a generator reading the
+    page's rows as it is iterated (see keyset_stream).
+    """
+    query = db.session.query(
+        Venue.id,
+        Venue.name,
+        Venue.city,
+        Venue.state,
+        Venue.upcoming_shows_count.label('num_upcoming_shows'),
+        Venue.updated_at
+    )
+    paginate = keyset_stream if stream else keyset_page
+    page = paginate(query, [key(Venue.state, null=''), key(Venue.city, null=''),
+                            key(Venue.name, null=''), key(Venue.id)],
+                    cursor=cursor, per_page=per_page)
+
+    if stream:
+        # each area's venues are a group of the same pass over the rows, so
+        # they must be iterated in order, as the template does
+        areas = ({"city": city, "state": state, "venues": venues}
+                 for (state, city), venues in groupby(page.items, key=lambda row: (row.state, row.city)))
+        return areas, page
+
+    areas = []
+    for (state, city), venues in groupby(page.items, key=lambda row: (row.state, row.city)):
+        areas.append({
+            "city": city,
+            "state": state,
+            "venues": [{
+                "id": venue.id,
+                "name": venue.name,
+                "num_upcoming_shows": venue.num_upcoming_shows
+            } for venue in venues]
+        })
+    return areas, page
+
+
+def artist_page(cursor=None, per_page=50, stream=False):
+    """One page of (id, name, updated_at) rows for /artists, keyset on (name, id)."""
+    query = db.session.query(Artist.id, Artist.name, Artist.updated_at)
+    paginate = keyset_stream if stream else keyset_page
+    return paginate(query, [key(Artist.name, null=''), key(Artist.id)], cursor=cursor, per_page=per_page)
+
+
+def show_page(now, cursor=None, per_page=50, stream=False):
+    """ One page of upcoming show tiles for /shows, keyset on (start_time, show_id).
+
+    Reads the upcoming_show_feed table (see feed.py) alone; the start_time
+    filter hides shows that started since the last rollover.
+    """
+    query = db.session.query(
+        UpcomingShow.show_id,
+        UpcomingShow.venue_id,
+        UpcomingShow.venue_name,
+        UpcomingShow.artist_id,
+        UpcomingShow.artist_name,
+        UpcomingShow.artist_image_link,
+        UpcomingShow.start_time,
+        UpcomingShow.updated_at
+    ).filter(UpcomingShow.start_time > now)
+    paginate = keyset_stream if stream else keyset_page
+    return paginate(query, [key(UpcomingShow.start_time), key(UpcomingShow.show_id)],
+                    cursor=cursor, per_page=per_page)
+
+
+#----------------------------------------------------------------------------#
+# Detail page queries.
+#----------------------------------------------------------------------------#
+
+def show_counts(owner_id, owner, now):
+    """(upcoming, past) show counts for one venue or artist in one statement."""
+    return db.session.query(
+        func.count(Show.id).filter(Show.start_time > now),
+        func.count(Show.id).filter(Show.start_time <= now)
+    ).filter(owner_id == owner).one()
+
+
+def _show_tiles(query, upcoming, now, cursor, per_page):
+    """Upcoming shows soonest first, past shows latest first, keyset paged."""
+    if upcoming:
+        query = query.filter(Show.start_time > now)
+    else:
+        query = query.filter(Show.start_time <= now)
+    descending = not upcoming
+    return keyset_page(query, [key(Show.start_time, descending=descending),
+                               key(Show.id, descending=descending)],
+                       cursor=cursor, per_page=per_page)
+
+
+def venue_shows(venue_id, upcoming, now, cursor=None, per_page=12):
+    """One page of a venue's show tiles, carrying only the artist columns rendered."""
+    query = db.session.query(
+        Show.id,
+        Show.artist_id,
+        Artist.name.label('artist_name'),
+        Artist.image_link.label('artist_image_link'),
+        Show.start_time,
+        Artist.updated_at
+    ).join(Artist, Artist.id == Show.artist_id).filter(Show.venue_id == venue_id)
+    return _show_tiles(query, upcoming, now, cursor, per_page)
+
+
+def artist_shows(artist_id, upcoming, now, cursor=None, per_page=12):
+    """One page of an artist's show tiles, carrying only the venue columns rendered."""
+    query = db.session.query(
+        Show.id,
+        Show.venue_id,
+        Venue.name.label('venue_name'),
+        Venue.image_link.label('venue_image_link'),
+        Show.start_time,
+        Venue.updated_at
+    ).join(Venue, Venue.id == Show.venue_id).filter(Show.artist_id == artist_id)
+    return _show_tiles(query, upcoming, now, cursor, per_page)
@@ -0,0 +1,68 @@
+import os
+from flask import Response, current_app, stream_with_context
+from jinja2 import FileSystemBytecodeCache
+
+#----------------------------------------------------------------------------#
+# Template rendering: streamed pages and the compiled template cache.
+#
+# stream_template sends a page as Jinja generates it, so the head goes out
+# before the rows are read and a long page is never held in memory whole.
+# Streamed responses have no length or ETag up front: the page cache,
+# compression and 304s (cache.py, responses.py) pass them by, and query
+# budgets only see the statements issued before the body starts.
+#
+# Compiled templates are kept in TEMPLATE_BYTECODE_DIR, so a worker or a
+# restarted master loads them instead of compiling every template again.
+#----------------------------------------------------------------------------#
+
+class BytecodeCache(FileSystemBytecodeCache):
+    """Writes each entry aside and renames it into place, so workers starting together never read half of one."""
+
+    def dump_bytecode(self, bucket):
+        filename = self._get_cache_filename(bucket)
+        scratch = f'{filename}.{os.getpid()}'
+        try:
+            with open(scratch, 'wb') as f:
+                bucket.write_bytecode(f)
+            os.replace(scratch, filename)
+        except BaseException:
+            # leave neither a half written entry nor its scratch file
+            if os.path.exists(scratch):
+                os.remove(scratch)
+            raise
+
+
+def stream_template(template_name, **context):
+    """ Like render_template, but the response body is generated as it is sent.
+
+    Context values may be generators (e.g. a StreamedPage's items); they are
+    iterated while the request context is still active.
+    """
+    app = current_app._get_current_object()
+    app.update_template_context(context)
+    stream = app.jinja_env.get_template(template_name).stream(context)
+    # template output comes in small pieces; join a few per write
+    stream.enable_buffering(app.config['STREAM_BUFFER_SIZE'])
+
+    def generate():
+        try:
+            yield from stream
+        except Exception:
+            # the status line has gone out; all that is left is to log it
+            # and cut the response short
+            app.logger.exception(f'Error streaming {template_name}')
+            raise
+
+    return Response(stream_with_context(generate()), mimetype='text/html')
+
+
+def init_app(app):
+    app.config.setdefault('STREAM_LISTINGS', False)
+    app.config.setdefault('STREAM_BUFFER_SIZE', 40)
+    app.config.setdefault('TEMPLATE_BYTECODE_CACHE', True)
+    app.config.setdefault('TEMPLATE_BYTECODE_DIR', None)
+
+    if app.config['TEMPLATE_BYTECODE_CACHE']:
+        directory = app.config['TEMPLATE_BYTECODE_DIR'] or os.path.join(app.instance_path, 'jinja')
+        os.makedirs(directory, exist_ok=True)
+        app.jinja_env.bytecode_cache = BytecodeCache(directory)
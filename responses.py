@@ -0,0 +1,92 @@
+import gzip
+import hashlib
+from flask import g, request
+
+#----------------------------------------------------------------------------#
+# Response compression and conditional GET.
+#
+# Every complete 200 response to a GET gets a weak ETag over its body (weak,
+# because the gzip and brotli encodings of a page are the same page) and,
+# when the view reported the rows it rendered through last_modified(), a
+# Last-Modified of the newest one. Clients revalidate (Cache-Control:
+# no-cache unless the view chose otherwise) and get a 304 when the page is
+# unchanged. Rows deleted since the client's copy do not move Last-Modified;
+# the ETag still changes, and If-None-Match wins over If-Modified-Since.
+#
+# Bodies of COMPRESS_MIMETYPES of at least COMPRESS_MIN_SIZE bytes are then
+# compressed with brotli (when installed and accepted) or gzip. Streamed and
+# file responses, and ones already encoded (assets.py), pass through as is.
+#----------------------------------------------------------------------------#
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def last_modified(*values):
+    """Record updated_at values (UTC) of rows the view rendered; the newest is kept."""
+    values = [value for value in values if value is not None]
+    if values:
+        newest = max(values)
+        g.last_modified = max(newest, g.get('last_modified', newest))
+
+
+def _complete(response):
+    return not (response.direct_passthrough or response.is_streamed)
+
+
+def make_conditional(response):
+    if request.method not in ('GET', 'HEAD') or response.status_code != 200 or not _complete(response):
+        return response
+    if response.last_modified is None and 'last_modified' in g:
+        response.last_modified = g.last_modified
+    if 'ETag' not in response.headers:
+        response.set_etag(hashlib.sha1(response.get_data()).hexdigest(), weak=True)
+    if 'Cache-Control' not in response.headers:
+        response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
+def compress(response, config):
+    if (response.status_code < 200 or response.status_code in (204, 304)
+            or not _complete(response)
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in config['COMPRESS_MIMETYPES']
+            or 'no-transform' in response.headers.get('Cache-Control', '')):
+        return response
+    response.vary.add('Accept-Encoding')
+    body = response.get_data()
+    if len(body) < config['COMPRESS_MIN_SIZE']:
+        return response
+
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        encoding, body = 'br', brotli.compress(body, quality=config['COMPRESS_BROTLI_QUALITY'])
+    elif accepted['gzip']:
+        encoding, body = 'gzip', gzip.compress(body, config['COMPRESS_LEVEL'])
+    else:
+        return response
+    response.set_data(body)
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def init_app(app):
+    app.config.setdefault('CONDITIONAL_GET', True)
+    app.config.setdefault('COMPRESS_ENABLED', True)
+    app.config.setdefault('COMPRESS_MIN_SIZE', 500)
+    app.config.setdefault('COMPRESS_MIMETYPES', {'text/html', 'text/css', 'text/plain', 'application/json'})
+    app.config.setdefault('COMPRESS_LEVEL', 6)
+    app.config.setdefault('COMPRESS_BROTLI_QUALITY', 4)
+
+    # registered early, so it runs after every other after_request hook but
+    # the request log's (logs.py), which records the final status
+    @app.after_request
+    def finish_response(response):
+        config = app.config
+        if config['CONDITIONAL_GET']:
+            response = make_conditional(response)
+        if config['COMPRESS_ENABLED']:
+            response = compress(response, config)
+        return response
@@ -0,0 +1,33 @@
+#----------------------------------------------------------------------------#
+# Deferred routes.
+#
+# app.py declares its views at import time, before any app exists, and
+# create_app() adds them with Routes.init_app. Unlike a Blueprint this keeps
+# the endpoint names unprefixed ('venues', 'show_venue', ...), which the
+# templates, config.py's endpoint sets and the benchmarks refer to.
+#----------------------------------------------------------------------------#
+
+class Routes(object):
+    """Collects @route and @errorhandler declarations for later apps."""
+
+    def __init__(self):
+        self.rules = []
+        self.error_handlers = []
+
+    def route(self, rule, **options):
+        def decorator(view):
+            self.rules.append((rule, options.pop('endpoint', None), view, options))
+            return view
+        return decorator
+
+    def errorhandler(self, code):
+        def decorator(handler):
+            self.error_handlers.append((code, handler))
+            return handler
+        return decorator
+
+    def init_app(self, app):
+        for rule, endpoint, view, options in self.rules:
+            app.add_url_rule(rule, endpoint, view, **options)
+        for code, handler in self.error_handlers:
+            app.register_error_handler(code, handler)
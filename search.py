@@ -0,0 +1,209 @@
+import click
+from flask.cli import AppGroup
+from sqlalchemy import Numeric, and_, cast, column, event, func, literal, table, text
+from models import db, Venue, Artist
+from pagination import key, keyset_page
+
+#----------------------------------------------------------------------------#
+# Venue and artist search.
+#
+# Each searchable row carries a lower-cased search_text document built from
+# name, city, state and genres. On PostgreSQL it is covered by a pg_trgm GIN
+# index (see migration 3d1f0b7a6e92): a match contains the term and passes
+# the %> word-similarity threshold, both answered from the index, and
+# results are ranked by word_similarity. On SQLite, used for local testing,
+# the documents are mirrored into an FTS5 trigram table and ranked with
+# bm25. Matches are counted only up to a limit, so a common short term does
+# not cost a full count.
+#----------------------------------------------------------------------------#
+
+SEARCHABLE = (Venue, Artist)
+MIN_TRIGRAM = 3
+# word_similarity is rounded to this many digits for ranking and paging
+RELEVANCE_DIGITS = 6
+
+
+def search_document(target):
+    parts = [target.name, target.city, target.state] + list(target.genres or [])
+    return ' '.join(part for part in parts if part).lower()
+
+
+def fts_table(model):
+    return f'{model.__tablename__}_fts'
+
+
+def _escape_like(term):
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def exact_relevance(relevance):
+    """ relevance as a rounded numeric, for use as a keyset key.
+
+    word_similarity is a float4; a page cursor would bring it back as a
+    float8, which never equals the float4 it came from, so rows tied on
+    relevance were skipped or repeated across pages. A numeric goes through
+    the cursor as a Decimal and compares exactly.
+    """
+    return cast(func.round(cast(relevance, Numeric), RELEVANCE_DIGITS), Numeric)
+
+
+def _postgresql_matches(model, term):
+    """(filter, relevance, higher relevance sorts first) for PostgreSQL."""
+    if not term:
+        # PostgreSQL rejects a bare constant in ORDER BY
+        return None, exact_relevance(literal(0.0)), True
+    # search_text %> term: word_similarity(term, search_text) is at least
+    # pg_trgm.word_similarity_threshold, set per connection (database.py)
+    criterion = and_(model.search_text.ilike(f'%{_escape_like(term)}%', escape='\\'),
+                     model.search_text.op('%>')(term))
+    return criterion, exact_relevance(func.word_similarity(term, model.search_text)), True
+
+
+def _sqlite_matches(model, term):
+    """(filter, relevance, higher relevance sorts first) for SQLite."""
+    if not term:
+        return None, literal(0.0), True
+    if len(term) < MIN_TRIGRAM:
+        # the trigram tokenizer cannot match shorter strings; scan instead
+        return model.search_text.like(f'%{_escape_like(term)}%', escape='\\'), literal(0.0), True
+    fts = table(fts_table(model), column('rowid'), column('search_text'), column('rank'))
+    phrase = '"' + term.replace('"', '""') + '"'
+    # bm25 rank is negative, best match lowest
+    matches = db.select([fts.c.rowid]).where(fts.c.search_text.match(phrase)).correlate(None)
+    rank = db.select([fts.c.rank]).where(fts.c.rowid == model.id) \
+        .where(fts.c.search_text.match(phrase)).correlate(model).scalar_subquery()
+    return model.id.in_(matches), rank, False
+
+
+def search(model, term, cursor=None, per_page=20, options=(), count_limit=1000):
+    """ Return (total, page) of model rows matching term.
+
+    Rows are ordered most relevant first, with name and id as tie-breakers,
+    and paged by keyset on (relevance, name, id) so deep pages stay cheap.
+    page.items holds the model instances, loaded with the given loader options.
+    Counting stops past count_limit: a total above it means "more than
+    count_limit" (see count_label).
+    """
+    term = (term or '').strip().lower()
+    if db.engine.dialect.name == 'sqlite':
+        criterion, relevance, descending = _sqlite_matches(model, term)
+    else:
+        criterion, relevance, descending = _postgresql_matches(model, term)
+
+    query = db.session.query(model, relevance.label('relevance')).options(*options)
+    matches = db.session.query(model.id)
+    if criterion is not None:
+        query = query.filter(criterion)
+        matches = matches.filter(criterion)
+
+    total = db.session.query(func.count()).select_from(matches.limit(count_limit + 1).subquery()).scalar()
+    page = keyset_page(query, [
+        key(relevance, 'relevance', descending=descending),
+        key(model.name, f'{model.__name__}.name', null=''),
+        key(model.id, f'{model.__name__}.id'),
+    ], cursor=cursor, per_page=per_page)
+    return total, page._replace(items=[row[0] for row in page.items])
+
+
+def count_label(total, count_limit):
+    """The total as shown: "1000+" once it is past count_limit."""
+    return f'{count_limit}+' if total > count_limit else total
+
+
+#----------------------------------------------------------------------------#
+# Index maintenance.
+#----------------------------------------------------------------------------#
+
+def _set_search_text(mapper, connection, target):
+    target.search_text = search_document(target)
+
+
+def _sync_fts(mapper, connection, target):
+    if connection.dialect.name != 'sqlite':
+        return
+    connection.execute(
+        text(f'INSERT OR REPLACE INTO {fts_table(type(target))}(rowid, search_text) VALUES (:id, :doc)'),
+        {'id': target.id, 'doc': target.search_text})
+
+
+def _drop_fts(mapper, connection, target):
+    if connection.dialect.name != 'sqlite':
+        return
+    connection.execute(text(f'DELETE FROM {fts_table(type(target))} WHERE rowid = :id'), {'id': target.id})
+
+
+def _create_fts(metadata, connection, **kw):
+    if connection.dialect.name != 'sqlite':
+        return
+    for model in SEARCHABLE:
+        connection.execute(text(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts_table(model)} "
+            f"USING fts5(search_text, tokenize='trigram')"))
+
+
+def _drop_fts_tables(metadata, connection, **kw):
+    if connection.dialect.name != 'sqlite':
+        return
+    for model in SEARCHABLE:
+        connection.execute(text(f'DROP TABLE IF EXISTS {fts_table(model)}'))
+
+
+def mirror_inserted(model, ids=None):
+    """ Copy the rows with the given ids (all rows when None) into the FTS5 mirror on SQLite.
+
+    Bulk inserts through the table bypass the mapper events above.
+    """
+    connection = db.session.connection()
+    if connection.dialect.name != 'sqlite':
+        return
+    rows = db.select([model.id, model.search_text])
+    if ids is not None:
+        rows = rows.where(model.id.in_(ids))
+    fts = table(fts_table(model), column('rowid'), column('search_text'))
+    connection.execute(fts.insert().prefix_with('OR REPLACE').from_select(['rowid', 'search_text'], rows))
+
+
+def rebuild():
+    """Recompute every search document, and the FTS5 mirror on SQLite."""
+    connection = db.session.connection()
+    sqlite = connection.dialect.name == 'sqlite'
+    if sqlite:
+        _create_fts(db.Model.metadata, connection)
+    for model in SEARCHABLE:
+        rows = db.session.query(model.id, model.name, model.city, model.state, model.genres).all()
+        docs = [{'id': row.id, 'doc': search_document(row)} for row in rows]
+        if docs:
+            db.session.execute(model.__table__.update()
+                               .where(model.id == db.bindparam('doc_id'))
+                               .values(search_text=db.bindparam('doc')),
+                               [{'doc_id': doc['id'], 'doc': doc['doc']} for doc in docs])
+        if sqlite:
+            db.session.execute(text(f'DELETE FROM {fts_table(model)}'))
+            if docs:
+                db.session.execute(text(
+                    f'INSERT INTO {fts_table(model)}(rowid, search_text) VALUES (:id, :doc)'), docs)
+
+
+search_cli = AppGroup('search', help='Maintain the search index.')
+
+
+@search_cli.command('rebuild')
+def rebuild_command():
+    """Rebuild search documents for every venue and artist."""
+    rebuild()
+    db.session.commit()
+    click.echo('search index rebuilt')
+
+
+def init_app(app):
+    for model in SEARCHABLE:
+        if not event.contains(model, 'before_insert', _set_search_text):
+            event.listen(model, 'before_insert', _set_search_text)
+            event.listen(model, 'before_update', _set_search_text)
+            event.listen(model, 'after_insert', _sync_fts)
+            event.listen(model, 'after_update', _sync_fts)
+            event.listen(model, 'after_delete', _drop_fts)
+    if not event.contains(db.Model.metadata, 'after_create', _create_fts):
+        event.listen(db.Model.metadata, 'after_create', _create_fts)
+        event.listen(db.Model.metadata, 'before_drop', _drop_fts_tables)
+    app.cli.add_command(search_cli)
@@ -0,0 +1,76 @@
+import os
+from sqlalchemy.orm import configure_mappers
+
+#----------------------------------------------------------------------------#
+# Startup: profiles, the shared secret and warmup.
+#
+# Every worker must sign sessions, flashes and CSRF tokens with the same
+# SECRET_KEY, so it comes from the environment or a file, never from
+# os.urandom at import. For `gunicorn --preload` (see gunicorn.conf.py) the
+# master creates the app and warm()s it once; workers fork with the
+# templates compiled, mappers configured and lazy imports done, and only
+# start their own log listener (logs.py) and database connections.
+#----------------------------------------------------------------------------#
+
+SECRET_KEY_NAME = 'secret_key'
+
+
+def apply_profile(config):
+    """Overlay config['PROFILES'][config['PROFILE']] onto config."""
+    profiles = config['PROFILES']
+    if config['PROFILE'] not in profiles:
+        raise RuntimeError(f'Unknown profile {config["PROFILE"]!r}; expected one of {", ".join(profiles)}.')
+    config.update(profiles[config['PROFILE']])
+
+
+def secret_key(app):
+    """ SECRET_KEY, else the contents of SECRET_KEY_FILE.
+
+    Outside production, a key generated once into the instance folder is
+    used (and shared by every local worker) when neither is set.
+    """
+    config = app.config
+    if config.get('SECRET_KEY'):
+        return config['SECRET_KEY']
+    if config.get('SECRET_KEY_FILE'):
+        with open(config['SECRET_KEY_FILE'], 'rb') as f:
+            return f.read().strip()
+    if config['PROFILE'] == 'production':
+        raise RuntimeError('Set SECRET_KEY or SECRET_KEY_FILE: every worker must share the key.')
+
+    path = os.path.join(app.instance_path, SECRET_KEY_NAME)
+    if not os.path.exists(path):
+        # written aside and linked into place, so a worker starting at the
+        # same time never reads a half-written key; the first link wins
+        os.makedirs(app.instance_path, exist_ok=True)
+        scratch = f'{path}.{os.getpid()}'
+        with os.fdopen(os.open(scratch, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'wb') as f:
+            f.write(os.urandom(32).hex().encode())
+        try:
+            os.link(scratch, path)
+        except FileExistsError:
+            pass
+        finally:
+            os.remove(scratch)
+    with open(path, 'rb') as f:
+        return f.read().strip()
+
+
+def warm(app):
+    """ Do once, before forking, what the first request of each worker would.
+
+    Does not connect to the database: connections opened in the master
+    would be shared by every worker.
+    """
+    from app import datetime_pattern, DATETIME_FORMATS
+    from forms import VenueForm, ArtistForm, ShowForm
+    configure_mappers()
+    for name in app.jinja_env.list_templates(extensions=('html',)):
+        app.jinja_env.get_template(name)
+    for format in DATETIME_FORMATS:
+        datetime_pattern(format, 'en')
+    # binds the forms' fields and renders the Genre / State choices
+    with app.test_request_context():
+        for form_class in (VenueForm, ArtistForm, ShowForm):
+            for field in form_class(meta={'csrf': False}):
+                field()
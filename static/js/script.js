@@ -2,3 +2,20 @@ window.parseISOString = function parseISOString(s) {
   var b = s.split(/\D+/);
   return new Date(Date.UTC(b[0], --b[1], b[2], b[3], b[4], b[5], b[6]));
 };
+
+// "Load more" on venue/artist pages: fetch the next tiles fragment and put
+// it where the link was (the fragment carries its own next link, if any).
+document.addEventListener('click', function(event) {
+  var link = event.target.closest && event.target.closest('.load-more a');
+  if (!link) { return; }
+  event.preventDefault();
+  var holder = link.parentNode;
+  var xhr = new XMLHttpRequest();
+  xhr.open('GET', link.href);
+  xhr.onload = function() {
+    if (xhr.status !== 200) { return; }
+    holder.insertAdjacentHTML('afterend', xhr.responseText);
+    holder.parentNode.removeChild(holder);
+  };
+  xhr.send();
+});
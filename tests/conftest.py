@@ -0,0 +1,146 @@
+import html
+import os
+import re
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
+from app import create_app
+from models import db, Venue, Artist, Show
+import counters
+import feed
+
+#----------------------------------------------------------------------------#
+# Fixtures.
+#
+# Tests run against an empty SQLite database per test; tests taking pg_app
+# also run against the PostgreSQL database at $TEST_DATABASE_URL (its tables
+# are dropped and created again) and are skipped when it is not set.
+#----------------------------------------------------------------------------#
+
+# no log files, page cache, metrics or template cache on disk; a view over
+# its query budget fails the test
+CONFIG = {
+    'TESTING': True,
+    'QUERY_BUDGET_STRICT': True,
+    'SECRET_KEY': 'test',
+    'SQLALCHEMY_ECHO': False,
+    'LOG_FILE': None,
+    'LOG_STDERR': False,
+    'LOG_ACCESS': False,
+    'CACHE_ENABLED': False,
+    'METRICS_ENABLED': False,
+    'TEMPLATE_BYTECODE_CACHE': False,
+}
+
+
+def make_app(database_url, **config):
+    app = create_app(dict(CONFIG, SQLALCHEMY_DATABASE_URI=database_url, **config))
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+    return app
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = make_app(f'sqlite:///{tmp_path / "fyyur.db"}')
+    with app.app_context():
+        yield app
+        db.session.remove()
+
+
+@pytest.fixture
+def pg_app():
+    url = os.environ.get('TEST_DATABASE_URL')
+    if not url:
+        pytest.skip('set TEST_DATABASE_URL to run the PostgreSQL tests')
+    app = make_app(url)
+    with app.app_context():
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture(params=['app', 'pg_app'])
+def any_app(request):
+    """The SQLite app, then the PostgreSQL one."""
+    return request.getfixturevalue(request.param)
+
+
+def require_search(app):
+    """Skip unless app's database can search: PostgreSQL needs the pg_trgm extension."""
+    if db.engine.dialect.name != 'postgresql':
+        return
+    try:
+        with db.engine.begin() as connection:
+            connection.execute(text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+    except Exception:
+        pytest.skip('pg_trgm is not installed')
+
+
+@pytest.fixture
+def statements():
+    """Every SQL statement executed during the test, in order."""
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        captured.append(statement)
+
+    event.listen(Engine, 'before_cursor_execute', capture)
+    yield captured
+    event.remove(Engine, 'before_cursor_execute', capture)
+
+
+class Rows(object):
+    """Commits venues, artists and shows the way the create views do; returns their ids."""
+
+    def venue(self, **columns):
+        columns = dict({'name': 'The Venue', 'city': 'San Francisco', 'state': 'CA',
+                        'address': '1 Main St', 'genres': ['Jazz']}, **columns)
+        return self._add(Venue(**columns))
+
+    def artist(self, **columns):
+        columns = dict({'name': 'The Artist', 'city': 'San Francisco', 'state': 'CA',
+                        'genres': ['Jazz']}, **columns)
+        return self._add(Artist(**columns))
+
+    def show(self, venue_id, artist_id, start_time=None):
+        show = Show(venue_id=venue_id, artist_id=artist_id,
+                    start_time=start_time or datetime.now() + timedelta(days=7))
+        db.session.add(show)
+        counters.record_show(show)
+        feed.add_shows(Show.id == show.id)
+        db.session.commit()
+        return show.id
+
+    def _add(self, row):
+        db.session.add(row)
+        db.session.commit()
+        return row.id
+
+
+@pytest.fixture
+def rows():
+    return Rows()
+
+
+_NEXT = re.compile(r'class="next"><a href="([^"]+)"')
+
+
+def _follow_pages(client, url, limit=50):
+    bodies = []
+    while url and len(bodies) < limit:
+        response = client.get(url)
+        assert response.status_code == 200, url
+        bodies.append(response.get_data(as_text=True))
+        match = _NEXT.search(bodies[-1])
+        url = match and html.unescape(match.group(1))
+    assert not url, 'pages did not end'
+    return bodies
+
+
+@pytest.fixture
+def follow_pages():
+    """follow_pages(client, url): the bodies of url and of each page its "Next" links lead to."""
+    return _follow_pages
@@ -0,0 +1,107 @@
+import json
+import pytest
+from models import db, Venue
+from pagination import encode_cursor
+import bulk
+
+VENUE_ROW = {'city': 'Austin', 'state': 'TX', 'address': '1 Main St', 'phone': '512-555-0100',
+             'genres': ['Jazz'], 'facebook_link': 'https://facebook.com/hall'}
+
+
+def _pages(client, url):
+    """The data of every page, following next_cursor from url."""
+    pages = []
+    while url:
+        body = client.get(url).get_json()
+        pages.append(body['data'])
+        url = body['next_cursor'] and f'/api/v1/venues?limit=2&cursor={body["next_cursor"]}'
+    return pages
+
+
+def test_fields_select_columns_and_reject_unknown_ones(app, rows):
+    venue_id = rows.venue(name='Blue Hall')
+    client = app.test_client()
+    assert client.get('/api/v1/venues?fields=name').get_json()['data'] == [{'id': venue_id, 'name': 'Blue Hall'}]
+    assert client.get(f'/api/v1/venues/{venue_id}?fields=city,name').get_json()['data'] == \
+        {'id': venue_id, 'city': 'San Francisco', 'name': 'Blue Hall'}
+
+    response = client.get('/api/v1/venues?fields=name,password')
+    assert response.status_code == 400
+    assert 'Unknown fields: password' in response.get_json()['error']
+
+
+def test_limit_is_clamped(app, rows):
+    app.config['API_MAX_PAGE_SIZE'] = 3
+    for n in range(4):
+        rows.venue(name=f'Hall {n}')
+    client = app.test_client()
+    assert len(client.get('/api/v1/venues?limit=0').get_json()['data']) == 1
+    assert len(client.get('/api/v1/venues?limit=100').get_json()['data']) == 3
+    assert client.get('/api/v1/venues?limit=ten').status_code == 400
+
+
+def test_cursors_page_through_every_row(any_app, rows):
+    ids = [rows.venue(name=f'Hall {n}') for n in range(5)]
+    pages = _pages(any_app.test_client(), '/api/v1/venues?limit=2&fields=id')
+    assert [len(page) for page in pages] == [2, 2, 1]
+    assert [row['id'] for page in pages for row in page] == ids
+
+
+@pytest.mark.parametrize('values', [['1'], [1.5], [True], [{'dt': '2020-01-01T00:00:00'}], [1, 2]])
+def test_a_cursor_that_does_not_fit_the_keys_is_rejected(any_app, values):
+    response = any_app.test_client().get(f'/api/v1/venues?cursor={encode_cursor(values)}')
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'Invalid page cursor.'
+
+
+def test_a_cursor_that_does_not_fit_a_listing_is_rejected(any_app):
+    cursor = encode_cursor(['CA', 'Oakland', 'Hall', 'seven'])
+    assert any_app.test_client().get(f'/venues?cursor={cursor}').status_code == 400
+
+
+@pytest.mark.parametrize('fields, tables', [
+    ('venue_name', {'show', 'venue'}),
+    ('artist_name', {'show', 'artist'}),
+    ('start_time', {'show'}),
+])
+def test_shows_join_only_the_tables_of_selected_fields(app, rows, statements, fields, tables):
+    show_id = rows.show(rows.venue(name='Blue Hall'), rows.artist(name='Monk'))
+    statements.clear()
+    data = app.test_client().get(f'/api/v1/shows?fields={fields}').get_json()['data']
+    assert [row['id'] for row in data] == [show_id]
+    assert set(data[0]) == {'id', fields}
+
+    select, = [sql for sql in statements if 'FROM show' in sql]
+    for table in ('venue', 'artist'):
+        assert (f'JOIN {table} ' in select) == (table in tables)
+
+
+def test_export_streams_one_object_per_line(app, rows):
+    ids = [rows.venue(name=f'Hall {n}') for n in range(3)]
+    app.config['API_EXPORT_BATCH'] = 2
+    response = app.test_client().get('/api/v1/venues/export?fields=name')
+    assert response.mimetype == 'application/x-ndjson'
+    lines = response.get_data(as_text=True).splitlines()
+    assert [json.loads(line) for line in lines] == [{'id': id, 'name': f'Hall {n}'} for n, id in enumerate(ids)]
+
+
+def test_import_resumes_from_its_checkpoint(app):
+    body = '\n'.join(json.dumps(dict(VENUE_ROW, name=f'Loaded Hall {n}')) for n in range(3))
+
+    def broken_off(rows):
+        # the first two rows land, then the upload breaks off
+        for number, row in enumerate(rows, start=1):
+            if number == 3:
+                raise ConnectionError
+            yield row
+
+    with pytest.raises(ConnectionError):
+        bulk.load('venues', broken_off(bulk.read_rows(body.splitlines(), 'ndjson')),
+                  bulk.checkpoint_for('upload', 'venues'), batch_size=2)
+    assert db.session.query(Venue).count() == 2
+
+    response = app.test_client().post('/api/v1/venues/import?checkpoint=upload', data=body,
+                                      content_type='application/x-ndjson')
+    assert response.get_json() == {'checkpoint': 'upload', 'rows': 3, 'inserted': 3, 'rejected': 0,
+                                   'finished': True, 'errors': []}
+    assert sorted(name for name, in db.session.query(Venue.name)) == [f'Loaded Hall {n}' for n in range(3)]
@@ -0,0 +1,21 @@
+from models import db, Venue, Artist
+from benchmarks import search as search_benchmark, venue_areas
+import facets
+
+
+def test_venue_areas_seed_sets_genre_masks(pg_app):
+    venue_areas.seed(venues=4, artists=2, shows=6)
+    jazz = facets.genre_mask(['Jazz'])
+    assert jazz
+    for model in (Venue, Artist):
+        assert {mask for mask, in db.session.query(model.genre_mask)} == {jazz}
+    page = facets.browse_venues(['Jazz'], [], per_page=10)
+    assert len(page.items) == 4
+
+
+def test_search_seed_sets_genre_masks(app):
+    search_benchmark.seed(5)
+    venues = db.session.query(Venue.genres, Venue.genre_mask).all()
+    assert len(venues) == 5
+    for genres, mask in venues:
+        assert mask == facets.genre_mask(genres) != 0
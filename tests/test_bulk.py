@@ -0,0 +1,44 @@
+from datetime import datetime, timedelta
+from models import db, Venue, Show, UpcomingShow
+import bulk
+
+
+def _load(kind, rows, name):
+    return bulk.load(kind, rows, bulk.checkpoint_for(name, kind), batch_size=2)
+
+
+def test_loaded_shows_reach_the_feed_by_id(any_app, rows):
+    venue_id, artist_id = rows.venue(), rows.artist()
+    # a row above the id sequence, as another writer's explicit id would leave
+    db.session.add(Show(id=1000, venue_id=venue_id, artist_id=artist_id,
+                        start_time=datetime.now() + timedelta(days=1)))
+    db.session.commit()
+
+    start_time = (datetime.now() + timedelta(days=3)).strftime('%Y-%m-%d %H:%M:%S')
+    checkpoint = _load('shows', [{'venue_id': venue_id, 'artist_id': artist_id, 'start_time': start_time}
+                                 for _ in range(3)], 'shows')
+    assert checkpoint.inserted == 3
+
+    loaded = {id for id, in db.session.query(Show.id).filter(Show.id != 1000)}
+    assert len(loaded) == 3
+    assert {id for id, in db.session.query(UpcomingShow.show_id)} == loaded
+
+
+def test_loaded_venues_are_searchable(app):
+    _load('venues', [{'name': f'Loaded Hall {n}', 'city': 'Austin', 'state': 'TX',
+                      'address': '1 Main St', 'phone': '512-555-0100', 'genres': ['Jazz'],
+                      'facebook_link': 'https://facebook.com/hall'}
+                     for n in range(3)], 'venues')
+    assert db.session.query(Venue).count() == 3
+    body = app.test_client().get('/venues/search?search_term=loaded').get_data(as_text=True)
+    assert body.count('Loaded Hall') == 3
+
+
+def test_formdata_posts_rows_as_the_create_forms_do():
+    data = bulk.formdata({'name': 'Blue Hall', 'genres': ['Jazz', 'Blues'], 'website': 'https://blue.example',
+                          'seeking_talent': True, 'seeking_description': None, 'upcoming_shows_count': 0})
+    assert data.getlist('genres') == ['Jazz', 'Blues']
+    assert data['website_link'] == 'https://blue.example'
+    assert data['seeking_talent'] == 'y'
+    assert 'seeking_description' not in data
+    assert data['upcoming_shows_count'] == '0'
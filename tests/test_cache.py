@@ -0,0 +1,106 @@
+import time
+import pytest
+from conftest import make_app, Rows
+from models import db, Venue
+import cache
+
+VENUE_FORM = {'name': 'Red Hall', 'city': 'Austin', 'state': 'TX', 'address': '1 Main St',
+              'phone': '512-555-0100', 'genres': 'Jazz', 'facebook_link': 'https://facebook.com/red'}
+
+
+@pytest.fixture
+def cached_app(tmp_path):
+    """An app with the memory cache, outside an app context: each request gets its own g."""
+    return make_app(f'sqlite:///{tmp_path / "fyyur.db"}', CACHE_ENABLED=True, CACHE_BACKEND='memory')
+
+
+def _venue(app, **columns):
+    with app.app_context():
+        venue_id = Rows().venue(**columns)
+        db.session.remove()
+    return venue_id
+
+
+def _body(client, path, **headers):
+    return client.get(path, headers=headers).get_data(as_text=True)
+
+
+def test_memory_backend_evicts_and_expires_entries():
+    backend = cache.MemoryBackend(max_entries=2)
+    backend.set('a', 1, ttl=60)
+    backend.set('b', 2, ttl=60)
+    assert backend.get('a') == 1
+    backend.set('c', 3, ttl=60)
+    # b was the least recently used
+    assert (backend.get('a'), backend.get('b'), backend.get('c')) == (1, None, 3)
+
+    backend.set('d', 4, ttl=0.01)
+    time.sleep(0.02)
+    assert backend.get('d') is None
+
+
+def test_entries_are_served_only_at_their_tags_versions():
+    store = cache.Cache(cache.MemoryBackend(), ttl=60)
+    value, versions = store.get('page', ['venues', 'venue:1'])
+    assert value is None
+    store.set('page', versions, 'html')
+    assert store.get('page', ['venues', 'venue:1'])[0] == 'html'
+    store.invalidate('venue:2')
+    assert store.get('page', ['venues', 'venue:1'])[0] == 'html'
+    store.invalidate('venue:1')
+    assert store.get('page', ['venues', 'venue:1'])[0] is None
+
+
+def test_editing_a_venue_invalidates_its_cached_pages(cached_app):
+    venue_id = _venue(cached_app, name='Blue Hall')
+    client = cached_app.test_client()
+    paths = ('/venues', f'/venues/{venue_id}')
+    for path in paths:
+        assert 'Blue Hall' in _body(client, path)
+
+    # written behind the cache's back: the cached listing does not see it
+    with cached_app.app_context():
+        db.session.query(Venue).filter_by(id=venue_id).update({'name': 'Green Hall'})
+        db.session.commit()
+        db.session.remove()
+    for path in paths:
+        assert 'Blue Hall' in _body(client, path)
+
+    response = client.post(f'/venues/{venue_id}/edit', data=VENUE_FORM)
+    assert response.status_code == 302
+    for path in paths:
+        body = _body(client, path)
+        assert 'Red Hall' in body and 'Blue Hall' not in body, path
+
+
+def test_query_string_variants_are_cached_apart(cached_app):
+    cached_app.config['PAGE_SIZE'] = 1
+    _venue(cached_app, name='Alpha Hall')
+    _venue(cached_app, name='Beta Hall')
+    client = cached_app.test_client()
+
+    first = _body(client, '/venues')
+    assert 'Alpha Hall' in first and 'Beta Hall' not in first
+    next_path = first.split('class="next"><a href="')[1].split('"')[0].replace('&amp;', '&')
+    second = _body(client, next_path)
+    assert 'Beta Hall' in second and 'Alpha Hall' not in second
+    assert _body(client, '/venues') == first
+
+
+def test_cached_pages_answer_conditional_requests(cached_app):
+    venue_id = _venue(cached_app, name='Blue Hall')
+    client = cached_app.test_client()
+    first = client.get(f'/venues/{venue_id}')
+    etag, last_modified = first.headers['ETag'], first.headers['Last-Modified']
+    assert etag.startswith('W/')
+
+    # a hit from the cache carries the same validators
+    hit = client.get(f'/venues/{venue_id}')
+    assert (hit.headers['ETag'], hit.headers['Last-Modified']) == (etag, last_modified)
+    assert client.get(f'/venues/{venue_id}', headers={'If-None-Match': etag}).status_code == 304
+    assert client.get(f'/venues/{venue_id}', headers={'If-Modified-Since': last_modified}).status_code == 304
+
+    client.post(f'/venues/{venue_id}/edit', data=VENUE_FORM)
+    changed = client.get(f'/venues/{venue_id}', headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
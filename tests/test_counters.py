@@ -0,0 +1,87 @@
+import time
+from datetime import datetime, timedelta
+import pytest
+from conftest import make_app
+from models import db, Venue, Artist, Show, UpcomingShow
+import counters
+import feed
+
+
+def _counts(model, id):
+    row = db.session.query(model.upcoming_shows_count, model.past_shows_count).filter(model.id == id).one()
+    return tuple(row)
+
+
+def test_record_show_counts_upcoming_and_past(any_app, rows):
+    venue, artist = rows.venue(), rows.artist()
+    rows.show(venue, artist, datetime.now() + timedelta(days=1))
+    rows.show(venue, artist, datetime.now() + timedelta(days=2))
+    rows.show(venue, artist, datetime.now() - timedelta(days=1))
+    assert _counts(Venue, venue) == (2, 1)
+    assert _counts(Artist, artist) == (2, 1)
+
+
+def test_forget_shows_takes_them_off_the_counters(any_app, rows):
+    venue, artist, other = rows.venue(), rows.artist(), rows.artist(name='Other')
+    upcoming = rows.show(venue, artist, datetime.now() + timedelta(days=1))
+    past = rows.show(venue, artist, datetime.now() - timedelta(days=1))
+    rows.show(venue, other, datetime.now() + timedelta(days=1))
+
+    assert counters.forget_shows(Show.id.in_([upcoming, past])) == 2
+    db.session.commit()
+    assert _counts(Venue, venue) == (1, 0)
+    assert _counts(Artist, artist) == (0, 0)
+    assert _counts(Artist, other) == (1, 0)
+
+
+def _started_show(venue, artist, now):
+    """A show that started a minute ago, counted and fed while it was upcoming."""
+    show = Show(venue_id=venue, artist_id=artist, start_time=now - timedelta(minutes=1))
+    db.session.add(show)
+    counters.record_show(show, now=now - timedelta(minutes=10))
+    feed.add_shows(Show.id == show.id, now=now - timedelta(minutes=10))
+    db.session.commit()
+    return show.id
+
+
+def test_rollover_moves_started_shows_to_past(any_app, rows):
+    venue, artist, idle = rows.venue(), rows.artist(), rows.venue(name='Idle')
+    now = datetime.now()
+    _started_show(venue, artist, now)
+    assert _counts(Venue, venue) == (1, 0)
+
+    tags = counters.rollover(now - timedelta(minutes=90), now)
+    db.session.commit()
+    assert _counts(Venue, venue) == (0, 1)
+    assert _counts(Artist, artist) == (0, 1)
+    assert UpcomingShow.query.count() == 0
+    assert set(tags) == {'shows', 'venues', 'artists', f'venue:{venue}', f'artist:{artist}'}
+    assert f'venue:{idle}' not in tags
+
+
+@pytest.fixture
+def cached_app(tmp_path):
+    app = make_app(f'sqlite:///{tmp_path / "fyyur.db"}', CACHE_ENABLED=True, CACHE_BACKEND='memory')
+    with app.app_context():
+        yield app
+        db.session.remove()
+
+
+def test_rollover_command_invalidates_cached_pages(cached_app, rows):
+    venue, artist = rows.venue(), rows.artist()
+    rows.show(venue, artist, datetime.now() + timedelta(seconds=0.5))
+    client = cached_app.test_client()
+    paths = (f'/venues/{venue}', f'/artists/{artist}')
+    for path in paths:
+        assert '1 Upcoming Show' in client.get(path).get_data(as_text=True)
+
+    time.sleep(0.6)
+    # started, but the cached pages still count it as upcoming
+    assert '1 Upcoming Show' in client.get(paths[0]).get_data(as_text=True)
+
+    result = cached_app.test_cli_runner().invoke(args=['shows', 'rollover'])
+    assert result.exit_code == 0, result.output
+    assert _counts(Venue, venue) == (0, 1)
+    for path in paths:
+        body = client.get(path).get_data(as_text=True)
+        assert '0 Upcoming Shows' in body and '1 Past Show' in body, path
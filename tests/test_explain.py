@@ -0,0 +1,19 @@
+from conftest import make_app
+import explain
+
+
+def test_check_explains_every_path_with_a_warm_cache(tmp_path, rows):
+    app = make_app(f'sqlite:///{tmp_path / "fyyur.db"}', CACHE_ENABLED=True)
+    with app.app_context():
+        rows.show(rows.venue(name='The Hall'), rows.artist(name='The Band'))
+        client = app.test_client()
+        for path in explain.hot_paths():
+            client.get(path)
+
+        for path, statements, scans in explain.sequential_scans({'show'}):
+            assert statements, path
+            assert not scans, path
+
+        result = app.test_cli_runner().invoke(args=['explain', 'check'])
+        assert result.exit_code == 0, result.output
+        assert 'cache' in app.extensions
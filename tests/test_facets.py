@@ -0,0 +1,61 @@
+import re
+import pytest
+from models import db, Venue, Artist
+import facets
+
+ITEM_LINK = re.compile(r'href="/(?:venues|artists)/(\d+)"')
+
+
+@pytest.fixture
+def listings(rows):
+    """Venues and artists across genres and states, one of each without a state."""
+    spec = [
+        (['Jazz'], 'CA'), (['Jazz', 'Blues'], 'CA'), (['Blues'], 'NY'),
+        (['Jazz', 'Blues'], 'NY'), (['Jazz'], 'TX'), (['Jazz', 'Blues'], None),
+    ]
+    venues = [rows.venue(name=f'Venue {n}', genres=genres, state=state) for n, (genres, state) in enumerate(spec)]
+    artists = [rows.artist(name=f'Artist {n}', genres=genres, state=state) for n, (genres, state) in enumerate(spec)]
+    return venues, artists
+
+
+def _counts(facet_list):
+    return {facet.value: (facet.count, facet.selected) for facet in facet_list if facet.count or facet.selected}
+
+
+@pytest.mark.parametrize('model', [Venue, Artist])
+def test_facet_counts(any_app, listings, model):
+    counts = facets.facet_counts(model, [], [])
+    assert counts.total == 6
+    assert _counts(counts.genres) == {'Jazz': (5, False), 'Blues': (4, False)}
+    assert _counts(counts.states) == {'CA': (2, False), 'NY': (2, False), 'TX': (1, False)}
+
+    counts = facets.facet_counts(model, ['Jazz', 'Blues'], ['NY'])
+    assert counts.total == 1
+    assert _counts(counts.genres) == {'Jazz': (1, True), 'Blues': (1, True)}
+    # other states keep the genre matches they would add
+    assert _counts(counts.states) == {'CA': (1, False), 'NY': (1, True)}
+
+
+@pytest.mark.parametrize('kind', ['venues', 'artists'])
+def test_browse_with_a_null_state(any_app, rows, kind):
+    (rows.venue if kind == 'venues' else rows.artist)(state=None)
+    response = any_app.test_client().get(f'/{kind}/browse')
+    assert response.status_code == 200
+    assert '1 ' + kind in response.get_data(as_text=True)
+
+
+@pytest.mark.parametrize('kind, model', [('venues', Venue), ('artists', Artist)])
+def test_browse_filters_page_through_every_match(any_app, listings, follow_pages, kind, model):
+    any_app.config['PAGE_SIZE'] = 1
+    bodies = follow_pages(any_app.test_client(), f'/{kind}/browse?genre=Jazz&genre=Blues&state=CA&state=NY')
+    found = [int(id) for body in bodies for id in ITEM_LINK.findall(body)]
+    expected = {model_id for model_id, in db.session.query(model.id).filter(
+        model.genre_mask.op('&')(facets.genre_mask(['Jazz', 'Blues'])) == facets.genre_mask(['Jazz', 'Blues']),
+        model.state.in_(['CA', 'NY']))}
+    assert len(expected) == 2
+    assert sorted(found) == sorted(expected)
+    assert len(bodies) == 2
+
+
+def test_browse_rejects_unknown_filters(app):
+    assert app.test_client().get('/venues/browse?genre=Polka').status_code == 400
@@ -0,0 +1,56 @@
+from models import db, Venue, Artist, Show
+from forms import IdLookup
+
+
+def _post_show(app, venue_id, artist_id):
+    return app.test_client().post('/shows/create', data={
+        'venue_id': venue_id, 'artist_id': artist_id, 'start_time': '2030-01-01 20:00:00'})
+
+
+def test_show_form_rejects_unknown_owners(app, rows):
+    venue_id, artist_id = rows.venue(), rows.artist()
+    body = _post_show(app, 999, artist_id).get_data(as_text=True)
+    assert 'No venue with id 999.' in body
+    body = _post_show(app, venue_id, 999).get_data(as_text=True)
+    assert 'No artist with id 999.' in body
+    assert Show.query.count() == 0
+
+    assert 'Show was successfully listed!' in _post_show(app, venue_id, artist_id).get_data(as_text=True)
+    assert Show.query.count() == 1
+
+
+def test_existing_ids_are_remembered_for_the_ttl(app, rows, statements):
+    venue_id = rows.venue()
+    lookup = IdLookup(ttl=60)
+    statements.clear()
+    assert lookup.existing(Venue, [venue_id, 999]) == {venue_id}
+    assert lookup.existing(Venue, [venue_id]) == {venue_id}
+    # the id of another table is not a hit
+    assert lookup.existing(Artist, [venue_id]) == set()
+    assert len(statements) == 2
+
+    lookup.forget(Venue, venue_id)
+    statements.clear()
+    lookup.existing(Venue, [venue_id])
+    assert len(statements) == 1
+
+
+def test_a_ttl_of_zero_always_asks_the_database(app, rows, statements):
+    venue_id = rows.venue()
+    lookup = IdLookup(ttl=0)
+    statements.clear()
+    assert lookup.existing(Venue, [venue_id]) == {venue_id}
+    assert lookup.existing(Venue, [venue_id]) == {venue_id}
+    assert len(statements) == 2
+
+    # a deleted venue is gone at once, without forget()
+    Venue.query.filter_by(id=venue_id).delete()
+    db.session.commit()
+    assert lookup.existing(Venue, [venue_id]) == set()
+
+
+def test_remembered_ids_are_bounded(app, rows):
+    ids = [rows.venue(name=f'Hall {n}') for n in range(3)]
+    lookup = IdLookup(ttl=60, max_entries=2)
+    lookup.existing(Venue, ids)
+    assert len(lookup._seen) == 2
@@ -0,0 +1,72 @@
+import re
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy.exc import InvalidRequestError
+from models import db, Venue, Artist, Show
+
+JOIN_SHOW = re.compile(r'\bJOIN\s+"?show"?\s', re.IGNORECASE)
+
+
+@pytest.fixture
+def shows(rows):
+    """Two venues and two artists with past and upcoming shows; returns (venue ids, artist ids)."""
+    venues = [rows.venue(name='Jazz Hall'), rows.venue(name='Jazz Cellar')]
+    artists = [rows.artist(name='Jazz Trio'), rows.artist(name='Jazz Quartet')]
+    for days in (-30, -2, 3, 10, 40):
+        for venue_id in venues:
+            for artist_id in artists:
+                rows.show(venue_id, artist_id, datetime.now() + timedelta(days=days))
+    return venues, artists
+
+
+def _sql(client, statements, path):
+    del statements[:]
+    response = client.get(path)
+    assert response.status_code == 200, path
+    return [' '.join(statement.split()) for statement in statements]
+
+
+@pytest.mark.parametrize('path', [
+    '/venues', '/artists', '/shows', '/venues/browse', '/artists/browse?genre=Jazz',
+])
+def test_listings_do_not_join_show(any_app, shows, statements, path):
+    sql = _sql(any_app.test_client(), statements, path)
+    assert sql
+    assert not [statement for statement in sql if JOIN_SHOW.search(statement)]
+
+
+@pytest.mark.parametrize('path', ['/venues/search?search_term=jazz', '/artists/search?search_term=jazz'])
+def test_search_does_not_join_show(app, shows, statements, path):
+    sql = _sql(app.test_client(), statements, path)
+    assert len(sql) == 2
+    assert not [statement for statement in sql if JOIN_SHOW.search(statement)]
+    assert not [statement for statement in sql if 'search_text AS' in statement]
+
+
+@pytest.mark.parametrize('owner, other', [('venue', 'artist'), ('artist', 'venue')])
+def test_detail_statements(any_app, shows, statements, owner, other):
+    venues, artists = shows
+    owner_id = (venues if owner == 'venue' else artists)[0]
+    sql = _sql(any_app.test_client(), statements, f'/{owner}s/{owner_id}')
+
+    header, upcoming, past, counts = sql
+    assert header.startswith('SELECT') and f'FROM {owner} ' in header
+    assert 'JOIN' not in header and f'{owner}.search_text' not in header
+    # the upcoming and past tiles: one page each, with the other side's columns joined in
+    for tiles in (upcoming, past):
+        assert f'FROM show JOIN {other} ON {other}.id = show.{other}_id' in tiles
+        assert f'WHERE show.{owner}_id = ' in tiles and 'LIMIT' in tiles
+    assert 'count(show.id) FILTER' in counts and f'WHERE show.{owner}_id = ' in counts
+
+
+def test_undeclared_relationships_raise(app, shows):
+    venue = db.session.get(Venue, shows[0][0])
+    with pytest.raises(InvalidRequestError):
+        venue.shows
+    artist = db.session.get(Artist, shows[1][0])
+    with pytest.raises(InvalidRequestError):
+        artist.shows
+    show = Show.query.first()
+    for relationship in ('venue', 'artist'):
+        with pytest.raises(InvalidRequestError):
+            getattr(show, relationship)
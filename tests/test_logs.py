@@ -0,0 +1,36 @@
+import os
+from logging.handlers import RotatingFileHandler, WatchedFileHandler
+from conftest import make_app
+import logs
+
+
+def _queue_handlers(app):
+    return [handler for handler in app.logger.handlers if isinstance(handler, logs.RequestQueueHandler)]
+
+
+def test_init_app_replaces_the_previous_handler_and_listener(tmp_path, monkeypatch):
+    hooks = []
+    monkeypatch.setattr(logs, '_hooks_registered', False)
+    monkeypatch.setattr(os, 'register_at_fork', lambda **hooks_: hooks.append(hooks_))
+    url = f'sqlite:///{tmp_path / "fyyur.db"}'
+
+    first = make_app(url, LOG_STDERR=True)
+    listener = first.extensions['logs'].listener
+    second = make_app(url, LOG_STDERR=True)
+
+    assert _queue_handlers(second) == [second.extensions['logs']]
+    assert listener._thread is None
+    assert second.extensions['logs'].listener._thread is not None
+    assert len(hooks) == 1
+
+
+def test_forked_workers_do_not_rotate_a_shared_file(tmp_path):
+    config = {'LOG_FILE': str(tmp_path / 'error.log'), 'LOG_ROTATE': 'size',
+              'LOG_MAX_BYTES': 1024, 'LOG_BACKUP_COUNT': 1}
+    assert isinstance(logs.file_handler(config), RotatingFileHandler)
+    assert isinstance(logs.file_handler(config, forked=True), WatchedFileHandler)
+
+    config['LOG_FILE'] = str(tmp_path / 'error-{pid}.log')
+    handler = logs.file_handler(config, forked=True)
+    assert isinstance(handler, RotatingFileHandler)
+    assert handler.baseFilename.endswith(f'error-{os.getpid()}.log')
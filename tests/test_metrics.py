@@ -0,0 +1,45 @@
+import os
+import metrics
+
+LABELS = (('endpoint', 'venues'),)
+
+
+def _write(directory, pid, samples):
+    values = metrics.ValueFile(os.path.join(directory, f'{pid}.db'))
+    values.add(samples)
+    values.close()
+
+
+def test_histograms_report_every_bucket_cumulatively(tmp_path):
+    registry = metrics.Metrics(str(tmp_path), (0.1, 0.5, 1.0))
+    samples = []
+    registry.observe(samples, 'fyyur_http_request_duration_seconds', LABELS, 0.3)
+    registry.observe(samples, 'fyyur_http_request_duration_seconds', LABELS, 2.0)
+    registry.add(samples)
+
+    lines = metrics.exposition(registry.collect(), registry.buckets).splitlines()
+    buckets = [line for line in lines if line.startswith('fyyur_http_request_duration_seconds_bucket')]
+    assert buckets == [
+        'fyyur_http_request_duration_seconds_bucket{endpoint="venues",le="0.1"} 0',
+        'fyyur_http_request_duration_seconds_bucket{endpoint="venues",le="0.5"} 1',
+        'fyyur_http_request_duration_seconds_bucket{endpoint="venues",le="1.0"} 1',
+        'fyyur_http_request_duration_seconds_bucket{endpoint="venues",le="+Inf"} 2',
+    ]
+    assert 'fyyur_http_request_duration_seconds_count{endpoint="venues"} 2' in lines
+
+
+def test_dead_workers_are_folded_into_one_file(tmp_path):
+    registry = metrics.Metrics(str(tmp_path), (0.1,))
+    # pids far above pid_max, so never alive
+    for pid in (2 ** 30, 2 ** 30 + 1):
+        _write(str(tmp_path), pid, [
+            (('fyyur_db_queries_total', LABELS), 3),
+            (('fyyur_http_requests_in_progress', ()), 1),
+        ])
+        registry.mark_process_dead(pid)
+        assert not os.path.exists(tmp_path / f'{pid}.db')
+
+    assert sorted(os.listdir(tmp_path)) == [metrics.DEAD_FILE]
+    totals = registry.collect()
+    assert totals[('fyyur_db_queries_total', LABELS)] == 6
+    assert ('fyyur_http_requests_in_progress', ()) not in totals
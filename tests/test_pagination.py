@@ -0,0 +1,39 @@
+import re
+import pytest
+from werkzeug.exceptions import BadRequest
+from pagination import decode_cursor, encode_cursor
+
+
+def _ids(bodies, kind):
+    return [int(id) for body in bodies for id in re.findall(rf'href="/{kind}/(\d+)"', body)]
+
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor(['CA', None, 3])) == (['CA', None, 3], False)
+    with pytest.raises(BadRequest):
+        decode_cursor('not-a-cursor')
+
+
+def test_venue_pages_keep_rows_with_null_keys(any_app, rows, follow_pages):
+    any_app.config['PAGE_SIZE'] = 2
+    ids = [
+        rows.venue(name='Alpha', city=None),
+        rows.venue(name=None, city='Oakland'),
+        rows.venue(name='Beta', city='Oakland'),
+        rows.venue(name=None, city=None),
+        rows.venue(name='Gamma', city='Berkeley', state=None),
+        rows.venue(name='Delta', city='Berkeley'),
+        rows.venue(name='Zeta', city='San Jose'),
+    ]
+    bodies = follow_pages(any_app.test_client(), '/venues')
+    found = _ids(bodies, 'venues')
+    assert sorted(found) == sorted(ids)
+    assert len(bodies) == 4
+
+
+def test_artist_pages_keep_rows_with_null_names(any_app, rows, follow_pages):
+    any_app.config['PAGE_SIZE'] = 2
+    ids = [rows.artist(name=name) for name in ('Mingus', None, 'Bird', None, 'Monk')]
+    bodies = follow_pages(any_app.test_client(), '/artists')
+    # NULL names sort first, as ''
+    assert _ids(bodies, 'artists') == [ids[1], ids[3], ids[2], ids[0], ids[4]]
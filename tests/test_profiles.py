@@ -0,0 +1,30 @@
+import pytest
+from conftest import make_app
+from forms import owner_ids
+from models import db, Venue
+
+
+def _production(tmp_path, **config):
+    return make_app(f'sqlite:///{tmp_path / "fyyur.db"}', PROFILE='production', **config)
+
+
+def test_production_needs_a_shared_cache(tmp_path):
+    with pytest.raises(RuntimeError, match='CACHE_REDIS_URL'):
+        _production(tmp_path, CACHE_ENABLED=True)
+    with pytest.raises(RuntimeError, match='per worker'):
+        _production(tmp_path, CACHE_ENABLED=True, CACHE_BACKEND='memory')
+
+
+def test_production_does_not_remember_owner_ids(tmp_path):
+    app = _production(tmp_path)
+    assert 'cache' not in app.extensions
+    with app.app_context():
+        venue = Venue(name='Gone', city='Austin', state='TX', genres=['Jazz'])
+        db.session.add(venue)
+        db.session.commit()
+        assert owner_ids.existing(Venue, [venue.id]) == {venue.id}
+        # deleted by another worker, which cannot forget the id here
+        Venue.query.filter_by(id=venue.id).delete()
+        db.session.commit()
+        assert owner_ids.existing(Venue, [venue.id]) == set()
+        db.session.remove()
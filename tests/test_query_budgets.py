@@ -0,0 +1,56 @@
+import pytest
+from conftest import require_search
+from instrumentation import QueryBudgetExceeded
+from models import db
+
+# (path, endpoint); ids are filled in from the shows fixture of test_loading
+PAGES = [
+    ('/venues', 'venues'),
+    ('/artists', 'artists'),
+    ('/shows', 'shows'),
+    ('/venues/browse?genre=Jazz', 'browse_venues'),
+    ('/artists/browse?state=CA', 'browse_artists'),
+    ('/venues/search?search_term=jazz', 'search_venues'),
+    ('/artists/search?search_term=jazz', 'search_artists'),
+    ('/venues/{venue}', 'show_venue'),
+    ('/artists/{artist}', 'show_artist'),
+    ('/venues/{venue}/shows/upcoming', 'venue_show_tiles'),
+    ('/artists/{artist}/shows/past', 'artist_show_tiles'),
+]
+
+
+@pytest.fixture
+def page_ids(rows):
+    venue, artist = rows.venue(name='Jazz Hall'), rows.artist(name='Jazz Trio')
+    for days in (-3, -2, -1, 1, 2, 3):
+        rows.show(venue, artist)
+    return {'venue': venue, 'artist': artist}
+
+
+@pytest.mark.parametrize('path, endpoint', PAGES)
+def test_pages_stay_within_their_budget(any_app, page_ids, statements, path, endpoint):
+    if endpoint.startswith('search_'):
+        require_search(any_app)
+    del statements[:]
+    response = any_app.test_client().get(path.format(**page_ids))
+    assert response.status_code == 200
+    assert len(statements) <= any_app.config['QUERY_BUDGETS'][endpoint]
+
+
+@pytest.mark.parametrize('path, endpoint', PAGES)
+def test_pages_over_their_budget_fail(app, page_ids, path, endpoint):
+    app.config['QUERY_BUDGETS'] = dict(app.config['QUERY_BUDGETS'], **{endpoint: 0})
+    with pytest.raises(QueryBudgetExceeded, match=f'on {endpoint}: '):
+        app.test_client().get(path.format(**page_ids))
+
+
+def test_repeated_statements_fail_as_n_plus_one(app):
+    @app.route('/_test/n_plus_one')
+    def n_plus_one():
+        for id in range(app.config['QUERY_REPEAT_THRESHOLD']):
+            db.session.execute(db.select([db.literal(id)]))
+        return 'done'
+
+    app.config['QUERY_BUDGETS'] = dict(app.config['QUERY_BUDGETS'], n_plus_one=100)
+    with pytest.raises(QueryBudgetExceeded, match='N\\+1 suspect'):
+        app.test_client().get('/_test/n_plus_one')
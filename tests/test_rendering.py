@@ -0,0 +1,66 @@
+from datetime import datetime, timedelta
+import pytest
+from jinja2 import Environment
+from jinja2.bccache import Bucket
+from app import create_app
+from conftest import CONFIG, make_app, Rows
+from models import db
+from rendering import BytecodeCache
+
+
+@pytest.fixture
+def listed(tmp_path):
+    """The URL of a database with three venues, artists and shows."""
+    url = f'sqlite:///{tmp_path / "fyyur.db"}'
+    app = make_app(url)
+    with app.app_context():
+        rows = Rows()
+        for n in range(3):
+            venue_id = rows.venue(name=f'Hall {n}', city=f'City {n % 2}')
+            artist_id = rows.artist(name=f'Band {n}')
+            rows.show(venue_id, artist_id, datetime(2030, 1, 1) + timedelta(days=n))
+        db.session.remove()
+    return url
+
+
+@pytest.mark.parametrize('path', ['/venues', '/artists', '/shows'])
+def test_streamed_listings_match_rendered_ones(listed, path):
+    pages = []
+    for streaming in (False, True):
+        app = create_app(dict(CONFIG, SQLALCHEMY_DATABASE_URI=listed, STREAM_LISTINGS=streaming, PAGE_SIZE=2))
+        response = app.test_client().get(path)
+        # a streamed body has no length up front
+        assert ('Content-Length' in response.headers) != streaming
+        pages.append(response.get_data(as_text=True))
+    assert pages[0] == pages[1]
+    assert 'class="next"' in pages[0]
+
+
+def _bucket(cache):
+    environment = Environment(bytecode_cache=cache)
+    bucket = Bucket(environment, 'key', 'checksum')
+    bucket.code = compile('x = 1', 'template', 'exec')
+    return bucket
+
+
+def test_bytecode_is_written_whole_or_not_at_all(tmp_path, monkeypatch):
+    cache = BytecodeCache(str(tmp_path))
+    bucket = _bucket(cache)
+    cache.dump_bytecode(bucket)
+    written = list(tmp_path.iterdir())
+    assert len(written) == 1
+
+    def broken_write(f):
+        f.write(b'half an entry')
+        raise OSError('disk full')
+
+    written[0].unlink()
+    monkeypatch.setattr(bucket, 'write_bytecode', broken_write)
+    with pytest.raises(OSError):
+        cache.dump_bytecode(bucket)
+    assert list(tmp_path.iterdir()) == []
+
+    loaded = _bucket(cache)
+    loaded.code = None
+    cache.load_bytecode(loaded)
+    assert loaded.code is None
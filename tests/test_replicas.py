@@ -0,0 +1,69 @@
+import pytest
+from conftest import make_app
+from models import db, Venue
+
+VENUE_FORM = {'name': 'New Hall', 'city': 'Austin', 'state': 'TX', 'address': '1 Main St',
+              'phone': '512-555-0100', 'genres': 'Jazz', 'facebook_link': 'https://facebook.com/new'}
+
+
+@pytest.fixture
+def replicated(tmp_path):
+    """An app on two SQLite files: the primary has "Primary Hall", the replica "Replica Hall"."""
+    app = make_app(f'sqlite:///{tmp_path / "primary.db"}',
+                   SQLALCHEMY_REPLICA_URIS=[f'sqlite:///{tmp_path / "replica.db"}'],
+                   REPLICA_CHECK_INTERVAL=0, REPLICA_MAX_LAG_SECONDS=5, PRIMARY_PIN_SECONDS=10)
+    with app.app_context():
+        replica = db.get_engine(app, 'replica0')
+        db.Model.metadata.create_all(replica)
+        row = {'city': 'Austin', 'state': 'TX', 'address': '1 Main St', 'genres': ['Jazz'], 'genre_mask': 1}
+        db.session.execute(Venue.__table__.insert(), dict(row, name='Primary Hall'))
+        db.session.commit()
+        with replica.begin() as connection:
+            connection.execute(Venue.__table__.insert(), dict(row, name='Replica Hall'))
+        db.session.remove()
+    # no app context around the requests: each gets its own g, and so its
+    # own choice of database
+    yield app
+    db.replicas._checked.clear()
+
+
+def _venues(client):
+    return client.get('/venues').get_data(as_text=True)
+
+
+def test_replica_endpoints_read_from_the_replica(replicated):
+    body = _venues(replicated.test_client())
+    assert 'Replica Hall' in body and 'Primary Hall' not in body
+
+
+def test_other_endpoints_read_from_the_primary(replicated):
+    replicated.config['REPLICA_ENDPOINTS'] = set(replicated.config['REPLICA_ENDPOINTS']) - {'venues'}
+    assert 'Primary Hall' in _venues(replicated.test_client())
+
+
+def test_writes_go_to_the_primary_and_pin_the_client(replicated):
+    client = replicated.test_client()
+    response = client.post('/venues/create', data=VENUE_FORM)
+    assert response.status_code == 302
+    with replicated.app_context():
+        assert db.session.query(Venue.name).filter_by(name='New Hall').scalar() == 'New Hall'
+        db.session.remove()
+
+    # the writer reads its own write from the primary until the pin expires
+    body = _venues(client)
+    assert 'New Hall' in body and 'Primary Hall' in body
+    # other clients keep reading the replica
+    assert 'Replica Hall' in _venues(replicated.test_client())
+
+    with client.session_transaction() as session:
+        session['db_primary_until'] = 0
+    assert 'Replica Hall' in _venues(client)
+
+
+def test_a_lagging_replica_falls_back_to_the_primary(replicated, monkeypatch):
+    monkeypatch.setattr(db.replicas, 'lag', lambda engine: 60.0)
+    assert 'Primary Hall' in _venues(replicated.test_client())
+    assert db.replicas.status() == {'replica0': False}
+
+    monkeypatch.setattr(db.replicas, 'lag', lambda engine: 1.0)
+    assert 'Replica Hall' in _venues(replicated.test_client())
@@ -0,0 +1,76 @@
+import gzip
+import pytest
+from werkzeug.http import http_date
+from conftest import make_app, Rows
+from models import db, Venue
+from responses import brotli
+
+
+@pytest.fixture
+def plain_app(tmp_path):
+    """An app without the page cache, outside an app context: each request gets its own g."""
+    app = make_app(f'sqlite:///{tmp_path / "fyyur.db"}')
+    with app.app_context():
+        Rows().venue(name='Blue Hall')
+        db.session.remove()
+    return app
+
+
+def test_pages_carry_validators_and_answer_304(plain_app):
+    client = plain_app.test_client()
+    response = client.get('/venues')
+    etag = response.headers['ETag']
+    assert etag.startswith('W/')
+    assert response.headers['Cache-Control'] == 'no-cache'
+    with plain_app.app_context():
+        updated_at = db.session.query(Venue.updated_at).scalar()
+    assert response.headers['Last-Modified'] == http_date(updated_at)
+
+    assert client.get('/venues', headers={'If-None-Match': etag}).status_code == 304
+    assert client.get('/venues', headers={'If-Modified-Since': response.headers['Last-Modified']}).status_code == 304
+    # If-None-Match wins: a changed ETag is a changed page, whatever the date
+    assert client.get('/venues', headers={'If-None-Match': 'W/"other"',
+                                          'If-Modified-Since': response.headers['Last-Modified']}).status_code == 200
+
+
+def test_writes_are_not_made_conditional(plain_app):
+    response = plain_app.test_client().post('/venues/create', data={})
+    assert 'ETag' not in response.headers
+
+
+@pytest.mark.parametrize('accept, encoding', [
+    ('gzip, br', 'br'),
+    ('gzip', 'gzip'),
+    ('identity', None),
+])
+def test_compression_follows_accept_encoding(plain_app, accept, encoding):
+    if encoding == 'br' and brotli is None:
+        pytest.skip('brotli is not installed')
+    client = plain_app.test_client()
+    plain = client.get('/venues').get_data()
+    response = client.get('/venues', headers={'Accept-Encoding': accept})
+    assert response.headers.get('Content-Encoding') == encoding
+    assert 'Accept-Encoding' in response.headers['Vary']
+    decode = {'br': brotli and brotli.decompress, 'gzip': gzip.decompress, None: bytes}[encoding]
+    assert decode(response.get_data()) == plain
+    # the encodings of a page share its weak ETag
+    assert response.headers['ETag'] == client.get('/venues').headers['ETag']
+
+
+def test_small_bodies_are_not_compressed(plain_app):
+    client = plain_app.test_client()
+    response = client.get('/api/v1/venues?fields=id', headers={'Accept-Encoding': 'gzip'})
+    assert len(response.get_data()) < plain_app.config['COMPRESS_MIN_SIZE']
+    assert 'Content-Encoding' not in response.headers
+    assert 'Accept-Encoding' in response.headers['Vary']
+
+    plain_app.config['COMPRESS_MIN_SIZE'] = 10 ** 6
+    assert 'Content-Encoding' not in client.get('/venues', headers={'Accept-Encoding': 'gzip'}).headers
+
+
+def test_not_modified_responses_are_not_compressed(plain_app):
+    client = plain_app.test_client()
+    etag = client.get('/venues').headers['ETag']
+    response = client.get('/venues', headers={'If-None-Match': etag, 'Accept-Encoding': 'gzip'})
+    assert response.status_code == 304
+    assert 'Content-Encoding' not in response.headers
@@ -0,0 +1,85 @@
+import re
+from sqlalchemy import REAL, case, cast, func
+from conftest import require_search
+from models import db, Venue
+from pagination import key, keyset_page
+import search
+
+VENUE_LINK = re.compile(r'href="/venues/(\d+)"')
+
+
+def _search_ids(app, follow_pages, term):
+    bodies = follow_pages(app.test_client(), f'/venues/search?search_term={term}')
+    return [int(id) for body in bodies for id in VENUE_LINK.findall(body)], len(bodies)
+
+
+def _tied_venues(rows):
+    # the same document length and words, so every one ranks the same
+    return [rows.venue(name=f'Jazz Hall {n}') for n in range(1, 8)]
+
+
+def test_search_pages_through_tied_relevance(app, rows, follow_pages):
+    app.config['SEARCH_PAGE_SIZE'] = 3
+    ids = _tied_venues(rows)
+    found, pages = _search_ids(app, follow_pages, 'jazz hall')
+    assert sorted(found) == ids
+    assert pages == 3
+
+
+def test_postgresql_keyset_on_float4_relevance_ties(pg_app, rows):
+    """Ties on a float4 key, such as word_similarity, page without gaps or repeats."""
+    ids = [rows.venue(name=f'Venue {n}') for n in range(1, 8)]
+    # 0.1 and 0.3 are not exact in float4, as word_similarity results rarely are
+    relevance = search.exact_relevance(cast(case((Venue.id <= ids[3], 0.1), else_=0.3), REAL))
+    query = db.session.query(Venue.id, relevance.label('relevance'))
+    keys = [key(relevance, 'relevance', descending=True), key(Venue.id)]
+
+    seen, cursor = [], None
+    for _ in range(len(ids)):
+        page = keyset_page(query, keys, cursor=cursor, per_page=2)
+        seen.extend(row.id for row in page.items)
+        cursor = page.next_cursor
+        if cursor is None:
+            break
+    assert seen == ids[4:] + ids[:4]
+
+
+def test_postgresql_search_pages_through_tied_relevance(pg_app, rows, follow_pages):
+    require_search(pg_app)
+    pg_app.config['SEARCH_PAGE_SIZE'] = 3
+    ids = _tied_venues(rows)
+    assert db.session.query(func.count(func.distinct(
+        func.word_similarity('jazz hall', Venue.search_text)))).scalar() == 1
+    found, pages = _search_ids(pg_app, follow_pages, 'jazz hall')
+    assert sorted(found) == ids
+    assert pages == 3
+
+
+def test_search_without_a_term_pages_through_everything(any_app, rows, follow_pages):
+    any_app.config['SEARCH_PAGE_SIZE'] = 3
+    ids = _tied_venues(rows)
+    found, pages = _search_ids(any_app, follow_pages, '')
+    assert sorted(found) == ids
+    assert pages == 3
+
+
+def test_search_counts_up_to_the_limit(any_app, rows):
+    require_search(any_app)
+    any_app.config['SEARCH_COUNT_LIMIT'] = 5
+    _tied_venues(rows)
+    body = any_app.test_client().get('/venues/search?search_term=jazz').get_data(as_text=True)
+    assert 'Number of search results for "jazz": 5+' in body
+
+    any_app.config['SEARCH_COUNT_LIMIT'] = 7
+    body = any_app.test_client().get('/venues/search?search_term=jazz').get_data(as_text=True)
+    assert 'Number of search results for "jazz": 7' in body and '7+' not in body
+
+
+def test_postgresql_search_drops_matches_below_the_similarity_threshold(pg_app, rows):
+    require_search(pg_app)
+    close = rows.venue(name='Jazz Hall')
+    # contains "jazz", but only as part of a long unrelated word
+    rows.venue(name='Razzmajazzmatazz')
+    total, page = search.search(Venue, 'jazz')
+    assert total == 1
+    assert [venue.id for venue in page.items] == [close]